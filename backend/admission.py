@@ -0,0 +1,372 @@
+# backend/admission.py
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from config import (
+    ADMISSION_CONTROL, ADMISSION_RATE_LIMITS,
+    ADMISSION_MODEL_CONCURRENCY, ADMISSION_MODEL_MAX_BULK, ADMISSION_MODEL_QUEUE, ADMISSION_MODEL_SLO_S,
+    ADMISSION_LLM_CONCURRENCY, ADMISSION_LLM_QUEUE, ADMISSION_LLM_SLO_S,
+)
+import metrics
+
+# Admission control for the expensive routes, applied as a router dependency:
+#
+#     @router.post("/submit_entry", dependencies=[Depends(admit("journal", "model"))])
+#
+# A request first spends a token from its client's bucket (429 when empty) and from
+# its route class's global bucket (503 when empty), then waits for a slot on the
+# resource it needs, held until FastAPI closes the dependency after the endpoint.
+# Rejections carry Retry-After.
+#
+# FastAPI closes dependencies before a StreamingResponse body is sent, so streaming
+# endpoints take the slot and hand it to their body instead:
+#
+#     async def stream(..., slot: Slot = Depends(admit("goals", "llm"))):
+#         return slot.streaming_response(events(), media_type="text/event-stream")
+#
+# Clients are keyed by X-User-Id, a user_id path parameter or a JSON body's user_id,
+# falling back to the peer address. None of these are authenticated, so the
+# global buckets and the queues are what actually bound the load.
+
+INTERACTIVE = 0
+BULK = 1
+
+ENABLED = ADMISSION_CONTROL  # the load test switches this off while seeding
+
+ADMISSION_REJECTED = metrics.Counter("admission_rejected_total", "Requests turned away by admission control",
+                                     ["route_class", "reason"])
+ADMISSION_WAIT_SECONDS = metrics.Histogram("admission_wait_seconds", "Time admitted requests waited for a slot",
+                                           ["gate", "priority"])
+
+
+def _reject(route_class: str, reason: str, status: int, retry_after: float):
+    ADMISSION_REJECTED.inc(route_class=route_class, reason=reason)
+    detail = "Too many requests, slow down" if status == 429 else "Server is busy, try again shortly"
+    raise HTTPException(status_code=status, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Spends one token; returns 0.0 if there was one, else the seconds until there will be"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+
+class RateLimiter:
+    """Per-client token buckets (LRU-bounded) under one global bucket for a route class"""
+
+    def __init__(self, route_class: str, client_rate: float, client_burst: float, global_rate: float, global_burst: float,
+                 max_clients: int = 100000):
+        self.route_class = route_class
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._global = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+
+    def check(self, client: str):
+        """Raises HTTPException 429 / 503 when the client / the route class is over its rate"""
+        now = time.monotonic()
+        bucket = None
+        if self.client_rate > 0:
+            bucket = self._clients.get(client)
+            if bucket is None:
+                bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            self._clients.move_to_end(client)
+            wait = bucket.take(now)
+            if wait:
+                _reject(self.route_class, "client_rate", 429, wait)
+        if self._global is not None:
+            wait = self._global.take(now)
+            if wait:
+                if bucket is not None:
+                    bucket.refund()  # the client didn't get served, don't charge it
+                _reject(self.route_class, "global_rate", 503, wait)
+
+
+class AdmissionGate:
+    """Bounded concurrency for one resource, with a priority wait queue.
+
+    At most `limit` requests hold a slot. Waiting INTERACTIVE requests are always
+    served before BULK ones, and BULK may hold at most `max_bulk` slots. An
+    INTERACTIVE request is shed up front when `max_queue` requests are already
+    waiting or when its estimated completion time exceeds the budget (HEADROOM x
+    `slo_s`, the rest covers the response after the slot is released), and it is
+    shed if it is still waiting once only its own hold time is left of the budget.
+    Completion is estimated as the time the request has already spent in the
+    server, plus the wait for a slot ((waiters ahead + 1) / limit x the average
+    time an INTERACTIVE request holds its slot, zero if one is free), plus its own
+    hold time, taken from the 90th percentile of recent holds so the bound covers
+    the tail.
+    No request waits longer than that hold time: past it, queueing only adds
+    latency. BULK requests are only bounded by the queue size.
+
+    With `adaptive`, `limit` follows the measured throughput instead of staying at
+    `max_concurrent`. By Little's law the resource completes limit / hold time
+    requests a second, so once per round (`limit` completions, at least ROUND_MIN)
+    the limit is scaled by target / that round's 90th percentile hold, with
+    target = budget / 3. That leaves a third of the budget for waiting at the gate
+    and a third for the rest of the request. It grows by at most 20% a round and only while the gate is full,
+    at most halves, and moves between max_bulk + 1 (where it starts) and
+    `max_concurrent`.
+    """
+
+    ROUND_MIN = 8    # completions per round at the least, so a small limit still sees a tail
+    HEADROOM = 0.8   # share of the SLO planned for; the rest covers the response after the slot is released
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, slo_s: float, max_bulk: Optional[int] = None,
+                 adaptive: bool = False):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.slo = slo_s
+        self.budget = self.HEADROOM * slo_s  # what the estimates are planned against
+        self.max_bulk = max_concurrent if max_bulk is None else max_bulk
+        self.adaptive = adaptive
+        self.min_concurrent = min(max_concurrent, self.max_bulk + 1) if adaptive else max_concurrent
+        self.limit = float(self.min_concurrent)
+        self._active = 0
+        self._bulk_active = 0
+        self._waiters: List[list] = []  # heap of [priority, seq, future]; given-up futures are skipped
+        self._queued = [0, 0]           # live waiters per priority
+        self._seq = itertools.count()
+        self.service_s: Optional[float] = None       # EWMA of INTERACTIVE hold time
+        self.service_tail_s: Optional[float] = None  # EWMA of each round's p90 hold time
+        self._round_holds: List[float] = []
+        self._round_saturated = False
+
+        # Metrics
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_slo = 0
+        self.shed_timeout = 0
+
+    def _can_run(self, priority: int) -> bool:
+        return self._active < int(self.limit) and (priority == INTERACTIVE or self._bulk_active < self.max_bulk)
+
+    def _take(self, priority: int):
+        self._active += 1
+        if priority != INTERACTIVE:
+            self._bulk_active += 1
+        self.admitted += 1
+
+    def _hold_estimate(self) -> float:
+        return self.service_tail_s or self.service_s or 0.0
+
+    def estimated_wait(self, priority: int = INTERACTIVE) -> float:
+        """Seconds until a request arriving now would get a slot"""
+        ahead = self._queued[INTERACTIVE] + (self._queued[BULK] if priority != INTERACTIVE else 0)
+        if self.service_s is None or (ahead == 0 and self._can_run(priority)):
+            return 0.0
+        return (ahead + 1) / int(self.limit) * self.service_s
+
+    def estimated_completion(self, priority: int = INTERACTIVE) -> float:
+        """Seconds until a request arriving now would be done: its wait plus its own hold time"""
+        return self.estimated_wait(priority) + self._hold_estimate()
+
+    async def acquire(self, route_class: str, priority: int = INTERACTIVE, elapsed: float = 0.0):
+        """Waits for a slot or raises HTTPException 503; pair with release().
+
+        `elapsed` is how long the request has been in the server already, which counts against its SLO.
+        """
+        timeout = None
+        if priority == INTERACTIVE:
+            estimate = elapsed + self.estimated_completion(priority)
+            # An idle gate always admits, so a stale estimate can't shed everything forever
+            if estimate > self.budget and self._active:
+                self.shed_slo += 1
+                _reject(route_class, "slo", 503, estimate)
+            # Waiting longer than one hold time only adds latency: the limit, not the queue, sets throughput
+            hold = self._hold_estimate()
+            timeout = max(0.0, min(self.budget - elapsed - hold, hold or self.budget))
+
+        ahead = self._queued[INTERACTIVE] + (self._queued[BULK] if priority != INTERACTIVE else 0)
+        if ahead == 0 and self._can_run(priority):
+            self._take(priority)
+            ADMISSION_WAIT_SECONDS.observe(0.0, gate=self.name, priority=str(priority))
+            return
+
+        if sum(self._queued) >= self.max_queue:
+            self.shed_queue_full += 1
+            _reject(route_class, "queue_full", 503, self.estimated_wait(priority))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        self._queued[priority] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up
+                if isinstance(e, asyncio.TimeoutError):
+                    return
+                self.release(priority)
+                raise
+            future.cancel()
+            self._queued[priority] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed_timeout += 1
+                _reject(route_class, "timeout", 503, self.estimated_wait(priority))
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, gate=self.name, priority=str(priority))
+
+    def release(self, priority: int = INTERACTIVE, held_s: Optional[float] = None):
+        saturated = self._active >= int(self.limit)
+        self._active -= 1
+        if priority != INTERACTIVE:
+            self._bulk_active -= 1
+        if priority == INTERACTIVE and held_s is not None:
+            self.service_s = held_s if self.service_s is None else 0.8 * self.service_s + 0.2 * held_s
+            self._end_of_round(held_s, saturated)
+        self._wake()
+
+    def _end_of_round(self, held_s: float, saturated: bool):
+        self._round_holds.append(held_s)
+        self._round_saturated = self._round_saturated or saturated
+        if len(self._round_holds) < max(self.ROUND_MIN, int(self.limit)):
+            return
+        holds = sorted(self._round_holds)
+        tail = holds[int(0.9 * (len(holds) - 1))]
+        self.service_tail_s = tail if self.service_tail_s is None else 0.5 * self.service_tail_s + 0.5 * tail
+        if self.adaptive:
+            # Only grow on evidence from a full gate: a half-empty one says nothing about how much it can take
+            ratio = min(1.2, max(0.5, (self.budget / 3) / max(tail, 1e-3)))
+            if ratio < 1 or self._round_saturated:
+                self.limit = min(self.max_concurrent, max(self.min_concurrent, self.limit * ratio))
+        self._round_holds = []
+        self._round_saturated = False
+
+    def _wake(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_run(priority):
+                return
+            heapq.heappop(self._waiters)
+            self._queued[priority] -= 1
+            self._take(priority)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "bulk_active": self._bulk_active,
+            "queued_interactive": self._queued[INTERACTIVE],
+            "queued_bulk": self._queued[BULK],
+            "max_concurrent": self.max_concurrent,
+            "limit": int(self.limit),
+            "service_seconds": self.service_s or 0.0,
+            "service_tail_seconds": self.service_tail_s or 0.0,
+            "throughput_per_second": int(self.limit) / self.service_s if self.service_s else 0.0,
+            "estimated_wait_seconds": self.estimated_wait(),
+            "estimated_completion_seconds": self.estimated_completion(),
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_slo": self.shed_slo,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+RATE_LIMITERS = {name: RateLimiter(name, *limits) for name, limits in ADMISSION_RATE_LIMITS.items()}
+GATES = {
+    "model": AdmissionGate("model", ADMISSION_MODEL_CONCURRENCY, ADMISSION_MODEL_QUEUE, ADMISSION_MODEL_SLO_S,
+                           max_bulk=ADMISSION_MODEL_MAX_BULK, adaptive=True),
+    "llm": AdmissionGate("llm", ADMISSION_LLM_CONCURRENCY, ADMISSION_LLM_QUEUE, ADMISSION_LLM_SLO_S),
+}
+for _name, _gate in GATES.items():
+    metrics.register_collector(metrics.stats_collector(f"admission_{_name}", _gate.stats))
+
+
+async def client_key(request: Request) -> str:
+    user = request.headers.get("x-user-id") or request.path_params.get("user_id")
+    if user is None and getattr(request.scope.get("route"), "body_field", None) is not None:
+        # FastAPI has already read the declared body for the endpoint, so this doesn't touch the socket
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("user_id"), str):
+            user = body["user_id"]
+    if user:
+        return f"user:{user}"
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+
+class Slot:
+    """A gate slot held by one request (gate None when admission control is off)"""
+
+    def __init__(self, gate: Optional[AdmissionGate], priority: int = INTERACTIVE):
+        self.gate = gate
+        self.priority = priority
+        self.started = time.monotonic()
+        self.held = gate is not None
+        self.handed_off = False
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.gate.release(self.priority, time.monotonic() - self.started)
+
+    def streaming_response(self, body: AsyncIterator, **kwargs) -> StreamingResponse:
+        """A StreamingResponse that holds the slot until its body has been sent (or the client left)"""
+        self.handed_off = True
+
+        async def held_body():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                self.release()
+
+        # The background task covers a client that disconnects before the body starts
+        return StreamingResponse(held_body(), background=BackgroundTask(self.release), **kwargs)
+
+
+def admit(route_class: str, gate: str, priority: int = INTERACTIVE):
+    """Dependency factory: rate-limits `route_class` and holds a `gate` slot for the request"""
+    limiter = RATE_LIMITERS[route_class]
+    resource = GATES[gate]
+
+    async def dependency(request: Request):
+        if not ENABLED:
+            yield Slot(None)
+            return
+        limiter.check(await client_key(request))
+        arrived = getattr(request.state, "arrived", None)
+        await resource.acquire(route_class, priority, time.monotonic() - arrived if arrived else 0.0)
+        slot = Slot(resource, priority)
+        try:
+            yield slot
+        finally:
+            if not slot.handed_off:
+                slot.release()
+
+    return dependency
@@ -0,0 +1,144 @@
+# backend/batching.py
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import metrics
+
+
+class MicroBatcher:
+    """Collects single items from concurrent callers and runs them as one batch.
+
+    A batch is dispatched as soon as `max_batch_size` items are waiting or the
+    oldest waiting item has been queued for `max_wait_ms`, whichever comes first.
+    `batch_fn` receives a list of inputs and must return a list of outputs in the
+    same order; it runs in a worker thread so the event loop stays free. Up to
+    `max_in_flight` batches run at once (more than one only helps when batch_fn
+    hands work to something parallel, like the inference process pool).
+    Lower `priority` values are taken first, so interactive items overtake
+    queued bulk work; equal priorities keep arrival order.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 16, max_wait_ms: float = 10.0,
+                 max_in_flight: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._seq = itertools.count()
+        self._collecting: List[Tuple[Any, asyncio.Future]] = []  # batch taken off the queue, not yet dispatched
+
+        # Metrics
+        self.items_total = 0
+        self.batches_total = 0
+        self.max_batch_seen = 0
+        self.batch_size_counts: Dict[int, int] = {}
+        self.last_batch_seconds = 0.0
+        self.in_flight = 0
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.PriorityQueue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the worker and fails every item that hasn't been dispatched yet.
+
+        Batches already in flight still deliver their results.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = self._collecting
+        self._collecting = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait()[2:])
+        for _, fut in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError("MicroBatcher stopped"))
+
+    async def submit(self, item: Any, priority: int = 0) -> Any:
+        """Queue one item and wait for its own result."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._seq), item, future))
+        return await future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "items_total": self.items_total,
+            "batches_total": self.batches_total,
+            "avg_batch_size": (self.items_total / self.batches_total) if self.batches_total else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "last_batch_seconds": self.last_batch_seconds,
+            "batches_in_flight": self.in_flight,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        # Block for the first item, then keep filling until size or deadline is hit
+        batch = self._collecting = [(await self._queue.get())[2:]]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                # Already queued: take it without a loop round trip, which under load can outlast the deadline
+                batch.append(self._queue.get_nowait()[2:])
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append((await asyncio.wait_for(self._queue.get(), timeout=remaining))[2:])
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (e.g. client disconnect) don't need a forward pass
+            batch = [(item, fut) for item, fut in batch if not fut.done()]
+            if not batch:
+                continue
+
+            size = len(batch)
+            self.items_total += size
+            self.batches_total += 1
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+            await slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            task.add_done_callback(lambda _: slots.release())
+            self._collecting = []
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            results = await metrics.to_thread(self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.in_flight -= 1
+            self.last_batch_seconds = time.perf_counter() - started
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,101 @@
+"""Compare emotion inference backends: per-label score drift, p50/p99 latency and RSS.
+
+    cd backend && python bench/bench_backends.py --backends torch onnx --threads 4
+
+Each backend runs in its own subprocess so RSS numbers don't bleed into each
+other. Exits non-zero if any label drifts more than --max-drift from the first
+backend listed (the reference).
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLES = [
+    "Today was fine, nothing special.",
+    "I finally finished my project and I feel so proud of myself!",
+    "I can't stop worrying about the exam tomorrow, my stomach is in knots.",
+    "My friend cancelled on me again. I'm annoyed and honestly a bit hurt.",
+    "Grateful for a quiet morning walk and a good cup of coffee.",
+    "Everything feels heavy lately. I miss my grandmother so much.",
+    "lol that meeting was a disaster but at least it's over 😅",
+    "I don't know how I feel. Tired, maybe. A little hopeful?",
+] * 8
+
+
+def run_one(backend: str, threads: int, repeats: int):
+    from config import EMOTION_MODEL_ID, EMOTION_ONNX_DIR
+    from inference_backends import load_emotion_pipeline
+
+    started = time.perf_counter()
+    pipe = load_emotion_pipeline(backend, EMOTION_MODEL_ID, threads, EMOTION_ONNX_DIR)
+    load_seconds = time.perf_counter() - started
+    pipe("warmup")
+
+    latencies = []
+    scores = []
+    for i in range(repeats):
+        for text in SAMPLES:
+            t0 = time.perf_counter()
+            result = pipe(text, top_k=None)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if i == 0:
+                result = result[0] if isinstance(result[0], list) else result
+                scores.append({p["label"]: float(p["score"]) for p in result})
+
+    latencies.sort()
+    print(json.dumps({
+        "backend": backend,
+        "threads": threads,
+        "load_seconds": load_seconds,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scores": scores,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-drift", type=float, default=0.05)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child, args.threads, args.repeats)
+        return
+
+    reports = []
+    for backend in args.backends:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--threads", str(args.threads), "--repeats", str(args.repeats)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        reports.append(json.loads(out.strip().splitlines()[-1]))
+
+    reference = reports[0]
+    failed = False
+    for report in reports:
+        drift = max(
+            abs(ref[label] - got.get(label, 0.0))
+            for ref, got in zip(reference["scores"], report["scores"])
+            for label in ref
+        )
+        failed = failed or drift > args.max_drift
+        print(f"{report['backend']:>6}: p50 {report['p50_ms']:7.2f} ms  p99 {report['p99_ms']:7.2f} ms  "
+              f"rss {report['max_rss_mb']:7.1f} MB  load {report['load_seconds']:5.1f} s  "
+              f"max label drift vs {reference['backend']} {drift:.4f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
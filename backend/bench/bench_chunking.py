@@ -0,0 +1,95 @@
+"""Compare the old word-count chunker with token-accurate chunking on long entries.
+
+    cd backend && python bench/bench_chunking.py --entries 200
+
+Reports chunking time per entry (the old path includes the pipeline's second
+tokenization of every chunk), how many chunks exceed the model's 512-token
+limit (truncated or rejected by the model), and how full chunks are on average.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.tokenize import sent_tokenize
+from transformers import AutoTokenizer
+
+from config import EMOTION_MODEL_ID
+from crud import journal_crud
+from crud.journal_crud import chunk_text, MAX_TOKENS
+
+journal_crud.sent_tokenize = sent_tokenize  # use punkt like a loaded worker does
+
+SENTENCES = [
+    "Today I woke up early and went for a long walk along the river before class.",
+    "My chest felt tight all afternoon and I couldn't focus on anything.",
+    "Honestly I'm proud of how I handled the argument with my roommate.",
+    "😭😭😭 why is everything due on the same day 😩🔥📚",
+    "Hoy me sentí muy cansada, pero la cena con mi familia me levantó el ánimo.",
+    "今日は友達と話せて本当に嬉しかった。でも少し不安もある。",
+    "Ich habe heute endlich meine Prüfung bestanden und bin so erleichtert!",
+    "Idk... just tired i guess lol",
+]
+
+
+def legacy_chunk_text(text: str, max_length: int = 400):
+    """The previous chunker: word counts as a token estimate"""
+    chunks, current_chunk, current_length = [], [], 0
+    for sent in sent_tokenize(text):
+        sent_length = len(sent.split())
+        if current_length + sent_length > max_length:
+            if current_chunk:
+                chunks.append(" ".join(current_chunk))
+            current_chunk, current_length = [sent], sent_length
+        else:
+            current_chunk.append(sent)
+            current_length += sent_length
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def make_entry(rng: random.Random, sentences: int) -> str:
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--min-sentences", type=int, default=20)
+    parser.add_argument("--max-sentences", type=int, default=200)
+    parser.add_argument("--stride", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(EMOTION_MODEL_ID)
+    rng = random.Random(0)
+    entries = [make_entry(rng, rng.randint(args.min_sentences, args.max_sentences)) for _ in range(args.entries)]
+
+    # Old path: word-count chunks, then the pipeline tokenizes each chunk again
+    t0 = time.perf_counter()
+    legacy_lengths = []
+    for text in entries:
+        for chunk in legacy_chunk_text(text):
+            legacy_lengths.append(len(tokenizer(chunk)["input_ids"]))
+    legacy_seconds = time.perf_counter() - t0
+
+    # New path: one tokenizer pass, chunks are model-ready token ids
+    t0 = time.perf_counter()
+    new_lengths = []
+    for text in entries:
+        for chunk in chunk_text(text, tokenizer=tokenizer, stride=args.stride):
+            new_lengths.append(len(chunk) + tokenizer.num_special_tokens_to_add())
+    new_seconds = time.perf_counter() - t0
+
+    for name, seconds, lengths in (("word-count", legacy_seconds, legacy_lengths), ("token", new_seconds, new_lengths)):
+        truncated = sum(1 for n in lengths if n > MAX_TOKENS)
+        print(f"{name:>10}: {seconds / len(entries) * 1000:7.2f} ms/entry  chunks {len(lengths):6d}  "
+              f"over {MAX_TOKENS} tokens {truncated / len(lengths):6.1%}  "
+              f"avg fill {sum(min(n, MAX_TOKENS) for n in lengths) / len(lengths) / MAX_TOKENS:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
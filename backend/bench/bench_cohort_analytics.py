@@ -0,0 +1,51 @@
+"""Throughput of the vectorized cohort analytics at millions of entries.
+
+    cd backend && python bench/bench_cohort_analytics.py --entries 1000000 5000000 --users 100000
+
+Generates synthetic (user_id, timestamp, weighted_mood) columns already in
+(user_id, timestamp) order and times mood_analytics.analyze_block on them, so
+the number reflects the NumPy work without Mongo transfer time.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from mood_analytics import analyze_block
+
+
+def synthetic(entries: int, users: int, rng: np.random.Generator):
+    user_index = np.sort(rng.integers(0, users, entries))
+    user_ids = np.array([f"user_{i}" for i in range(users)], dtype=object)[user_index]
+    # Per-user increasing timestamps over the last ~180 days
+    offsets = rng.integers(0, 180 * 24 * 3600, entries)
+    order = np.lexsort((offsets, user_index))
+    timestamps = np.datetime64("2026-01-01T00:00:00", "us") + offsets[order].astype("timedelta64[s]")
+    moods = np.clip(rng.normal(0.1, 0.4, entries), -1, 1)
+    return user_ids[order], timestamps, moods
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    window_start = np.datetime64("2026-05-31T00:00:00", "us")
+    for entries in args.entries:
+        users, timestamps, moods = synthetic(entries, args.users, rng)
+        started = time.perf_counter()
+        report = analyze_block(users, timestamps, moods, window_start)
+        elapsed = time.perf_counter() - started
+        declined = sum(r["mood_decline"] for r in report)
+        print(f"{entries:>10} entries / {args.users} users: {elapsed:6.2f} s  "
+              f"({entries / elapsed / 1e6:5.2f} M entries/s)  {len(report)} active, {declined} declined")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Per-page cost of GET /goals/ as the goals collection grows (local mongod).
+
+    cd backend && python bench/bench_goal_listing.py --mongo-url mongodb://localhost:27017 --sizes 10000 100000 500000
+
+For each collection size, times the first page and a page deep into one
+user's history with keyset pagination and the list projection. With the
+(user_id, updated_at, _id) index both stay flat as the collection grows.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import database
+
+USERS = 1000
+
+
+def fake_goal(rng: random.Random, now: datetime):
+    updated = now - timedelta(minutes=rng.randrange(500000))
+    return {
+        "user_id": f"user_{rng.randrange(USERS)}",
+        "title": "Exercise 3x a week",
+        "description": "Go to the gym on Monday, Wednesday and Friday" * 3,
+        "summary": "Build a sustainable routine." * 5,
+        "subtasks": [{"description": f"Step {i} " * 10, "completed": rng.random() < 0.5} for i in range(6)],
+        "status": rng.choice(["Not Started", "In Progress", "Completed"]),
+        "progress_percentage": rng.randrange(101),
+        "start_date": updated, "end_date": updated + timedelta(days=30),
+        "created_at": updated, "updated_at": updated,
+    }
+
+
+async def time_page(get_goal, pages: int, **kwargs):
+    cursor, elapsed = None, []
+    for _ in range(pages):
+        t0 = time.perf_counter()
+        _, cursor = await get_goal(cursor=cursor, **kwargs)
+        elapsed.append((time.perf_counter() - t0) * 1000)
+        if cursor is None:
+            break
+    return elapsed[0], elapsed[-1], len(elapsed)
+
+
+async def main(mongo_url: str, sizes):
+    database.client = AsyncIOMotorClient(mongo_url)
+    database.db = database.client["bench_goal_listing"]
+    database.goal_collection = database.db["goals"]
+
+    from crud.goals_crud import get_goal
+    from indexes import apply_indexes
+
+    await database.db.drop_collection("goals")
+    await apply_indexes(database.db)
+    rng, now, inserted = random.Random(0), datetime.now(timezone.utc), 0
+
+    for size in sorted(sizes):
+        while inserted < size:
+            batch = [fake_goal(rng, now) for _ in range(min(10000, size - inserted))]
+            await database.goal_collection.insert_many(batch)
+            inserted += len(batch)
+
+        first, deep, pages = await time_page(get_goal, 20, user_id="user_1", limit=20, view="list")
+        print(f"{size:>9} goals: first page {first:6.2f} ms  page {pages} {deep:6.2f} ms")
+
+    await database.client.drop_database("bench_goal_listing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    args = parser.parse_args()
+    asyncio.run(main(args.mongo_url, args.sizes))
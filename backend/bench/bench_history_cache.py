@@ -0,0 +1,143 @@
+"""/get_progress reads straight from Mongo vs through the per-user history cache.
+
+    cd backend && python bench/bench_history_cache.py --mongo-url mongodb://localhost:27017 --users 2000 --entries 200 --reads 20000 --rtt-ms 20
+
+Seeds --users users with --entries journal documents each, then issues --reads
+progress reads (limit --limit) for users drawn from a Zipf-like distribution,
+so a small set of active users gets most of the traffic. Every --write-every'th
+request is a new entry instead, written through to the cache. The same request
+plan is replayed once with the query get_user_progress uses and once through a
+HistoryCache per --max-mb setting (loading on a miss, the way
+crud/journal_history does), reporting p50/p99 read latency, hit rate and cache
+memory. --rtt-ms adds a sleep before every Mongo call, standing in for the
+round trip to a remote cluster.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import EMOJI_MAP, GO_EMOTIONS_LABELS
+from emotion_vectors import vector_fields, unpack_vectors, top_k_rows
+from history_cache import HistoryCache, PROJECTION
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def entry(user: int, ts: datetime):
+    scores = {label: random.random() for label in random.sample(GO_EMOTIONS_LABELS, 6)}
+    return {
+        "_id": ObjectId(),
+        "user_id": f"user_{user}",
+        "timestamp": ts,
+        "emoji": random.choice(list(EMOJI_MAP)),
+        "weighted_mood": random.uniform(-1, 1),
+        "z_score": random.gauss(0, 1),
+        "cusum": random.random(),
+        "mood_decline": False,
+        **vector_fields(scores),
+    }
+
+
+async def seed(collection, users: int, entries: int):
+    start = datetime(2024, 1, 1)
+    docs = []
+    for user in range(users):
+        docs.extend(entry(user, start + timedelta(hours=i)) for i in range(entries))
+        if len(docs) >= 10000:
+            await collection.insert_many(docs)
+            docs = []
+    if docs:
+        await collection.insert_many(docs)
+    await collection.create_index([("user_id", 1), ("timestamp", -1)])
+
+
+async def find(collection, user_id: str, limit: int, rtt: float):
+    await asyncio.sleep(rtt)
+    cursor = collection.find({"user_id": user_id}, projection=PROJECTION).sort("timestamp", 1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def read_direct(collection, user_id: str, limit: int, rtt: float):
+    items = await find(collection, user_id, limit, rtt)
+    return top_k_rows(unpack_vectors(items))
+
+
+async def read_cached(cache: HistoryCache, collection, user_id: str, limit: int, rtt: float):
+    found, series = cache.get(user_id)
+    if not found:
+        token = cache.begin_load(user_id)
+        series = cache.finish_load(user_id, token, await find(collection, user_id, cache.max_entries + 1, rtt))
+    if series is not None and series.covers(limit):
+        return series.progress_series(limit)
+    return await read_direct(collection, user_id, limit, rtt)
+
+
+async def run(name, read, collection, plan, rtt: float, cache: HistoryCache = None):
+    latencies = []
+    for user_id, write in plan:
+        if write:
+            doc = entry(int(user_id.split("_")[1]), datetime.utcnow())
+            await asyncio.sleep(rtt)
+            await collection.insert_one(doc)
+            if cache is not None:
+                cache.record_insert(user_id, doc)
+            continue
+        t0 = time.perf_counter()
+        await read(user_id)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    extra = ""
+    if cache is not None:
+        stats = cache.stats()
+        extra = f"   hit rate {stats['hit_rate']:.1%}   {stats['users']} users / {stats['bytes'] / 2**20:.1f} MiB   {stats['evictions']} evictions"
+    print(f"{name:<18} p50 {percentile(latencies, 0.5):7.2f} ms   p99 {percentile(latencies, 0.99):7.2f} ms{extra}")
+
+
+async def main(args):
+    random.seed(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client["bench_history_cache"]
+    collection = db["journals"]
+    rtt = args.rtt_ms / 1000.0
+    try:
+        await seed(collection, args.users, args.entries)
+        weights = [1 / (rank + 1) ** args.zipf for rank in range(args.users)]
+        users = random.choices(range(args.users), weights=weights, k=args.reads)
+        plan = [(f"user_{u}", args.write_every and i % args.write_every == 0) for i, u in enumerate(users)]
+        print(f"{args.users} users x {args.entries} entries, {args.reads} requests, zipf {args.zipf}, "
+              f"simulated RTT {args.rtt_ms} ms")
+
+        await run("mongo", lambda u: read_direct(collection, u, args.limit, rtt), collection, plan, rtt)
+        for max_mb in args.max_mb:
+            cache = HistoryCache(max_bytes=int(max_mb * 2**20), max_entries_per_user=args.max_entries)
+            await run(f"cache {max_mb:g} MiB", lambda u: read_cached(cache, collection, u, args.limit, rtt),
+                      collection, plan, rtt, cache)
+    finally:
+        await client.drop_database("bench_history_cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--write-every", type=int, default=5, help="every Nth request is a new entry (0: reads only)")
+    parser.add_argument("--max-entries", type=int, default=512)
+    parser.add_argument("--max-mb", type=float, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,85 @@
+"""Throughput of the inference process pool across process/thread layouts.
+
+    cd backend && python bench/bench_inference_pool.py --layouts 1x8 2x4 4x2 8x1 --chunks 512
+
+Each PROCESSESxTHREADS layout runs in a fresh interpreter (forking after torch
+has run a forward pass is unsafe, so layouts can't share a parent). Reports
+chunks/second with --batch-size chunks per request and the in-process
+baseline (0 processes) for comparison.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SENTENCES = [
+    "I had a really good talk with my sister today and feel lighter.",
+    "Work was overwhelming and I snapped at a coworker, which I regret.",
+    "Feeling anxious about money again, the rent is due next week.",
+    "Went for a run in the rain and it was oddly wonderful.",
+]
+
+
+def run_layout(processes: int, threads: int, chunks: int, batch_size: int):
+    import torch
+    from transformers import AutoTokenizer
+    from config import EMOTION_MODEL_ID, EMOTION_ONNX_DIR
+    from inference_backends import load_emotion_pipeline, predict_token_ids
+    from inference_pool import InferencePool
+
+    tokenizer = AutoTokenizer.from_pretrained(EMOTION_MODEL_ID)
+    rng = random.Random(0)
+    texts = [" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 12))) for _ in range(chunks)]
+    ids = [tokenizer(t, add_special_tokens=False)["input_ids"] for t in texts]
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+    if processes == 0:
+        pipe = load_emotion_pipeline("torch", EMOTION_MODEL_ID, threads, EMOTION_ONNX_DIR)
+        predict_token_ids(pipe, batches[0])
+        run, workers = (lambda b: predict_token_ids(pipe, b)), 1
+    else:
+        torch.set_num_threads(1)
+        pipe = load_emotion_pipeline("torch", EMOTION_MODEL_ID, 1, EMOTION_ONNX_DIR)
+        pool = InferencePool(processes, threads)
+        pool.start(pipe)
+        run, workers = pool.run, processes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run, batches))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"processes": processes, "threads": threads, "chunks_per_second": chunks / elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--layouts", nargs="+", default=["0x4", "1x4", "2x2", "4x1"])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        processes, threads = map(int, args.child.split("x"))
+        run_layout(processes, threads, args.chunks, args.batch_size)
+        return
+
+    print(f"{os.cpu_count()} CPUs, {args.chunks} chunks in batches of {args.batch_size}")
+    for layout in args.layouts:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", layout, "--chunks", str(args.chunks), "--batch-size", str(args.batch_size)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report = json.loads(out.strip().splitlines()[-1])
+        label = "in-process" if report["processes"] == 0 else f"{report['processes']} proc"
+        print(f"{label:>10} x {report['threads']} threads: {report['chunks_per_second']:8.1f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
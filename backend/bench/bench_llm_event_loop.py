@@ -0,0 +1,88 @@
+"""Offline load test for the goal endpoints with the fake LLM provider.
+
+    cd backend && pip install mongomock-motor httpx && python bench/bench_llm_event_loop.py --requests 200
+
+Fires concurrent POST /goals/ and PUT /goals/{id}/subtask/ calls against the app
+in-process (mongomock-motor stands in for Mongo) while a probe task measures how
+late the event loop wakes it up. With non-blocking LLM calls the lag stays flat
+no matter how many completions are in flight.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+
+# Swap the real cluster for an in-memory one before any crud module binds collections
+database.client = AsyncMongoMockClient()
+database.db = database.client["db"]
+database.goal_collection = database.db["goals"]
+database.mood_state_collection = database.db["mood_state"]
+
+import httpx
+from main import app
+
+GOAL = {
+    "title": "Study for finals",
+    "description": "Review all lecture notes and do practice exams",
+    "achievable": True,
+    "relevant": "I want to pass with a good grade",
+    "start_date": "2026-01-05",
+    "end_date": "2026-02-01",
+    "reminder_frequency": "daily",
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def probe_lag(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - t0 - interval) * 1000)
+
+
+async def main(requests: int, concurrency: int):
+    lags, latencies = [], []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(stop, lags))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await client.post("/goals/", json=GOAL)
+                goal_id = response.json().get("goal_id")
+                if goal_id:
+                    await client.put(f"/goals/{goal_id}/subtask/", json={"subtask_index": random.randint(0, 2), "completed": True})
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    print(f"{requests} create+toggle flows in {elapsed:.2f}s ({requests / elapsed:.1f}/s) at concurrency {concurrency}")
+    print(f"flow latency   p50 {percentile(latencies, 0.5):8.1f} ms  p99 {percentile(latencies, 0.99):8.1f} ms")
+    print(f"event-loop lag p50 {percentile(lags, 0.5):8.2f} ms  p99 {percentile(lags, 0.99):8.2f} ms  max {max(lags, default=0):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,108 @@
+"""Concurrency and latency check for PUT /goals/{id}/subtask/ against a local mongod.
+
+    cd backend && python bench/bench_subtask_toggle.py --mongo-url mongodb://localhost:27017 --toggles 500
+
+Fires hundreds of parallel toggles at one goal, first through the old
+update/find/update sequence and then through the single find_one_and_update,
+and checks that the stored progress_percentage and status agree with the stored
+subtasks. Requires MongoDB 5.0+ (pipeline updates with $dateDiff); mongomock
+does not implement them.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import database
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def legacy_update(collection, goal_id: str, index: int, completed: bool):
+    """The previous three round-trip implementation (without the streak branch)"""
+    from crud.goals_crud import calculate_progress
+
+    await collection.update_one({"_id": ObjectId(goal_id)}, {"$set": {f"subtasks.{index}.completed": completed}})
+    goal = await collection.find_one({"_id": ObjectId(goal_id)})
+    progress = calculate_progress(goal.get("subtasks", []))
+    status = "Completed" if progress == 100 else ("In Progress" if progress > 0 else "Not Started")
+    await collection.update_one({"_id": ObjectId(goal_id)}, {"$set": {"progress_percentage": progress, "status": status}})
+
+
+async def run(name, toggle, collection, goal_id, subtasks, toggles, concurrency):
+    from crud.goals_crud import calculate_progress
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            t0 = time.perf_counter()
+            await toggle(goal_id, random.randrange(subtasks), random.random() < 0.5)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(toggles)))
+    goal = await collection.find_one({"_id": ObjectId(goal_id)})
+    expected = calculate_progress(goal["subtasks"])
+    consistent = goal["progress_percentage"] == expected
+    print(f"{name:>8}: p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms  "
+          f"stored progress {goal['progress_percentage']}% vs subtasks {expected}%  {'OK' if consistent else 'INCONSISTENT'}")
+    return consistent
+
+
+async def main(mongo_url: str, toggles: int, subtasks: int, concurrency: int):
+    database.client = AsyncIOMotorClient(mongo_url)
+    database.db = database.client["bench_subtask_toggle"]
+    database.goal_collection = database.db["goals"]
+    database.feedback_job_collection = database.db["feedback_jobs"]
+
+    from crud import goals_crud
+    from schemas.goals_schemas import SubTaskUpdate
+
+    collection = database.goal_collection
+    await database.db.drop_collection("goals")
+    await database.db.drop_collection("feedback_jobs")
+    await goals_crud.FEEDBACK_JOBS.start()
+
+    def new_goal():
+        return {
+            "title": "Bench goal", "summary": "Bench", "reminder_frequency": "daily",
+            "subtasks": [{"description": f"Task {i}", "completed": False} for i in range(subtasks)],
+            "progress_percentage": 0, "status": "Not Started", "current_streak": 0,
+        }
+
+    legacy_id = str((await collection.insert_one(new_goal())).inserted_id)
+    atomic_id = str((await collection.insert_one(new_goal())).inserted_id)
+
+    async def atomic(goal_id, index, completed):
+        await goals_crud.update_subtask_status(goal_id, SubTaskUpdate(subtask_index=index, completed=completed))
+
+    ok_legacy = await run("legacy", lambda g, i, c: legacy_update(collection, g, i, c), collection, legacy_id, subtasks, toggles, concurrency)
+    ok_atomic = await run("atomic", atomic, collection, atomic_id, subtasks, toggles, concurrency)
+
+    await goals_crud.FEEDBACK_JOBS.stop()
+    await database.client.drop_database("bench_subtask_toggle")
+    if not ok_legacy:
+        print("(the legacy path is expected to drift under concurrency)")
+    sys.exit(0 if ok_atomic else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--toggles", type=int, default=500)
+    parser.add_argument("--subtasks", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.mongo_url, args.toggles, args.subtasks, args.concurrency))
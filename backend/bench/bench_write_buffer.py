@@ -0,0 +1,117 @@
+"""Journal insert throughput and latency: per-request insert_one vs the write buffer.
+
+    cd backend && python bench/bench_write_buffer.py --mongo-url mongodb://localhost:27017 --inserts 20000 --concurrency 256 --rtt-ms 20
+
+Fires concurrent single-entry inserts three ways:
+- direct: insert_one per entry
+- group: buffered insert_many, each caller waits for its batch
+- behind: buffered insert_many, callers return once buffered
+
+Reports inserts/s and p50/p99 caller latency for each. --rtt-ms adds a sleep
+before every Mongo call, standing in for the round trip to a remote TLS
+cluster that a local mongod doesn't have.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from write_buffer import WriteBuffer
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class RemoteCollection:
+    """Adds a fixed round-trip delay in front of a Motor collection"""
+
+    def __init__(self, collection, rtt_s: float):
+        self.collection = collection
+        self.name = collection.name
+        self.rtt = rtt_s
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(self.rtt)
+        return await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(self.rtt)
+        return await self.collection.insert_many(docs, ordered=ordered)
+
+
+def entry(i: int, users: int):
+    return {
+        "user_id": f"user_{i % users}",
+        "timestamp": datetime.utcnow(),
+        "emoji": "Good",
+        "emoji_score": 0.5,
+        "text": "Went for a walk and felt calmer afterwards.",
+        "text_polarity": 0.4,
+        "weighted_mood": 0.43,
+        "z_score": 0.1,
+        "cusum": 0.0,
+        "mood_decline": False,
+    }
+
+
+async def run(mode: str, collection, inserts: int, concurrency: int, users: int, batch_size: int, wait_ms: float):
+    buffer = WriteBuffer(collection, max_batch_size=batch_size, max_wait_ms=wait_ms) if mode != "direct" else None
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            t0 = time.perf_counter()
+            if buffer is None:
+                await collection.insert_one(entry(i, users))
+            else:
+                await buffer.insert(entry(i, users), wait=mode == "group")
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(inserts)))
+    if buffer is not None:
+        await buffer.stop()  # write-behind isn't done until the buffer is drained
+    elapsed = time.perf_counter() - started
+
+    extra = ""
+    if buffer is not None:
+        stats = buffer.stats()
+        extra = f"  avg batch {stats['avg_batch_size']:.1f} ({stats['batches_total']} insert_many)"
+    print(f"{mode:<7} {inserts / elapsed:9.0f} inserts/s   p50 {percentile(latencies, 0.5):7.2f} ms"
+          f"   p99 {percentile(latencies, 0.99):7.2f} ms{extra}")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client["bench_write_buffer"]
+    collection = RemoteCollection(db["journals"], args.rtt_ms / 1000.0)
+    print(f"{args.inserts} inserts, concurrency {args.concurrency}, simulated RTT {args.rtt_ms} ms")
+    try:
+        for mode in ("direct", "group", "behind"):
+            await db.drop_collection("journals")
+            await run(mode, collection, args.inserts, args.concurrency, args.users, args.batch_size, args.max_wait_ms)
+            count = await db["journals"].count_documents({})
+            assert count == args.inserts, f"{mode}: expected {args.inserts} documents, found {count}"
+    finally:
+        await client.drop_database("bench_write_buffer")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--inserts", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
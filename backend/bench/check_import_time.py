@@ -0,0 +1,58 @@
+"""Import-time budget for `import main`, measured with `python -X importtime`.
+
+    cd backend && python bench/check_import_time.py --budget-ms 800
+
+Checks each APP_ROLE in a fresh interpreter: the cumulative import time of
+main must stay under budget, and no role may import the ML stack at import
+time (goal-only workers must never import it at all). Exits non-zero on a
+breach.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 800
+ML_MODULES = {"torch", "transformers", "nltk", "onnxruntime", "optimum"}
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def measure(role: str):
+    env = dict(os.environ, APP_ROLE=role)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    cumulative_us, modules = 0, set()
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        module = match.group(4)
+        modules.add(module.split(".")[0])
+        if module == "main":
+            cumulative_us = int(match.group(2))
+    return cumulative_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--roles", nargs="+", default=["goals", "journal", "all"])
+    args = parser.parse_args()
+
+    failed = False
+    for role in args.roles:
+        elapsed_ms, modules = measure(role)
+        heavy = sorted(ML_MODULES & modules)
+        ok = elapsed_ms <= args.budget_ms and not heavy
+        failed = failed or not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  APP_ROLE={role:<8} import main {elapsed_ms:8.1f} ms (budget {args.budget_ms:.0f})"
+              + (f"  imports ML modules: {', '.join(heavy)}" if heavy else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
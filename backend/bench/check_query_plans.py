@@ -0,0 +1,91 @@
+"""Fails if any hot query in indexes.HOT_QUERIES needs a COLLSCAN or an in-memory SORT.
+
+    cd backend && python bench/check_query_plans.py --mongo-url mongodb://localhost:27017
+
+Applies indexes.INDEXES to a scratch database, seeds a little data so the
+planner has something to choose between, and inspects the winning plan of
+every hot query. Run it before deploying changes that add or reshape queries.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import HOT_QUERIES, apply_indexes
+
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+
+def winning_stages(explain: dict):
+    """All stage names that appear under any winningPlan in an explain document"""
+    stages = []
+
+    def walk(node, in_winning):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if in_winning and key == "stage" and isinstance(value, str):
+                    stages.append(value)
+                walk(value, in_winning or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winning)
+
+    walk(explain, False)
+    return stages
+
+
+async def seed(db):
+    now = datetime.utcnow()
+    await db.journals.insert_many([
+        {"user_id": f"u{i % 20}", "timestamp": now - timedelta(hours=i), "weighted_mood": 0.1, "text": "x"}
+        for i in range(2000)
+    ])
+    await db.goals.insert_many([
+        {"user_id": f"u{i % 20}", "updated_at": now - timedelta(minutes=i), "status": "In Progress", "subtasks": []}
+        for i in range(500)
+    ])
+    await db.mood_state.insert_many([{"user_id": f"u{i}", "recent": []} for i in range(20)])
+    await db.feedback_jobs.insert_many([{"_id": f"g{i}", "status": "done" if i % 10 else "pending"} for i in range(200)])
+
+
+async def explain(db, query: dict) -> dict:
+    if "pipeline" in query:
+        return await db.command("aggregate", query["collection"], pipeline=query["pipeline"], explain=True)
+    cursor = db[query["collection"]].find(query.get("filter", {}), projection=query.get("projection"))
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    if query.get("limit"):
+        cursor = cursor.limit(query["limit"])
+    return await cursor.explain()
+
+
+async def main(mongo_url: str) -> int:
+    client = AsyncIOMotorClient(mongo_url)
+    db = client["query_plan_check"]
+    await client.drop_database("query_plan_check")
+    try:
+        await apply_indexes(db)
+        await seed(db)
+        failures = 0
+        for query in HOT_QUERIES:
+            stages = winning_stages(await explain(db, query))
+            bad = sorted(FORBIDDEN_STAGES.intersection(stages))
+            failures += bool(bad)
+            print(f"{'FAIL' if bad else ' ok '}  {query['name']:<40} {' > '.join(stages)}")
+        return 1 if failures else 0
+    finally:
+        await client.drop_database("query_plan_check")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.mongo_url)))
@@ -0,0 +1,452 @@
+"""Offline load test for the API hot paths, with per-endpoint latency percentiles.
+
+    cd backend && pip install httpx mongomock-motor
+    python bench/load_test.py --mongo-url mongodb://localhost:27017 --duration 30 --concurrency 64
+    python bench/load_test.py --mongo-url mock --duration 10        # no mongod at all
+    python bench/load_test.py ... --compare bench/results/load_test-<commit>.json
+
+The app runs in-process behind httpx's ASGI transport. Its startup and shutdown
+hooks run as they do under uvicorn. Dependencies are replaced as follows:
+- Mongo: a throwaway database on a local mongod, or mongomock-motor
+- emotion model: a stub tokenizer plus a fixed-cost scorer (--model stub), or
+  the configured model (--model real)
+- Groq: the fake LLM provider
+
+Closed-loop workers run a weighted traffic mix over a seeded user population.
+The script writes throughput and p50/p95/p99 per endpoint to JSON, tagged with
+the git commit, so runs can be compared across commits.
+
+mongomock implements neither pipeline updates nor $dateTrunc. With
+--mongo-url mock, the subtask toggle and summary endpoints are therefore
+dropped from the mix.
+
+Overload: requests turned away by admission control (429/503) are counted as
+"shed", not as errors. Percentiles cover admitted requests only. Clients back
+off for the Retry-After they are given, capped at --retry-after-cap. To compare
+p99 with and without admission control at many times the model's capacity:
+
+    python bench/load_test.py --mongo-url mock --concurrency 512 --model-base-ms 100 --model-chunk-ms 25 --mix submit_entry=85,get_progress=15 --admission off
+    python bench/load_test.py --mongo-url mock --concurrency 512 --model-base-ms 100 --model-chunk-ms 25 --mix submit_entry=85,get_progress=15 --admission on
+
+Clients and server share one event loop here, so clients that retry shed
+requests faster than Retry-After asks (a low --retry-after-cap) spend the
+server's CPU on the harness and inflate every latency.
+
+The per-client buckets are loose by default so the global limits and the SLO
+shedding are what show; set ADMISSION_JOURNAL_CLIENT_RATE to exercise 429s.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("EMOTION_MODEL_LOAD", "lazy")  # the stub (or real) model is installed below
+os.environ.setdefault("ADMISSION_JOURNAL_CLIENT_RATE", "1000")  # a few hundred users drive far more traffic than real ones
+os.environ.setdefault("ADMISSION_GOALS_CLIENT_RATE", "1000")
+
+import database
+
+DB_NAME = "bench_load_test"
+
+DEFAULT_MIX = {
+    "submit_entry": 35,
+    "get_progress": 25,
+    "progress_summary": 10,
+    "list_goals": 15,
+    "toggle_subtask": 12,
+    "create_goal": 3,
+    "import_entries": 0,
+}
+NEEDS_REAL_MONGO = {"toggle_subtask", "progress_summary"}
+
+EMOJIS = ["Amazing", "Good", "Okay", "Down", "Stressed"]
+SENTENCES = [
+    "Work was busy today and I barely had time for lunch.",
+    "I went for a long walk in the park and felt calmer afterwards.",
+    "My sister called and we laughed about old family trips.",
+    "I keep worrying about the exam next week.",
+    "Honestly I feel pretty tired and a bit lonely tonight.",
+    "Finished the report early, which felt great.",
+    "The meeting went badly and I am annoyed with myself.",
+    "Cooked a new recipe and it actually turned out well.",
+    "Could not sleep much, my mind would not stop racing.",
+    "Grateful for my friends who checked in on me.",
+    "Traffic was awful and I was late again.",
+    "I am proud that I stuck to my workout plan this week.",
+]
+GOAL = {
+    "title": "Run a 10k",
+    "description": "Build up from 3 runs a week to a full 10k race",
+    "achievable": True,
+    "relevant": "I want to feel fitter and less stressed",
+    "start_date": "2026-01-05",
+    "end_date": "2026-03-01",
+    "reminder_frequency": "weekly",
+}
+
+
+# --- stand-ins ---------------------------------------------------------------
+
+class StubTokenizer:
+    """Whitespace/punctuation tokenizer with offset mapping, enough for chunk_text"""
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        matches = list(re.finditer(r"\w+|[^\w\s]", text))
+        ids = [int.from_bytes(hashlib.blake2b(m.group().lower().encode(), digest_size=2).digest(), "little") for m in matches]
+        encoding = {"input_ids": ids}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = [m.span() for m in matches]
+        return encoding
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class StubPipeline:
+    tokenizer = StubTokenizer()
+
+
+def make_stub_predict(base_ms: float, per_chunk_ms: float):
+    from config import GO_EMOTIONS_LABELS
+
+    def predict(pipe, chunks):
+        # Blocking sleep: the real forward pass also holds its worker thread
+        time.sleep((base_ms + per_chunk_ms * len(chunks)) / 1000.0)
+        results = []
+        for chunk in chunks:
+            rng = random.Random(hash(tuple(chunk[:64])))
+            raw = [rng.random() ** 4 for _ in GO_EMOTIONS_LABELS]
+            total = sum(raw)
+            results.append({label: value / total for label, value in zip(GO_EMOTIONS_LABELS, raw)})
+        return results
+
+    return predict
+
+
+def use_mongo(mongo_url: str):
+    """Points the database module at the bench database before any crud module binds it"""
+    if mongo_url == "mock":
+        from mongomock_motor import AsyncMongoMockClient
+        database.client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database.client = AsyncIOMotorClient(mongo_url)
+    database.db = database.client[DB_NAME]
+    database.goal_collection = database.db["goals"]
+    database.mood_state_collection = database.db["mood_state"]
+    database.feedback_job_collection = database.db["feedback_jobs"]
+
+
+async def install_model(kind: str, base_ms: float, per_chunk_ms: float):
+    from crud import journal_crud
+
+    if kind == "real":
+        await journal_crud.init_emotion_model()
+        if journal_crud.MODEL_STATE["status"] != "ready":
+            raise SystemExit(f"Emotion model failed to load: {journal_crud.MODEL_STATE['error']}")
+        return
+    journal_crud.predict_token_ids = make_stub_predict(base_ms, per_chunk_ms)
+    journal_crud.MODEL_PIPELINE = StubPipeline()
+    journal_crud.MODEL_STATE.update(status="ready", punkt="missing")
+    journal_crud.EMOTION_BATCHER.start()
+
+
+# --- traffic -----------------------------------------------------------------
+
+def journal_text(rng: random.Random) -> str:
+    # Mostly short check-ins with an occasional long entry that needs several chunks
+    n = rng.choice([0, 1, 2, 3, 4, 6]) if rng.random() < 0.95 else rng.randint(40, 120)
+    return " ".join(rng.choice(SENTENCES) for _ in range(n))
+
+
+class Traffic:
+    def __init__(self, client, users: int, rng: random.Random):
+        self.client = client
+        self.users = [f"load_user_{i}" for i in range(users)]
+        self.rng = rng
+        self.goals = {}  # user_id -> [goal_id]
+        self.clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def user(self) -> str:
+        return self.rng.choice(self.users)
+
+    def next_timestamp(self) -> str:
+        # Strictly increasing timestamps keep mood_state on its append path
+        self.clock += timedelta(seconds=self.rng.randint(60, 3600))
+        return self.clock.isoformat()
+
+    async def submit_entry(self, user_id=None):
+        return await self.client.post("/submit_entry", json={
+            "user_id": user_id or self.user(),
+            "emoji": self.rng.choice(EMOJIS),
+            "text": journal_text(self.rng),
+            "timestamp": self.next_timestamp(),
+        })
+
+    async def import_entries(self, lines: int = 200):
+        user_id = self.user()
+        body = "\n".join(json.dumps({
+            "user_id": user_id,
+            "emoji": self.rng.choice(EMOJIS),
+            "text": journal_text(self.rng),
+            "timestamp": self.next_timestamp(),
+        }) for _ in range(lines))
+        response = await self.client.post("/import_entries", content=body.encode(),
+                                          headers={"content-type": "application/x-ndjson"})
+        await response.aread()
+        return response
+
+    async def get_progress(self):
+        return await self.client.get(f"/get_progress/{self.user()}", params={"limit": 100})
+
+    async def progress_summary(self):
+        return await self.client.get(f"/get_progress/{self.user()}/summary", params={"bucket": "day", "points": 200})
+
+    async def list_goals(self):
+        return await self.client.get("/goals/", params={"user_id": self.user(), "view": "list", "limit": 20})
+
+    async def create_goal(self, user_id=None):
+        user_id = user_id or self.user()
+        response = await self.client.post("/goals/", json={**GOAL, "user_id": user_id})
+        goal_id = response.json().get("goal_id")
+        if goal_id:
+            self.goals.setdefault(user_id, []).append(goal_id)
+        return response
+
+    async def toggle_subtask(self):
+        user_id = self.rng.choice([u for u in self.goals] or self.users)
+        goal_id = self.rng.choice(self.goals[user_id]) if user_id in self.goals else None
+        if goal_id is None:
+            return await self.create_goal(user_id)
+        return await self.client.put(f"/goals/{goal_id}/subtask/", json={
+            "subtask_index": self.rng.randint(0, 2), "completed": self.rng.random() < 0.6,
+        })
+
+
+async def seed(traffic: Traffic, entries_per_user: int, goals_per_user: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(coro):
+        async with semaphore:
+            response = await coro
+            response.raise_for_status()
+
+    jobs = []
+    for user_id in traffic.users:
+        jobs += [traffic.create_goal(user_id) for _ in range(goals_per_user)]
+        jobs += [traffic.submit_entry(user_id) for _ in range(entries_per_user)]
+    await asyncio.gather(*(guarded(job) for job in jobs))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def summarize(latencies, errors, shed, elapsed):
+    endpoints = {}
+    for name in sorted(set(latencies) | set(errors) | set(shed)):
+        values = sorted(latencies.get(name, []))
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "shed": shed.get(name, 0),
+            "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(values) / len(values) if values else 0.0,
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "max_ms": values[-1] if values else 0.0,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return endpoints, {"requests": total, "errors": sum(errors.values()), "shed": sum(shed.values()),
+                       "throughput_rps": total / elapsed if elapsed else 0.0}
+
+
+async def run_load(traffic: Traffic, mix, duration: float, warmup: float, concurrency: int, retry_after_cap: float):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies = {n: [] for n in names}
+    errors = {}
+    shed = {}
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker():
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            name = traffic.rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            retry_after = None
+            try:
+                response = await getattr(traffic, name)()
+                ok = response.status_code < 400
+                if response.status_code in (429, 503) and "retry-after" in response.headers:
+                    retry_after = float(response.headers["retry-after"])
+            except Exception:
+                ok = False
+            t1 = time.perf_counter()
+            if retry_after is not None:
+                await asyncio.sleep(min(retry_after, retry_after_cap))
+            if t0 < measure_from:
+                continue
+            if ok:
+                latencies[name].append((t1 - t0) * 1000)
+            elif retry_after is not None:
+                shed[name] = shed.get(name, 0) + 1
+            else:
+                errors[name] = errors.get(name, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, shed, duration)
+
+
+# --- reporting ---------------------------------------------------------------
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def print_table(endpoints, total, baseline=None):
+    print(f"{'endpoint':<18}{'reqs':>8}{'err':>6}{'shed':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in endpoints.items():
+        line = (f"{name:<18}{e['requests']:>8}{e['errors']:>6}{e.get('shed', 0):>7}{e['throughput_rps']:>9.1f}"
+                f"{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}{e['p99_ms']:>10.1f}")
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old:
+            def delta(key):
+                return f"{(e[key] / old[key] - 1) * 100:+.0f}%" if old[key] else "n/a"
+            line += f"   vs baseline: rps {delta('throughput_rps')}, p95 {delta('p95_ms')}, p99 {delta('p99_ms')}"
+        print(line)
+    print(f"{'total':<18}{total['requests']:>8}{total['errors']:>6}{total.get('shed', 0):>7}{total['throughput_rps']:>9.1f}")
+
+
+def parse_mix(spec: str):
+    mix = dict(DEFAULT_MIX)
+    if spec:
+        mix = {}
+        for part in spec.split(","):
+            name, weight = part.split("=")
+            if name not in DEFAULT_MIX:
+                raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(DEFAULT_MIX)})")
+            mix[name] = float(weight)
+    return {n: w for n, w in mix.items() if w > 0}
+
+
+async def main(args):
+    use_mongo(args.mongo_url)
+    mix = parse_mix(args.mix)
+    if args.mongo_url == "mock":
+        dropped = sorted(NEEDS_REAL_MONGO & set(mix))
+        if dropped:
+            print(f"mongomock: dropping {', '.join(dropped)} from the mix (needs a real mongod)")
+        mix = {n: w for n, w in mix.items() if n not in NEEDS_REAL_MONGO}
+
+    import httpx
+    import admission
+    from main import app
+
+    await database.client.drop_database(DB_NAME)
+    await app.router.startup()
+    await install_model(args.model, args.model_base_ms, args.model_chunk_ms)
+    try:
+        limits = httpx.Limits(max_connections=None)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test",
+                                     limits=limits, timeout=120) as client:
+            traffic = Traffic(client, args.users, random.Random(args.seed))
+            t0 = time.perf_counter()
+            admission.ENABLED = False  # seeding bursts every user far past their rate limits
+            await seed(traffic, args.seed_entries, args.seed_goals, args.concurrency)
+            print(f"seeded {args.users} users in {time.perf_counter() - t0:.1f}s")
+            admission.ENABLED = args.admission == "on"
+            endpoints, total = await run_load(traffic, mix, args.duration, args.warmup, args.concurrency, args.retry_after_cap)
+    finally:
+        await app.router.shutdown()
+        if not args.keep_db:
+            await database.client.drop_database(DB_NAME)
+
+    from crud.journal_crud import EMOTION_BATCHER, EMOTION_CACHE
+    report = {
+        "git": git_info(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "mongo": "mongomock" if args.mongo_url == "mock" else "mongod",
+            "model": args.model,
+            "model_base_ms": args.model_base_ms,
+            "model_chunk_ms": args.model_chunk_ms,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "seed": args.seed,
+            "mix": mix,
+            "admission": args.admission,
+        },
+        "endpoints": endpoints,
+        "total": total,
+        "emotion_batcher": EMOTION_BATCHER.stats(),
+        "emotion_cache": EMOTION_CACHE.stats(),
+        "admission": {name: gate.stats() for name, gate in admission.GATES.items()},
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"baseline: {baseline['git']['commit']} {baseline['git']['subject']}")
+    print_table(endpoints, total, baseline)
+
+    out = args.out or os.path.join(BACKEND_DIR, "bench", "results", f"load_test-{(report['git']['commit'] or 'nogit')[:10]}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017", help='local mongod URL, or "mock" for mongomock-motor')
+    parser.add_argument("--model", choices=["stub", "real"], default="stub")
+    parser.add_argument("--model-base-ms", type=float, default=8.0, help="stub cost per forward pass")
+    parser.add_argument("--model-chunk-ms", type=float, default=4.0, help="stub cost per chunk in the batch")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of traffic before measuring")
+    parser.add_argument("--concurrency", type=int, default=32, help="closed-loop clients")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed-entries", type=int, default=20, help="journal entries per user before the run")
+    parser.add_argument("--seed-goals", type=int, default=2, help="goals per user before the run")
+    parser.add_argument("--mix", default="", help="e.g. submit_entry=50,get_progress=50 (default: %s)" %
+                        ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--admission", choices=["on", "off"], default="on", help="admission control during the measured run")
+    parser.add_argument("--retry-after-cap", type=float, default=5.0, help="longest a shed client backs off (seconds)")
+    parser.add_argument("--out", help="JSON report path (default: bench/results/load_test-<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    parser.add_argument("--keep-db", action="store_true", help="leave the bench database in place")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""Latency/accuracy trade-off of tiered emotion routing on a labeled sample.
+
+    cd backend && python bench/report_routing.py --go-emotions 2000              # needs `pip install datasets`
+    cd backend && python bench/report_routing.py --sample my_labeled.jsonl       # {"text": ..., "labels": ["joy", ...]}
+
+Each text is scored once by the fast model and once by the full model, one at a
+time as a lone /submit_entry would see them, and each call is timed. The report
+then replays the routing policy from emotion_routing for a grid of
+ROUTE_MAX_FAST_TOKENS x ROUTE_MAX_ENTROPY settings. For every setting it shows:
+- the share of entries that stay on the fast tier
+- mean and p95 model latency (escalations pay for both models)
+- top-1 accuracy against the gold labels
+- top-1 agreement with the full model
+- mean absolute error of the text polarity that feeds weighted_mood, against
+  the full model
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EMOTION_MODEL_ID, EMOTION_FAST_MODEL_ID, EMOTION_BACKEND, EMOTION_ONNX_DIR, EMOTION_FAST_ONNX_DIR
+from emotion_routing import fast_path_eligible, needs_escalation
+from inference_backends import load_emotion_pipeline, predict_token_ids
+from crud.journal_crud import compute_text_polarity, MAX_TOKENS
+
+
+def load_sample(args):
+    if args.sample:
+        with open(args.sample) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return [(r["text"], set(r["labels"])) for r in rows]
+
+    from datasets import load_dataset
+    data = load_dataset("go_emotions", "simplified", split="test").shuffle(seed=0).select(range(args.go_emotions))
+    names = data.features["labels"].feature.names
+    return [(row["text"], {names[i] for i in row["labels"]}) for row in data]
+
+
+def score_one(pipe, text):
+    tokenizer = pipe.tokenizer
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    ids = ids[:MAX_TOKENS - tokenizer.num_special_tokens_to_add()]
+    started = time.perf_counter()
+    scores = predict_token_ids(pipe, [ids])[0]
+    return len(ids), scores, (time.perf_counter() - started) * 1000
+
+
+def top1(scores):
+    return max(scores, key=scores.get)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summarize(name, rows, choose):
+    """choose(row) -> (scores, latency_ms, used_fast)"""
+    picked = [choose(r) for r in rows]
+    latencies = [p[1] for p in picked]
+    return {
+        "policy": name,
+        "fast_share": sum(p[2] for p in picked) / len(rows),
+        "mean_ms": sum(latencies) / len(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "top1_accuracy": sum(top1(p[0]) in r["gold"] for p, r in zip(picked, rows)) / len(rows),
+        "top1_agreement_full": sum(top1(p[0]) == top1(r["full"]) for p, r in zip(picked, rows)) / len(rows),
+        "polarity_mae": sum(abs(compute_text_polarity(p[0]) - r["full_polarity"]) for p, r in zip(picked, rows)) / len(rows),
+    }
+
+
+def main(args):
+    sample = load_sample(args)
+    print(f"Loading {EMOTION_FAST_MODEL_ID} and {EMOTION_MODEL_ID} ({EMOTION_BACKEND}) ...")
+    fast = load_emotion_pipeline(EMOTION_BACKEND, EMOTION_FAST_MODEL_ID, args.threads, EMOTION_FAST_ONNX_DIR)
+    full = load_emotion_pipeline(EMOTION_BACKEND, EMOTION_MODEL_ID, args.threads, EMOTION_ONNX_DIR)
+    for pipe in (fast, full):
+        score_one(pipe, "warmup")
+
+    rows = []
+    for text, gold in sample:
+        fast_tokens, fast_scores, fast_ms = score_one(fast, text)
+        _, full_scores, full_ms = score_one(full, text)
+        rows.append({
+            "gold": gold, "fast_tokens": fast_tokens,
+            "fast": fast_scores, "fast_ms": fast_ms,
+            "full": full_scores, "full_ms": full_ms,
+            "full_polarity": compute_text_polarity(full_scores),
+        })
+
+    results = [
+        summarize("full only", rows, lambda r: (r["full"], r["full_ms"], False)),
+        summarize("fast only", rows, lambda r: (r["fast"], r["fast_ms"], True)),
+    ]
+    for max_tokens in args.max_tokens:
+        for max_entropy in args.max_entropy:
+            def route(r, max_tokens=max_tokens, max_entropy=max_entropy):
+                if not fast_path_eligible(r["fast_tokens"], max_tokens):
+                    return r["full"], r["full_ms"], False
+                if needs_escalation(r["fast"], max_entropy):
+                    return r["full"], r["fast_ms"] + r["full_ms"], False
+                return r["fast"], r["fast_ms"], True
+            results.append(summarize(f"tiered tokens<={max_tokens} entropy<={max_entropy}", rows, route))
+
+    print(f"\n{len(rows)} texts")
+    print(f"{'policy':<38}{'fast':>7}{'mean ms':>9}{'p95 ms':>9}{'top1 acc':>10}{'agree':>8}{'pol MAE':>9}")
+    for r in results:
+        print(f"{r['policy']:<38}{r['fast_share']:>7.0%}{r['mean_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['top1_accuracy']:>10.3f}{r['top1_agreement_full']:>8.3f}{r['polarity_mae']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"texts": len(rows), "fast_model": EMOTION_FAST_MODEL_ID, "full_model": EMOTION_MODEL_ID,
+                       "backend": EMOTION_BACKEND, "results": results}, f, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--sample", help="JSONL with text and labels (go_emotions label names)")
+    source.add_argument("--go-emotions", type=int, help="take N texts from the go_emotions test split")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--max-entropy", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.85, 0.9, 1.0])
+    parser.add_argument("--json", help="also write the results table as JSON")
+    main(parser.parse_args())
@@ -1,4 +1,8 @@
 # backend/config.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()  # Load .env file
 
 EMOJI_MAP = {
     "Amazing": 1.0,
@@ -17,7 +21,130 @@ NEGATIVE_LABELS = {
     "embarrassment", "nervousness", "annoyance", "worry"
 }
 
+# go_emotions label table, in the fixed order journal emotion vectors are stored in.
+# Bump EMOTION_LABELS_VERSION whenever this list changes so old vectors can be told apart.
+GO_EMOTIONS_LABELS = (
+    "admiration", "amusement", "anger", "annoyance", "approval", "caring", "confusion",
+    "curiosity", "desire", "disappointment", "disapproval", "disgust", "embarrassment",
+    "excitement", "fear", "gratitude", "grief", "joy", "love", "nervousness", "optimism",
+    "pride", "realization", "relief", "remorse", "sadness", "surprise", "neutral",
+)
+EMOTION_LABELS_VERSION = 1
+
 ALPHA = 0.3
 WINDOW = 10
+BASELINE_WINDOW = 50  # entries used for the CUSUM baseline mean
 CUSUM_K = 0.1
-CUSUM_H = 0.8
\ No newline at end of file
+CUSUM_H = 0.8
+
+# Emotion model micro-batching
+BATCH_MAX_SIZE = 16       # max chunks per forward pass
+BATCH_MAX_WAIT_MS = 10.0  # how long the first queued chunk may wait for company
+CHUNK_STRIDE = 0          # tokens of trailing sentences repeated at the start of the next chunk
+
+
+# Which routers this worker serves: "all", "goals" (never imports the ML stack) or "journal"
+APP_ROLE = os.getenv("APP_ROLE", "all")
+
+EMOTION_MODEL_ID = "SamLowe/roberta-base-go_emotions"
+# When to load the model: "startup" (block startup), "background" (warm-up task) or "lazy" (first request)
+EMOTION_MODEL_LOAD = os.getenv("EMOTION_MODEL_LOAD", "background")
+EMOTION_MODEL_RETRY_S = float(os.getenv("EMOTION_MODEL_RETRY_S", "30"))  # wait before retrying a failed load
+# Punkt sentence data shipped with the app (populate with: python -m nltk.downloader -d nltk_data punkt_tab)
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data"))
+NLTK_ALLOW_DOWNLOAD = os.getenv("NLTK_ALLOW_DOWNLOAD", "1") == "1"
+
+# Inference backend: "torch" (transformers pipeline) or "onnx" (int8-quantized ONNX Runtime)
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+EMOTION_ONNX_DIR = os.getenv("EMOTION_ONNX_DIR", "models/go_emotions_onnx")
+EMOTION_THREADS = int(os.getenv("EMOTION_THREADS", "0"))  # intra-op threads, 0 = library default
+
+# Tiered classification: short entries are scored by a small distilled go_emotions model
+# first and escalate to EMOTION_MODEL_ID when they're long or the fast scores are ambiguous
+EMOTION_ROUTING = os.getenv("EMOTION_ROUTING", "off")  # "off" or "tiered"
+EMOTION_FAST_MODEL_ID = os.getenv("EMOTION_FAST_MODEL_ID", "joeddav/distilbert-base-uncased-go-emotions-student")
+EMOTION_FAST_ONNX_DIR = os.getenv("EMOTION_FAST_ONNX_DIR", "models/go_emotions_fast_onnx")
+ROUTE_MAX_FAST_TOKENS = int(os.getenv("ROUTE_MAX_FAST_TOKENS", "64"))  # longer entries go straight to the full model
+ROUTE_MAX_ENTROPY = float(os.getenv("ROUTE_MAX_ENTROPY", "0.85"))     # normalized entropy of fast scores, 0 (one label) .. 1 (flat)
+
+# Optional multi-process inference pool (0 = run inference in the API process)
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+INFERENCE_THREADS_PER_PROCESS = int(os.getenv("INFERENCE_THREADS_PER_PROCESS", "1"))
+INFERENCE_PIN_CPUS = os.getenv("INFERENCE_PIN_CPUS", "1") == "1"
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "60"))  # per batch; a worker that takes longer is restarted
+
+# Emotion score cache (in-process LRU/TTL, optional shared Mongo tier)
+EMOTION_CACHE_SIZE = 4096             # max cached chunks per worker
+EMOTION_CACHE_TTL_S = 7 * 24 * 3600
+EMOTION_CACHE_MONGO = os.getenv("EMOTION_CACHE_MONGO", "0") == "1"
+
+# Journal inserts from /submit_entry: "direct" (insert_one per request), "group" (requests
+# share insert_many batches and wait for theirs) or "behind" (return once buffered;
+# per-user reads wait for pending writes, buffered entries are flushed on shutdown)
+JOURNAL_WRITE_MODE = os.getenv("JOURNAL_WRITE_MODE", "direct")
+JOURNAL_WRITE_BATCH_SIZE = 128
+JOURNAL_WRITE_MAX_WAIT_MS = float(os.getenv("JOURNAL_WRITE_MAX_WAIT_MS", "5"))
+JOURNAL_WRITE_MAX_PENDING = 10000  # buffered entries before inserts apply backpressure
+
+# Per-user journal history cache behind /submit_entry and /get_progress: "off", "local"
+# (write-through from this process only; single worker) or "changestream" (also drops
+# users whose journals other workers change; needs a replica set)
+HISTORY_CACHE = os.getenv("HISTORY_CACHE", "off")
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+HISTORY_CACHE_MAX_ENTRIES = 512  # per user, oldest first (the /get_progress head)
+
+# Bulk NDJSON journal import
+IMPORT_BATCH_SIZE = 500               # lines analysed and inserted together
+IMPORT_MAX_LINE_BYTES = 64 * 1024
+
+# LLM client (goal analysis / feedback)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")  # "groq" or "fake" for offline load tests
+LLM_MODEL = "llama-3.1-8b-instant"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_S = 0.5
+LLM_BACKOFF_MAX_S = 4.0
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "800"))
+# Prompt-keyed response cache; identical in-flight prompts always share one upstream call
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))  # 0 disables caching
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(24 * 3600)))
+# Canned feedback by progress/streak bucket: "off", "fallback" (when the LLM fails) or "always" (skip the LLM)
+FEEDBACK_TEMPLATES = os.getenv("FEEDBACK_TEMPLATES", "fallback")
+
+# Admission control for /submit_entry, /import_entries and goal creation. Each route class
+# has a per-client and a global token bucket; a client over its bucket gets 429, and a
+# request over the global one gets 503. Admitted requests then queue for the emotion model or the
+# LLM: interactive requests go first, and a request whose estimated completion (time spent so
+# far, the wait for a slot and its own service time) would exceed the resource's SLO is shed
+# with 503 up front instead of timing out later.
+# Off by default: clients are keyed by the unauthenticated user_id (or the peer address),
+# and the shipped frontend still sends fixed ids, so every user would share one bucket.
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "0") == "1"
+ADMISSION_RATE_LIMITS = {
+    # route class: (per-client tokens/s, per-client burst, global tokens/s, global burst); rate 0 = unlimited
+    "journal": (float(os.getenv("ADMISSION_JOURNAL_CLIENT_RATE", "1")), 10, 500.0, 1000),
+    "import": (1 / 60, 2, 1.0, 4),
+    "goals": (float(os.getenv("ADMISSION_GOALS_CLIENT_RATE", "0.2")), 5, 20.0, 40),
+}
+# Ceiling on entries being analysed at once (bulk imports count as one). The gate sizes itself
+# below this from the measured hold times, see admission.AdmissionGate
+ADMISSION_MODEL_CONCURRENCY = int(os.getenv("ADMISSION_MODEL_CONCURRENCY", "64"))
+ADMISSION_MODEL_MAX_BULK = 1       # of those, bulk imports
+ADMISSION_MODEL_QUEUE = 256
+ADMISSION_MODEL_SLO_S = float(os.getenv("ADMISSION_MODEL_SLO_S", "2"))
+ADMISSION_LLM_CONCURRENCY = LLM_MAX_CONCURRENCY
+ADMISSION_LLM_QUEUE = 64
+ADMISSION_LLM_SLO_S = float(os.getenv("ADMISSION_LLM_SLO_S", "15"))
+
+# Background feedback jobs for subtask updates
+FEEDBACK_WORKERS = int(os.getenv("FEEDBACK_WORKERS", "2"))
+FEEDBACK_QUEUE_MAX = 1000
+FEEDBACK_JOB_LEASE_S = 300  # a running job whose worker died is claimed again after this long
+FEEDBACK_WAIT_MAX_S = 30  # longest a client may long-poll / stream for a result
+
+# Observability: GET /metrics is always on; per-request profiling (send "X-Profile: 1"
+# to get a pyinstrument HTML report instead of the response) must be enabled explicitly
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_S", "0.001"))  # sampling interval
+EVENT_LOOP_LAG_INTERVAL_S = 0.25
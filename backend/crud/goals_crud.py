@@ -1,13 +1,17 @@
-from database import goal_collection
+from database import goal_collection, feedback_job_collection
 from schemas.goals_schemas import goal_create, SubTask, SubTaskUpdate, GoalAnalysis # Import new models
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone, date
 from bson import ObjectId
-import os # For API Key
-from groq import Groq
+from pymongo import ReturnDocument
 import json
-from typing import List, Dict
-# Initialize Groq client with API key from environment variable
-client=Groq()
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from config import LLM_MODEL, FEEDBACK_WORKERS, FEEDBACK_QUEUE_MAX, FEEDBACK_JOB_LEASE_S, FEEDBACK_TEMPLATES
+from feedback_jobs import FeedbackJobQueue
+from pagination import encode_cursor, decode_cursor
+from json_stream import JSONStreamParser
+import metrics
+# Async LLM client (Groq by default, reads the API key from the environment)
+from llm_client import get_llm_client
 
 # --- Utility Functions ---
 
@@ -21,14 +25,19 @@ def calculate_progress(subtasks: List[Dict]) -> int:
     progress = int((completed_tasks / total_tasks) * 100)
     return progress
 
-async def generate_analysis_with_groq(goal: goal_create) -> GoalAnalysis:
-    """Calls Groq API to generate a summary and structured subtasks."""
+ANALYSIS_SYSTEM_PROMPT = "You are an expert goal-setting coach. Respond only with the requested JSON object."
+# IMPORTANT: Pass the Pydantic schema for structured output
+ANALYSIS_RESPONSE_FORMAT = {"type": "json_object", "schema": GoalAnalysis.model_json_schema()}
+ANALYSIS_TEMPERATURE = 0.6 # Increase temperature slightly for better creativity
+# Streaming can't use JSON mode, so the shape (summary first, for early display) is spelled out
+STREAM_FORMAT_PROMPT = """
+    Respond with exactly this shape and nothing else, with "summary" first:
+    {"summary": "<string>", "tasks": [{"description": "<string>", "completed": false}, ...]}
+    """
 
-    # 1. Use Pydantic's built-in schema to get the JSON structure required
-    schema = GoalAnalysis.model_json_schema()
-    
-    # 2. Craft a single, powerful prompt using all goal details
-    user_prompt = f"""
+def _analysis_prompt(goal: goal_create) -> str:
+    # Craft a single, powerful prompt using all goal details
+    return f"""
     Analyze the following student goal:
     Title: "{goal.title}"
     Description: "{goal.description}"
@@ -45,23 +54,31 @@ async def generate_analysis_with_groq(goal: goal_create) -> GoalAnalysis:
     
     The output MUST strictly conform to the provided JSON Schema.
     """
-    
+
+def _fallback_analysis() -> GoalAnalysis:
+    # Fail-safe GoalAnalysis object
+    return GoalAnalysis(
+        summary="AI breakdown failed. Please review.",
+        tasks=[{"description": "Manual breakdown required.", "completed": False}]
+    )
+
+async def generate_analysis_with_groq(goal: goal_create) -> GoalAnalysis:
+    """Calls Groq API to generate a summary and structured subtasks."""
     try:
-        chat_completion = client.chat.completions.create(
+        json_string = await get_llm_client().complete(
             messages=[
-                {"role": "system", "content": "You are an expert goal-setting coach. Respond only with the requested JSON object."},
-                {"role": "user", "content": user_prompt},
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": _analysis_prompt(goal)},
             ],
-            # Use the correct, working model
-            model="llama-3.1-8b-instant", 
-            # IMPORTANT: Pass the Pydantic schema for structured output
-            response_format={"type": "json_object", "schema": schema},
-            temperature=0.6, # Increase temperature slightly for better creativity
+            model=LLM_MODEL,
+            response_format=ANALYSIS_RESPONSE_FORMAT,
+            temperature=ANALYSIS_TEMPERATURE,
+            # Near-identical goals reuse a breakdown; invalid JSON is never cached
+            cache=True,
+            validate=GoalAnalysis.model_validate_json,
         )
         
-        json_string = chat_completion.choices[0].message.content
-        
-        # 3. Parse and Validate: Groq should return clean JSON, which we parse and validate
+        # Parse and Validate: Groq should return clean JSON, which we parse and validate
         analysis_data = json.loads(json_string)
         analysis = GoalAnalysis.model_validate(analysis_data)
         
@@ -69,151 +86,321 @@ async def generate_analysis_with_groq(goal: goal_create) -> GoalAnalysis:
 
     except Exception as e:
         print(f"Error calling Groq API for analysis: {e}")
-        # Return a fail-safe GoalAnalysis object
-        return GoalAnalysis(
-            summary="AI breakdown failed. Please review.",
-            tasks=[{"description": "Manual breakdown required.", "completed": False}]
-        )
+        return _fallback_analysis()
 
 # --- Goal CRUD Operations ---
 
+def build_goal_doc(goal: goal_create, analysis: GoalAnalysis) -> Dict:
+    """The Mongo document for a new goal and its AI breakdown"""
+    goal_dict=goal.model_dump()
+    
+    # 1. Add new fields from analysis
+    goal_dict["subtasks"] = [task.model_dump() for task in analysis.tasks]
+    goal_dict["summary"] = analysis.summary  # Add this field to your goal model later!
+    goal_dict["status"] = "Not Started"
+    goal_dict["progress_percentage"] = 0
+    
+    # 2. Handle dates and timestamps (existing logic)
+    # Convert standard dates to timezone-aware datetime objects for MongoDB
+    goal_dict["start_date"] = datetime.combine(goal_dict["start_date"], datetime.min.time(), tzinfo=timezone.utc)
+    goal_dict["end_date"] = datetime.combine(goal_dict["end_date"], datetime.min.time(), tzinfo=timezone.utc)
+    
+    
+    if "last_completion_date" in goal_dict and goal_dict["last_completion_date"] is not None:
+         # Combine the date object with a time component (midnight) and UTC timezone
+         goal_dict["last_completion_date"] = datetime.combine(
+             goal_dict["last_completion_date"], datetime.min.time(), tzinfo=timezone.utc
+         )
+
+    # 3. Add created_at and updated_at timestamps
+    goal_dict["created_at"] = datetime.now(timezone.utc)
+    goal_dict["updated_at"] = datetime.now(timezone.utc)
+    return goal_dict
+
+async def _insert_goal(goal_dict: Dict) -> str:
+    with metrics.span("mongo.goals.insert_one"):
+        result = await goal_collection.insert_one(goal_dict)
+    return str(result.inserted_id)
+
 async def create_goal(goal:goal_create):
     try:
-        # 1. Generate the full analysis
+        # Generate the full analysis, then store the goal with it
         analysis: GoalAnalysis = await generate_analysis_with_groq(goal)
-        
-        goal_dict=goal.model_dump()
-        
-        # 2. Add new fields from analysis
-        goal_dict["subtasks"] = [task.model_dump() for task in analysis.tasks]
-        goal_dict["summary"] = analysis.summary  # Add this field to your goal model later!
-        goal_dict["status"] = "Not Started"
-        goal_dict["progress_percentage"] = 0
-        
-        # 3. Handle dates and timestamps (existing logic)
-        # 1. Convert standard dates to timezone-aware datetime objects for MongoDB
-        goal_dict["start_date"] = datetime.combine(goal_dict["start_date"], datetime.min.time(), tzinfo=timezone.utc)
-        goal_dict["end_date"] = datetime.combine(goal_dict["end_date"], datetime.min.time(), tzinfo=timezone.utc)
-        
-        
-        if "last_completion_date" in goal_dict and goal_dict["last_completion_date"] is not None:
-             # Combine the date object with a time component (midnight) and UTC timezone
-             goal_dict["last_completion_date"] = datetime.combine(
-                 goal_dict["last_completion_date"], datetime.min.time(), tzinfo=timezone.utc
-             )
+        return await _insert_goal(build_goal_doc(goal, analysis))
+    except Exception as e:
+        print(f"Error creating goal: {e}")
+        return None
 
-        # 2. Add created_at and updated_at timestamps
-        goal_dict["created_at"] = datetime.now(timezone.utc)
-        goal_dict["updated_at"] = datetime.now(timezone.utc)
+async def stream_goal_creation(goal: goal_create) -> AsyncIterator[Tuple[str, Dict]]:
+    """Creates a goal while streaming its breakdown as (event, data) pairs.
 
-        result = await goal_collection.insert_one(goal_dict)
-        return str(result.inserted_id)
+    Events: "summary" as soon as the summary string is complete, one "subtask" per
+    task as it arrives, then "goal" with the stored goal_id once the whole analysis
+    validates. If the stream fails or doesn't validate, a "reset" event is sent and
+    the non-streaming call (with its retries and fail-safe) produces the analysis,
+    which is re-sent in full. "error" is sent if the goal can't be stored.
+    """
+    parser = JSONStreamParser(max_depth=2)
+    analysis = None
+    sent_anything = False
+    pieces = get_llm_client().stream(
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": _analysis_prompt(goal) + STREAM_FORMAT_PROMPT},
+        ],
+        model=LLM_MODEL,
+        response_format=ANALYSIS_RESPONSE_FORMAT,
+        temperature=ANALYSIS_TEMPERATURE,
+        cache=True,
+        validate=GoalAnalysis.model_validate_json,
+    )
+    try:
+        async for piece in pieces:
+            for path, value in parser.feed(piece):
+                if path == ("summary",) and isinstance(value, str):
+                    sent_anything = True
+                    yield "summary", {"summary": value}
+                elif len(path) == 2 and path[0] == "tasks":
+                    task = SubTask.model_validate(value)
+                    sent_anything = True
+                    yield "subtask", {"index": path[1], **task.model_dump()}
+                elif path == ():
+                    analysis = GoalAnalysis.model_validate(value)
+        if analysis is None:
+            raise ValueError("Stream ended before the analysis was complete")
+    except Exception as e:
+        print(f"Streaming goal analysis failed, falling back: {e}")
+        analysis = None
+    finally:
+        # Frees the LLM concurrency slot even when we stop reading early
+        await pieces.aclose()
+
+    if analysis is None:
+        if sent_anything:
+            yield "reset", {}
+        analysis = await generate_analysis_with_groq(goal)
+        yield "summary", {"summary": analysis.summary}
+        for i, task in enumerate(analysis.tasks):
+            yield "subtask", {"index": i, **task.model_dump()}
+
+    try:
+        goal_id = await _insert_goal(build_goal_doc(goal, analysis))
     except Exception as e:
         print(f"Error creating goal: {e}")
-        return None
-        
-# ... existing get_goal function ...
-async def get_goal():
+        yield "error", {"message": "Failed to create goal."}
+        return
+    yield "goal", {"goal_id": goal_id, "message": "Goal created successfully!"}
+
+# Listing view without the heavy per-goal fields
+GOAL_LIST_PROJECTION = {"subtasks": 0, "summary": 0}
+
+async def get_goal(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    start_after: Optional[date] = None,
+    end_before: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    view: str = "full",
+):
+    """Goals, newest activity first. With a `limit`, one page keyset-paginated on
+    (updated_at, _id); without one (and no cursor), every matching goal."""
+    query = {}
+    if user_id is not None:
+        query["user_id"] = user_id
+    if status is not None:
+        query["status"] = status
+    if start_after is not None:
+        query["start_date"] = {"$gte": datetime.combine(start_after, datetime.min.time(), tzinfo=timezone.utc)}
+    if end_before is not None:
+        query["end_date"] = {"$lte": datetime.combine(end_before, datetime.min.time(), tzinfo=timezone.utc)}
+    if cursor:
+        position = decode_cursor(cursor, "ts", "id")
+        updated_at, oid = position["ts"], position["id"]
+        query["$or"] = [{"updated_at": {"$lt": updated_at}}, {"updated_at": updated_at, "_id": {"$lt": oid}}]
+
+    projection = GOAL_LIST_PROJECTION if view == "list" else None
     try:
-        goals = await goal_collection.find({}).to_list(length=None)
-        for g in goals:
-            g["_id"]=str(g["_id"])
-        return goals
+        with metrics.span("mongo.goals.find"):
+            found = goal_collection.find(query, projection=projection).sort([("updated_at", -1), ("_id", -1)])
+            if limit is not None:
+                found = found.limit(limit + 1)
+            goals = await found.to_list(length=None if limit is None else limit + 1)
     except Exception as e:
         print(f"Error retrieving goals: {e}")
-        return []
+        return [], None
 
-# New function to update a subtask status and recalculate progress
-async def update_subtask_status(goal_id: str, update_data: SubTaskUpdate):
-    
-    # 1. Update the specific subtask field (sets completion status)
-    subtask_path = f"subtasks.{update_data.subtask_index}.completed"
+    next_cursor = None
+    if limit is not None and len(goals) > limit:
+        goals = goals[:limit]
+        next_cursor = encode_cursor({"ts": goals[-1]["updated_at"].isoformat(), "id": str(goals[-1]["_id"])})
+    for g in goals:
+        g["_id"]=str(g["_id"])
+    return goals, next_cursor
 
-    # We must update the goal's 'updated_at' field here too for time tracking
-    update_result = await goal_collection.update_one(
-        {"_id": ObjectId(goal_id)},
-        {"$set": {subtask_path: update_data.completed, "updated_at": datetime.now(timezone.utc)}}
-    )
+def _subtask_update_pipeline(subtask_index: int, completed: bool) -> List[Dict]:
+    """Aggregation-pipeline update that flips one subtask and recomputes progress,
+    status and the reminder streak inside Mongo (same rules as calculate_progress
+    and the daily/weekly streak logic, using the server clock)."""
 
-    if update_result.modified_count == 0:
-        # NOTE: Returning a tuple (False, message) now
-        return False, "Failed to update subtask. Goal ID or index may be invalid."
+    subtask_count = {"$size": "$subtasks"}
+    completed_count = {"$size": {"$filter": {"input": "$subtasks", "cond": {"$eq": ["$$this.completed", True]}}}}
+    progress = {"$toInt": {"$trunc": {"$multiply": [{"$divide": [completed_count, subtask_count]}, 100]}}}
 
-    # 2. Recalculate everything and apply the changes
-    updated_goal = await goal_collection.find_one({"_id": ObjectId(goal_id)})
-    if updated_goal:
-        subtasks = updated_goal.get("subtasks", [])
-        new_progress = calculate_progress(subtasks)
-        
-        # Determine new status
-        new_status = "Completed" if new_progress == 100 else ("In Progress" if new_progress > 0 else "Not Started")
-        
-        updates_to_set = {
-            "progress_percentage": new_progress,
-            "status": new_status,
-            "updated_at": datetime.now(timezone.utc) # Updated again for accurate final timestamp
-        }
-        
-        # --- REMINDER STREAK LOGIC ---
-        
-        # Only run streak logic if a task was just marked COMPLETE
-        if update_data.completed is True:
-            
-            today_utc = datetime.now(timezone.utc).date()
-            last_completion_dt = updated_goal.get("last_completion_date")
-            current_streak = updated_goal.get("current_streak", 0)
-            frequency = updated_goal.get("reminder_frequency", "never").lower()
-
-            if frequency in ["daily", "weekly"]:
-                
-                if last_completion_dt is None:
+    pipeline = [
+        # 1. Update the specific subtask (sets completion status)
+        {"$set": {
+            "subtasks": {"$map": {
+                "input": {"$range": [0, subtask_count]},
+                "as": "i",
+                "in": {"$cond": [
+                    {"$eq": ["$$i", subtask_index]},
+                    {"$mergeObjects": [{"$arrayElemAt": ["$subtasks", "$$i"]}, {"completed": completed}]},
+                    {"$arrayElemAt": ["$subtasks", "$$i"]},
+                ]},
+            }},
+            "updated_at": "$$NOW",
+        }},
+        # 2. Recalculate progress and status
+        {"$set": {"progress_percentage": progress}},
+        {"$set": {"status": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$progress_percentage", 100]}, "then": "Completed"},
+                {"case": {"$gt": ["$progress_percentage", 0]}, "then": "In Progress"},
+            ],
+            "default": "Not Started",
+        }}}},
+    ]
+
+    # --- REMINDER STREAK LOGIC ---
+    # Only run streak logic if a task was just marked COMPLETE
+    if completed:
+        frequency = {"$toLower": {"$ifNull": ["$reminder_frequency", "never"]}}
+        days_since_last = {"$dateDiff": {
+            "startDate": "$last_completion_date", "endDate": "$$NOW", "unit": "day", "timezone": "UTC",
+        }}
+        pipeline += [
+            {"$set": {"_streak": {"$switch": {
+                "branches": [
+                    {"case": {"$not": [{"$in": [frequency, ["daily", "weekly"]]}]}, "then": "keep"},
                     # Case 1: First completion starts the streak
-                    updates_to_set["current_streak"] = 1
-                    updates_to_set["last_completion_date"] = datetime.now(timezone.utc)
-                else:
-                    last_completion_date = last_completion_dt.date()
-                    delta = today_utc - last_completion_date
-                    
-                    # A. Task already completed TODAY (do nothing to streak, but update date)
-                    if last_completion_date == today_utc:
-                        pass
-                    
+                    {"case": {"$eq": [{"$ifNull": ["$last_completion_date", None]}, None]}, "then": "restart"},
+                    # A. Task already completed TODAY (do nothing to streak)
+                    {"case": {"$eq": [days_since_last, 0]}, "then": "keep"},
                     # B. Check for a CONSECUTIVE completion
-                    elif (frequency == "daily" and delta == timedelta(days=1)) or \
-                         (frequency == "weekly" and delta.days >= 1 and delta.days <= 7):
-                        
-                        updates_to_set["current_streak"] = current_streak + 1
-                        updates_to_set["last_completion_date"] = datetime.now(timezone.utc)
-                        
-                    # C. STREAK BROKEN / New Start
-                    else:
-                        updates_to_set["current_streak"] = 1 # Start a new streak
-                        updates_to_set["last_completion_date"] = datetime.now(timezone.utc)
-
-        # --- END STREAK LOGIC ---
-
-        # Apply all accumulated updates (progress, status, streak)
-        await goal_collection.update_one(
-            {"_id": ObjectId(goal_id)},
-            {"$set": updates_to_set}
+                    {"case": {"$or": [
+                        {"$and": [{"$eq": [frequency, "daily"]}, {"$eq": [days_since_last, 1]}]},
+                        {"$and": [{"$eq": [frequency, "weekly"]}, {"$gte": [days_since_last, 1]}, {"$lte": [days_since_last, 7]}]},
+                    ]}, "then": "extend"},
+                ],
+                # C. STREAK BROKEN / New Start
+                "default": "restart",
+            }}}},
+            {"$set": {
+                "current_streak": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$_streak", "restart"]}, "then": 1},
+                        {"case": {"$eq": ["$_streak", "extend"]}, "then": {"$add": [{"$ifNull": ["$current_streak", 0]}, 1]}},
+                    ],
+                    "default": "$current_streak",
+                }},
+                "last_completion_date": {"$cond": [{"$eq": ["$_streak", "keep"]}, "$last_completion_date", "$$NOW"]},
+            }},
+            {"$unset": "_streak"},
+        ]
+    # --- END STREAK LOGIC ---
+
+    return pipeline
+
+# Update a subtask status and recalculate progress in a single atomic round-trip
+async def update_subtask_status(goal_id: str, update_data: SubTaskUpdate):
+    """Sets one subtask's completed flag. Re-sending the state the subtask already
+    has succeeds without writing: updated_at, the streak and the feedback job are
+    only touched by a real change."""
+    if update_data.subtask_index < 0 or not ObjectId.is_valid(goal_id):
+        return False, "Failed to update subtask. Goal ID or index may be invalid."
+
+    # Matching on the index guards against padding the array with a bad index
+    goal_filter = {"_id": ObjectId(goal_id), f"subtasks.{update_data.subtask_index}": {"$exists": True}}
+    with metrics.span("mongo.goals.find_one_and_update"):
+        updated_goal = await goal_collection.find_one_and_update(
+            {**goal_filter, f"subtasks.{update_data.subtask_index}.completed": {"$ne": update_data.completed}},
+            _subtask_update_pipeline(update_data.subtask_index, update_data.completed),
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER,
         )
-        
-        # --- AI-DRIVEN FEEDBACK LOOP ---
-        # Generate the encouraging message based on the new progress/streak
-        feedback_message = await generate_feedback_message(updated_goal, update_data.subtask_index)
-        
-        # Return success AND the message
-        return True, feedback_message
-        
-    # If the goal was deleted or not found between the two database reads
-    return False, "Goal data integrity error. Could not calculate progress."
 
-# NOTE: You must ensure 'timedelta' is imported from 'datetime' at the top of CRUD.py:
-# from datetime import datetime, timezone, timedelta
+    if updated_goal is None:
+        with metrics.span("mongo.goals.find_one"):
+            unchanged = await goal_collection.find_one(goal_filter, projection={"_id": 1})
+        if unchanged is not None:
+            return True, "Subtask already up to date."
+        # NOTE: Returning a tuple (False, message) now
+        return False, "Failed to update subtask. Goal ID or index may be invalid."
+
+    # --- AI-DRIVEN FEEDBACK LOOP ---
+    # The encouraging message is generated by a background job; clients fetch it
+    # from /goals/{goal_id}/feedback so ticking a checkbox doesn't wait on the LLM
+    with metrics.span("mongo.feedback_jobs.enqueue"):
+        await FEEDBACK_JOBS.enqueue(goal_id, update_data.subtask_index)
+
+    return True, "Progress saved!"
+
+FEEDBACK_MESSAGES = metrics.Counter("feedback_messages_total", "Feedback messages by source", ["source"])
+
+# Canned feedback keyed by (progress bucket, streak bucket); used instead of the
+# LLM when FEEDBACK_TEMPLATES is "always", or when the LLM call fails in "fallback" mode
+FEEDBACK_TEMPLATE_TEXT = {
+    ("done", "any"): "You finished \"{title}\"! Take a moment to celebrate - you earned it.",
+    ("start", "any"): "First step done on \"{title}\"! Starting is the hardest part, and you've already done it.",
+    ("early", "long"): "A {streak} streak - that consistency is paying off. {tasks_left} to go on \"{title}\".",
+    ("early", "building"): "A {streak} streak and counting! Keep the rhythm going on \"{title}\".",
+    ("early", "none"): "Every step counts. Pick the next small task on \"{title}\" and start again today.",
+    ("middle", "long"): "{progress}% done with a {streak} streak - you're in a great groove on \"{title}\".",
+    ("middle", "building"): "Halfway there and your {streak} streak is growing. Keep it up!",
+    ("middle", "none"): "{progress}% of \"{title}\" is already done. Restart your streak with the next step.",
+    ("late", "long"): "Only {tasks_left} left on \"{title}\", and a {streak} streak to protect. Finish strong!",
+    ("late", "building"): "So close! {tasks_left} to go on \"{title}\" - your {streak} streak will carry you there.",
+    ("late", "none"): "You're at {progress}% on \"{title}\". One more push and you're done - you've got this.",
+}
+
+def _progress_bucket(progress: int, tasks_left: int, total_tasks: int) -> str:
+    if progress == 100:
+        return "done"
+    if total_tasks and tasks_left == total_tasks - 1:
+        return "start"
+    if progress < 34:
+        return "early"
+    return "middle" if progress < 67 else "late"
+
+def _streak_bucket(streak: int) -> str:
+    if streak >= 7:
+        return "long"
+    return "building" if streak >= 1 else "none"
+
+def template_feedback(goal_data: dict) -> str:
+    """Canned encouragement for the goal's progress/streak bucket"""
+    progress = goal_data.get("progress_percentage", 0)
+    current_streak = goal_data.get("current_streak", 0) or 0
+    total_tasks = len(goal_data.get("subtasks", []))
+    tasks_left = total_tasks - (total_tasks * progress // 100)
+
+    progress_bucket = _progress_bucket(progress, tasks_left, total_tasks)
+    template = FEEDBACK_TEMPLATE_TEXT.get((progress_bucket, "any")) \
+        or FEEDBACK_TEMPLATE_TEXT[(progress_bucket, _streak_bucket(current_streak))]
+    return template.format(
+        title=goal_data.get("title", "your goal"),
+        progress=progress,
+        tasks_left=f"{tasks_left} step" if tasks_left == 1 else f"{tasks_left} steps",
+        streak=f"{current_streak}-{'day' if str(goal_data.get('reminder_frequency', '')).lower() == 'daily' else 'week'}",
+    )
 
 async def generate_feedback_message(goal_data: dict, subtask_index: int) -> str:
     """Generates an encouragement message based on current progress."""
-    
+    if FEEDBACK_TEMPLATES == "always":
+        FEEDBACK_MESSAGES.inc(source="template")
+        return template_feedback(goal_data)
+
     # Get relevant data from the updated goal
     progress = goal_data.get("progress_percentage", 0)
     current_streak = goal_data.get("current_streak", 0)
@@ -238,22 +425,40 @@ async def generate_feedback_message(goal_data: dict, subtask_index: int) -> str:
     """
     
     try:
-        chat_completion = client.chat.completions.create(
+        # The model should return a simple string message; the prompt only depends on
+        # the goal's current numbers, so a repeated state reuses the cached message
+        message = await get_llm_client().complete(
             messages=[
                 {"role": "system", "content": "You are a highly positive and encouraging mental health coach. Respond only with a short message."},
                 {"role": "user", "content": user_prompt},
             ],
-            # Use a fast, single-token model, and use standard string output
-            model="llama-3.1-8b-instant", # Ensure this is your known working model
+            model=LLM_MODEL,
             temperature=0.7,
+            cache=True,
         )
-        
-        # The model should return a simple string message
-        return chat_completion.choices[0].message.content
-        
+        FEEDBACK_MESSAGES.inc(source="llm")
+        return message
+
     except Exception as e:
         print(f"Error generating feedback: {e}")
+        if FEEDBACK_TEMPLATES == "fallback":
+            FEEDBACK_MESSAGES.inc(source="template")
+            return template_feedback(goal_data)
+        FEEDBACK_MESSAGES.inc(source="default")
         return "Keep up the great work! Every step counts." # Safe default
+
+async def _produce_feedback(goal_id: str, subtask_index: int) -> str:
+    """Background job handler: feedback for the goal as it is now"""
+    with metrics.span("mongo.goals.find_one"):
+        goal = await goal_collection.find_one({"_id": ObjectId(goal_id)})
+    if goal is None:
+        raise ValueError("Goal not found")
+    return await generate_feedback_message(goal, subtask_index)
+
+FEEDBACK_JOBS = FeedbackJobQueue(feedback_job_collection, _produce_feedback, workers=FEEDBACK_WORKERS, max_queue=FEEDBACK_QUEUE_MAX,
+                                lease_s=FEEDBACK_JOB_LEASE_S)
+metrics.register_collector(metrics.stats_collector("feedback_jobs", FEEDBACK_JOBS.stats))
+
 async def update_goal(db, goal_id, updated_data):
     result = await db.goals.update_one({"_id": ObjectId(goal_id)}, {"$set": updated_data})
     return result.modified_count > 0
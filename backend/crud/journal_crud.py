@@ -2,74 +2,312 @@ from datetime import datetime
 from fastapi import HTTPException
 import numpy as np
 import asyncio
-from typing import Dict, List
-from transformers import pipeline
-import nltk
-from nltk.tokenize import sent_tokenize
+import functools
+import re
+import time
+from typing import Dict, List, Optional, Tuple
 from database import db
-from schemas.journal_schemas import EntryIn, EntryOut, EmotionItem
-from config import EMOJI_MAP, ALPHA, WINDOW, POSITIVE_LABELS, NEGATIVE_LABELS
+from schemas.journal_schemas import EntryIn, EntryOut
+from config import (
+    EMOJI_MAP, ALPHA, WINDOW, BASELINE_WINDOW, POSITIVE_LABELS, NEGATIVE_LABELS,
+    BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, CHUNK_STRIDE,
+    EMOTION_MODEL_ID, EMOTION_MODEL_RETRY_S, EMOTION_BACKEND, EMOTION_ONNX_DIR, EMOTION_THREADS, NLTK_DATA_DIR, NLTK_ALLOW_DOWNLOAD,
+    EMOTION_CACHE_SIZE, EMOTION_CACHE_TTL_S, EMOTION_CACHE_MONGO,
+    INFERENCE_PROCESSES, INFERENCE_THREADS_PER_PROCESS, INFERENCE_PIN_CPUS, INFERENCE_TIMEOUT_S,
+    EMOTION_ROUTING, EMOTION_FAST_MODEL_ID, EMOTION_FAST_ONNX_DIR,
+)
+from batching import MicroBatcher
+import metrics
+from emotion_cache import EmotionCache
+from emotion_vectors import vector_fields, unpack_vectors, top_k_rows
+from emotion_routing import fast_path_eligible, needs_escalation
+from inference_backends import load_emotion_pipeline, predict_token_ids
+from inference_pool import InferencePool
+from crud.mood_state_crud import get_recent_moods, record_mood
+from crud.journal_writes import insert_journal, wait_for_user_writes
+from crud.journal_history import get_user_history, record_history_insert
 
 MODEL_PIPELINE = None
+FAST_PIPELINE = None  # distilled model for EMOTION_ROUTING=tiered
+INFERENCE_POOL = InferencePool(
+    INFERENCE_PROCESSES, INFERENCE_THREADS_PER_PROCESS, INFERENCE_PIN_CPUS, INFERENCE_TIMEOUT_S
+) if INFERENCE_PROCESSES else None
 MAX_TOKENS = 512  # RoBERTa max input length
 
+# Load state reported by /ready. punkt is where sentence data came from:
+# "bundled", "system", "downloaded" or "missing" (regex fallback)
+MODEL_STATE = {"status": "not_loaded", "error": None, "punkt": None, "load_seconds": None, "fast_model": None}
+_model_lock = asyncio.Lock()
+_retry_at = 0.0  # monotonic time after which a failed load may be attempted again
+
+def _regex_sent_tokenize(text: str) -> List[str]:
+    """Fallback sentence splitter when punkt data isn't available"""
+    return [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+
+sent_tokenize = _regex_sent_tokenize
+
+def _run_emotion_batch(chunks: List[List[int]]) -> List[Dict[str, float]]:
+    """Runs one padded forward pass over chunks gathered from all in-flight requests"""
+    with metrics.span("model_forward"):
+        if INFERENCE_POOL is not None:
+            return INFERENCE_POOL.run(chunks)
+        return predict_token_ids(MODEL_PIPELINE, chunks)
+
+def _run_fast_batch(chunks: List[List[int]]) -> List[Dict[str, float]]:
+    with metrics.span("model_forward_fast"):
+        return predict_token_ids(FAST_PIPELINE, chunks)
+
+EMOTION_BATCHER = MicroBatcher(
+    _run_emotion_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_in_flight=max(1, INFERENCE_PROCESSES),  # one batch per pool process
+)
+EMOTION_CACHE = EmotionCache(
+    f"{EMOTION_MODEL_ID}:{EMOTION_BACKEND}",  # quantized scores differ, so backends don't share entries
+    max_items=EMOTION_CACHE_SIZE,
+    ttl_seconds=EMOTION_CACHE_TTL_S,
+    collection=db.emotion_cache if EMOTION_CACHE_MONGO else None,
+)
+metrics.register_collector(metrics.stats_collector("emotion_batcher", EMOTION_BATCHER.stats))
+metrics.register_collector(metrics.stats_collector("emotion_cache", EMOTION_CACHE.stats))
+if INFERENCE_POOL is not None:
+    metrics.register_collector(metrics.stats_collector("inference_pool", INFERENCE_POOL.stats))
+
+# Fast tier: its own batcher and cache (token ids come from a different tokenizer)
+FAST_BATCHER = MicroBatcher(_run_fast_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+FAST_CACHE = EmotionCache(
+    f"{EMOTION_FAST_MODEL_ID}:{EMOTION_BACKEND}",
+    max_items=EMOTION_CACHE_SIZE,
+    ttl_seconds=EMOTION_CACHE_TTL_S,
+    collection=db.emotion_cache if EMOTION_CACHE_MONGO else None,
+)
+EMOTION_ROUTES = metrics.Counter("emotion_routes_total", "Journal texts by classifier tier and routing reason", ["tier", "reason"])
+if EMOTION_ROUTING == "tiered":
+    metrics.register_collector(metrics.stats_collector("emotion_fast_batcher", FAST_BATCHER.stats))
+    metrics.register_collector(metrics.stats_collector("emotion_fast_cache", FAST_CACHE.stats))
+
+def _load_punkt() -> str:
+    """Finds punkt sentence data, preferring the copy bundled with the app"""
+    import nltk
+
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    try:
+        found = nltk.data.find("tokenizers/punkt_tab/english/")
+        return "bundled" if str(found).startswith(NLTK_DATA_DIR) else "system"
+    except LookupError:
+        pass
+    if NLTK_ALLOW_DOWNLOAD and nltk.download("punkt_tab", download_dir=NLTK_DATA_DIR, quiet=True):
+        return "downloaded"
+    return "missing"
+
 async def init_emotion_model():
-    global MODEL_PIPELINE
-    nltk.download('punkt', quiet=True)
-    nltk.download('punkt_tab', quiet=True)
-    MODEL_PIPELINE = pipeline("text-classification", model="SamLowe/roberta-base-go_emotions", top_k=None)
-    await asyncio.to_thread(MODEL_PIPELINE, "warmup")
-    print("✓ Emotion model loaded")
-
-def chunk_text(text: str, max_length: int = 400) -> List[str]:
-    """Split text into chunks that fit model token limit"""
-    sentences = sent_tokenize(text)
+    """Loads punkt and the emotion model once; concurrent callers wait on the same load.
+
+    A failed load is retried by the next caller after EMOTION_MODEL_RETRY_S.
+    """
+    global MODEL_PIPELINE, sent_tokenize, _retry_at
+    async with _model_lock:
+        if MODEL_PIPELINE is not None:
+            return
+        if MODEL_STATE["status"] == "failed" and time.monotonic() < _retry_at:
+            return
+        MODEL_STATE["status"] = "loading"
+        started = time.perf_counter()
+        try:
+            MODEL_STATE["punkt"] = await metrics.to_thread(_load_punkt)
+            if MODEL_STATE["punkt"] != "missing":
+                from nltk.tokenize import sent_tokenize as punkt_sent_tokenize
+                sent_tokenize = punkt_sent_tokenize
+            # Heavy imports and weight loading happen off the event loop
+            if INFERENCE_POOL is None:
+                pipe = await metrics.to_thread(load_emotion_pipeline, EMOTION_BACKEND, EMOTION_MODEL_ID, EMOTION_THREADS, EMOTION_ONNX_DIR)
+                await metrics.to_thread(pipe, "warmup")
+            else:
+                # Load once with a single thread and fork the pool before any forward pass;
+                # the parent keeps the pipeline only for its tokenizer
+                pipe = await metrics.to_thread(load_emotion_pipeline, EMOTION_BACKEND, EMOTION_MODEL_ID, 1, EMOTION_ONNX_DIR)
+                loader = None
+                if EMOTION_BACKEND != "torch":
+                    loader = functools.partial(
+                        load_emotion_pipeline, EMOTION_BACKEND, EMOTION_MODEL_ID, INFERENCE_THREADS_PER_PROCESS, EMOTION_ONNX_DIR
+                    )
+                await metrics.to_thread(INFERENCE_POOL.start, pipe, loader)
+        except Exception as e:
+            MODEL_STATE.update(status="failed", error=str(e))
+            _retry_at = time.monotonic() + EMOTION_MODEL_RETRY_S
+            print(f"Error loading emotion model: {e}")
+            return
+        MODEL_PIPELINE = pipe
+        EMOTION_BATCHER.start()
+        if EMOTION_ROUTING == "tiered":
+            await _load_fast_model()
+        MODEL_STATE.update(status="ready", error=None, load_seconds=time.perf_counter() - started)
+        print("✓ Emotion model loaded")
+
+async def _load_fast_model():
+    """Loads the fast tier; without it every entry simply takes the full model"""
+    global FAST_PIPELINE
+    try:
+        pipe = await metrics.to_thread(load_emotion_pipeline, EMOTION_BACKEND, EMOTION_FAST_MODEL_ID, EMOTION_THREADS, EMOTION_FAST_ONNX_DIR)
+        await metrics.to_thread(pipe, "warmup")
+    except Exception as e:
+        MODEL_STATE["fast_model"] = f"failed: {e}"
+        print(f"Error loading fast emotion model, routing everything to the full model: {e}")
+        return
+    FAST_PIPELINE = pipe
+    FAST_BATCHER.start()
+    MODEL_STATE["fast_model"] = "ready"
+
+def _sentence_token_spans(text: str, offsets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Maps NLTK sentence boundaries onto [start, end) token index spans"""
+    sentence_ends = []
+    pos = 0
+    for sent in sent_tokenize(text):
+        start = text.find(sent, pos)
+        if start == -1:
+            continue
+        pos = start + len(sent)
+        sentence_ends.append(pos)
+
+    spans = []
+    span_start = 0
+    sentence = 0
+    for i, (char_start, _) in enumerate(offsets):
+        # A token belongs to the first sentence that ends after it starts
+        while sentence < len(sentence_ends) and char_start >= sentence_ends[sentence]:
+            if i > span_start:
+                spans.append((span_start, i))
+                span_start = i
+            sentence += 1
+    if len(offsets) > span_start:
+        spans.append((span_start, len(offsets)))
+    return spans
+
+@metrics.timed("chunk_text")
+def chunk_text(text: str, tokenizer=None, max_tokens: int = None, stride: int = CHUNK_STRIDE) -> List[List[int]]:
+    """Split text into token-id chunks that fit the model's input limit.
+
+    The entry is tokenized once; whole sentences are packed by their real token
+    counts, a sentence longer than the budget is split into windows, and up to
+    `stride` tokens of trailing sentences are repeated at the start of the next chunk.
+    """
+    tokenizer = tokenizer or MODEL_PIPELINE.tokenizer
+    if max_tokens is None:
+        max_tokens = MAX_TOKENS - tokenizer.num_special_tokens_to_add()
+
+    with metrics.span("tokenize"):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    ids = encoding["input_ids"]
+    if not ids:
+        return []
+    with metrics.span("sentence_split"):
+        spans = _sentence_token_spans(text, encoding["offset_mapping"])
+
     chunks = []
-    current_chunk = []
+    current = []  # token spans of the chunk being packed
     current_length = 0
-    
-    for sent in sentences:
-        sent_length = len(sent.split())  # Rough token estimate
-        
-        if current_length + sent_length > max_length:
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-            current_chunk = [sent]
-            current_length = sent_length
-        else:
-            current_chunk.append(sent)
-            current_length += sent_length
-    
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    
+
+    def flush():
+        if current:
+            chunks.append(ids[current[0][0]:current[-1][1]])
+
+    for start, end in spans:
+        length = end - start
+
+        if length > max_tokens:
+            # One very long sentence: hard-split it into overlapping windows
+            flush()
+            step = max(1, max_tokens - stride)
+            for window_start in range(start, end, step):
+                chunks.append(ids[window_start:min(window_start + max_tokens, end)])
+                if window_start + max_tokens >= end:
+                    break
+            current, current_length = [], 0
+            continue
+
+        if current_length + length > max_tokens:
+            flush()
+            # Carry trailing sentences over as overlap if they leave room for this one
+            overlap, overlap_length = [], 0
+            for span in reversed(current):
+                span_length = span[1] - span[0]
+                if overlap_length + span_length > stride or overlap_length + span_length + length > max_tokens:
+                    break
+                overlap.insert(0, span)
+                overlap_length += span_length
+            current, current_length = overlap, overlap_length
+
+        current.append((start, end))
+        current_length += length
+
+    flush()
     return chunks
 
-async def analyze_text(text: str) -> Dict[str, float]:
-    if MODEL_PIPELINE is None or not text:
-        return {}
+async def score_chunk(chunk: List[int], batcher: MicroBatcher = EMOTION_BATCHER, cache: EmotionCache = EMOTION_CACHE,
+                      priority: int = 0) -> Dict[str, float]:
+    """Scores one token-id chunk, serving repeats from the emotion cache"""
+    scores = await cache.get(chunk)
+    if scores is None:
+        scores = await batcher.submit(chunk, priority)
+        await cache.set(chunk, scores)
+    return scores
+
+async def _fast_path_scores(text: str, priority: int = 0) -> Optional[Dict[str, float]]:
+    """Fast-tier scores for a short, unambiguous entry; None means use the full model"""
+    ids = FAST_PIPELINE.tokenizer(text, add_special_tokens=False)["input_ids"]
+    if not fast_path_eligible(len(ids)):
+        EMOTION_ROUTES.inc(tier="full", reason="long")
+        return None
+    scores = await score_chunk(ids, FAST_BATCHER, FAST_CACHE, priority)
+    if needs_escalation(scores):
+        EMOTION_ROUTES.inc(tier="full", reason="ambiguous")
+        return None
+    EMOTION_ROUTES.inc(tier="fast", reason="short")
+    return scores
+
+@metrics.timed("analyze_text")
+async def analyze_text(text: str, priority: int = 0) -> Tuple[Dict[str, float], str]:
+    """Averaged emotion scores and the tier that produced them ("full" or "fast", see
+    emotion_vectors); bulk callers pass priority=1 so interactive entries are batched first.
+
+    Raises HTTPException 503 while the model can't be loaded: an entry stored without
+    its text polarity would skew the user's z-score/CUSUM history for good.
+    """
+    if not text:
+        return {}, "full"
+    if MODEL_PIPELINE is None:
+        # Lazy / still-warming workers load (or wait for) the model on first use
+        await init_emotion_model()
+        if MODEL_PIPELINE is None:
+            retry_after = max(1, int(_retry_at - time.monotonic()) + 1)
+            raise HTTPException(status_code=503, detail="Emotion model is not available, try again shortly",
+                                headers={"Retry-After": str(retry_after)})
+
+    if FAST_PIPELINE is not None:
+        scores = await _fast_path_scores(text, priority)
+        if scores is not None:
+            return scores, "fast"
     
     # Split into manageable chunks
     chunks = chunk_text(text)
     
-    # Analyze each chunk
+    # Analyze all chunks through the shared batcher so they can ride along
+    # with chunks from other concurrent requests (cached chunks skip the model)
+    results = await asyncio.gather(*(score_chunk(chunk, priority=priority) for chunk in chunks))
+
     all_scores = {}
-    for chunk in chunks:
-        result = await asyncio.to_thread(MODEL_PIPELINE, chunk, top_k=None)
-        
-        if isinstance(result, list) and result:
-            result = result[0] if isinstance(result[0], list) else result
-            chunk_scores = {p["label"]: float(p["score"]) for p in result}
-            
-            # Aggregate scores
-            for label, score in chunk_scores.items():
-                all_scores[label] = all_scores.get(label, 0) + score
+    for chunk_scores in results:
+        # Aggregate scores
+        for label, score in chunk_scores.items():
+            all_scores[label] = all_scores.get(label, 0) + score
     
     # Average scores across chunks
     if chunks:
         all_scores = {k: v / len(chunks) for k, v in all_scores.items()}
     
-    return all_scores
+    return all_scores, "full"
 
 def compute_text_polarity(scores: Dict[str, float]) -> float:
     if not scores:
@@ -92,15 +330,16 @@ def compute_cusum(series: List[float], baseline_mean: float, k: float = 0.1) ->
         S = max(0.0, S + (baseline_mean - x - k))
     return float(S)
 
-def top_k_emotions(scores: Dict[str, float], k: int = 5) -> List[EmotionItem]:
-    items = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
-    return [EmotionItem(label=l, score=float(s)) for l, s in items]
-
-def emotion_items_to_dicts(emotions: List[EmotionItem]) -> List[Dict]:
-    return [{"label": e.label, "score": e.score} for e in emotions]
+def score_mood(weighted_mood: float, recent_moods: List[float]) -> Tuple[float, float, bool]:
+    """z-score, CUSUM and decline flag for a new mood given the user's recent moods (oldest first)"""
+    last_moods = recent_moods[max(0, len(recent_moods) - (WINDOW - 1)):]
+    z = compute_z_score(weighted_mood, last_moods)
 
-def dicts_to_emotion_items(dicts: List[Dict]) -> List[EmotionItem]:
-    return [EmotionItem(**e) for e in dicts]
+    baseline_moods = recent_moods[max(0, len(recent_moods) - BASELINE_WINDOW):]
+    baseline_mean = float(np.mean(baseline_moods)) if baseline_moods else weighted_mood
+    cusum = compute_cusum(baseline_moods + [weighted_mood], baseline_mean)
+    mood_decline = (z < -1.5) or (cusum > 0.8)
+    return z, cusum, mood_decline
 
 async def create_mood_entry(payload: EntryIn) -> EntryOut:
     if payload.emoji not in EMOJI_MAP:
@@ -110,36 +349,21 @@ async def create_mood_entry(payload: EntryIn) -> EntryOut:
     emoji_score = EMOJI_MAP[payload.emoji]
     text = payload.text.strip() if payload.text else ""
 
-    scores = {}
+    scores, tier = {}, "full"
     text_polarity = 0.0
     if text:
-        scores = await analyze_text(text)
+        scores, tier = await analyze_text(text)
         text_polarity = compute_text_polarity(scores)
 
     weighted_mood = ALPHA * emoji_score + (1 - ALPHA) * text_polarity
 
-    cursor = db.journals.find(
-        {"user_id": payload.user_id},
-        projection={"weighted_mood": 1}
-    ).sort("timestamp", -1).limit(WINDOW - 1)
-    last_docs = await cursor.to_list(length=WINDOW - 1)
-    last_moods = [d["weighted_mood"] for d in reversed(last_docs)]
-
-    z = compute_z_score(weighted_mood, last_moods)
-
-    baseline_cursor = db.journals.find(
-        {"user_id": payload.user_id},
-        projection={"weighted_mood": 1}
-    ).sort("timestamp", -1).limit(50)
-    baseline_docs = await baseline_cursor.to_list(length=50)
-    baseline_moods = [d["weighted_mood"] for d in reversed(baseline_docs)]
-    
-    baseline_mean = float(np.mean(baseline_moods)) if baseline_moods else weighted_mood
-    cusum = compute_cusum(baseline_moods + [weighted_mood], baseline_mean)
-    mood_decline = (z < -1.5) or (cusum > 0.8)
-
-    emotion_items = top_k_emotions(scores)
-    emotion_dicts = emotion_items_to_dicts(emotion_items)
+    history = await get_user_history(payload.user_id)
+    if history is not None and history.complete:
+        recent_moods, last_timestamp = history.recent_moods(BASELINE_WINDOW)
+    else:
+        with metrics.span("mongo.get_recent_moods"):
+            recent_moods, last_timestamp = await get_recent_moods(payload.user_id)
+    z, cusum, mood_decline = score_mood(weighted_mood, recent_moods)
 
     doc = {
         "user_id": payload.user_id,
@@ -151,28 +375,46 @@ async def create_mood_entry(payload: EntryIn) -> EntryOut:
         "weighted_mood": weighted_mood,
         "z_score": z,
         "cusum": cusum,
-        "mood_decline": mood_decline
+        "mood_decline": mood_decline,
+        **vector_fields(scores, tier),
     }
 
-    result = await db.journals.insert_one(doc)
-    return EntryOut(id=str(result.inserted_id), **doc, top_emotions=emotion_items)
+    # insert_one, or a shared insert_many batch (see JOURNAL_WRITE_MODE)
+    inserted_id = await insert_journal(doc)
+    record_history_insert(doc)
+    with metrics.span("mongo.record_mood"):
+        await record_mood(payload.user_id, ts, weighted_mood, last_timestamp)
+    top_emotions = top_k_rows(unpack_vectors([doc]))[0]
+    return EntryOut(id=str(inserted_id), **doc, top_emotions=top_emotions)
 
 async def get_user_progress(user_id: str, limit: int):
-    cursor = db.journals.find({"user_id": user_id}).sort("timestamp", 1).limit(limit)
-    items = await cursor.to_list(length=limit)
-    
+    history = await get_user_history(user_id)
+    if history is not None and history.covers(limit):
+        return {"user_id": user_id, "series": history.progress_series(limit)}
+
+    await wait_for_user_writes(user_id)
+    # Only the fields the series needs; journal text can be large
+    cursor = db.journals.find(
+        {"user_id": user_id},
+        projection={"timestamp": 1, "weighted_mood": 1, "emoji": 1, "emotion_vector": 1, "emotion_labels_version": 1,
+                    "top_emotions": 1, "mood_decline": 1, "z_score": 1, "cusum": 1}
+    ).sort("timestamp", 1).limit(limit)
+    with metrics.span("mongo.journals.find_progress"):
+        items = await cursor.to_list(length=limit)
+
+    # Top emotions for the whole page in one pass over the stacked score vectors
+    top_emotions = top_k_rows(unpack_vectors(items))
+
     series = []
-    for item in items:
-        emotion_dicts = item.get("top_emotions", [])
-        emotion_items = dicts_to_emotion_items(emotion_dicts)
+    for item, top in zip(items, top_emotions):
         series.append({
             "timestamp": item["timestamp"].isoformat(),
             "weighted_mood": item["weighted_mood"],
             "emoji": item["emoji"],
-            "top_emotions": emotion_dicts,  # Return as dicts for JSON serialization
+            "top_emotions": top or item.get("top_emotions", []),  # older entries may carry a stored list
             "mood_decline": item.get("mood_decline", False),
             "z_score": item.get("z_score", 0.0),
             "cusum": item.get("cusum", 0.0),
         })
-    
-    return {"user_id": user_id, "series": series}
\ No newline at end of file
+
+    return {"user_id": user_id, "series": series}
@@ -0,0 +1,93 @@
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+from pymongo.errors import OperationFailure
+from database import db
+from config import HISTORY_CACHE as HISTORY_CACHE_MODE, HISTORY_CACHE_MAX_BYTES, HISTORY_CACHE_MAX_ENTRIES
+from history_cache import HistoryCache, UserSeries, PROJECTION
+from crud.journal_writes import wait_for_user_writes
+import metrics
+
+# Shared per-user history cache (see history_cache.py). Kept current by
+# write-through from create_mood_entry, explicit invalidation from the bulk
+# import, and in "changestream" mode by a watcher that drops users whose
+# journals were changed by another worker. Until the watcher is running the
+# cache is bypassed, so a change made before the stream opened is never missed.
+
+if HISTORY_CACHE_MODE not in ("off", "local", "changestream"):
+    raise ValueError(f"Unknown HISTORY_CACHE: {HISTORY_CACHE_MODE!r} (expected 'off', 'local' or 'changestream')")
+
+HISTORY_CACHE = HistoryCache(max_bytes=HISTORY_CACHE_MAX_BYTES, max_entries_per_user=HISTORY_CACHE_MAX_ENTRIES)
+if HISTORY_CACHE_MODE != "off":
+    metrics.register_collector(metrics.stats_collector("history_cache", HISTORY_CACHE.stats))
+
+_active = HISTORY_CACHE_MODE == "local"
+_OWN_IDS_MAX = 10000
+_own_ids: "OrderedDict" = OrderedDict()  # ids this process wrote through; their change events are echoes
+
+async def get_user_history(user_id: str) -> Optional[UserSeries]:
+    """The user's cached series, loading it on a miss; None when the cache can't serve this user"""
+    if not _active:
+        return None
+    found, series = HISTORY_CACHE.get(user_id)
+    if found:
+        return series
+    token = HISTORY_CACHE.begin_load(user_id)
+    await wait_for_user_writes(user_id)
+    cursor = db.journals.find({"user_id": user_id}, projection=PROJECTION).sort("timestamp", 1).limit(HISTORY_CACHE_MAX_ENTRIES + 1)
+    with metrics.span("mongo.journals.find_history"):
+        docs = await cursor.to_list(length=HISTORY_CACHE_MAX_ENTRIES + 1)
+    return HISTORY_CACHE.finish_load(user_id, token, docs)
+
+def record_history_insert(doc: dict):
+    """Write-through for a journal document this process inserted"""
+    if HISTORY_CACHE_MODE == "off":
+        return
+    _own_ids[doc["_id"]] = None
+    if len(_own_ids) > _OWN_IDS_MAX:
+        _own_ids.popitem(last=False)
+    HISTORY_CACHE.record_insert(doc["user_id"], doc)
+
+def invalidate_history(user_id: Optional[str] = None):
+    if HISTORY_CACHE_MODE != "off":
+        HISTORY_CACHE.invalidate(user_id)
+
+def _apply_change(change: dict):
+    operation = change["operationType"]
+    if operation in ("insert", "update", "replace"):
+        doc_id = change["documentKey"]["_id"]
+        if operation == "insert" and doc_id in _own_ids:
+            del _own_ids[doc_id]  # our own write-through already has it
+            return
+        doc = change.get("fullDocument")
+        HISTORY_CACHE.invalidate(doc["user_id"] if doc else None)
+    else:
+        # delete / drop / rename / invalidate don't say which user was affected
+        HISTORY_CACHE.invalidate()
+
+async def watch_journal_changes():
+    """Background task for HISTORY_CACHE=changestream; reconnects with backoff"""
+    global _active
+    delay = 1.0
+    while True:
+        try:
+            async with db.journals.watch(full_document="updateLookup") as stream:
+                _active = True
+                delay = 1.0
+                async for change in stream:
+                    _apply_change(change)
+            error = "stream closed"
+        except asyncio.CancelledError:
+            _active = False
+            raise
+        except Exception as e:
+            error = e
+        # Changes made while the stream is down would be missed
+        _active = False
+        HISTORY_CACHE.invalidate()
+        if isinstance(error, OperationFailure) and error.code == 40573:
+            print("History cache disabled: change streams need a MongoDB replica set")
+            return
+        print(f"Journal change stream stopped, reopening in {delay:.0f}s: {error}")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30.0)
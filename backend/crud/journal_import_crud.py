@@ -0,0 +1,191 @@
+import asyncio
+import json
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, IO, List, Tuple
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+from database import db
+from schemas.journal_schemas import EntryIn
+from config import EMOJI_MAP, ALPHA, BASELINE_WINDOW, IMPORT_BATCH_SIZE, IMPORT_MAX_LINE_BYTES
+from emotion_vectors import vector_fields
+from crud.journal_crud import analyze_text, compute_text_polarity, score_mood
+from crud.mood_state_crud import as_naive_utc, get_recent_moods, record_moods
+from crud.journal_history import invalidate_history
+
+# Bulk import of NDJSON journal entries (one EntryIn object per line).
+#
+# The upload is consumed IMPORT_BATCH_SIZE lines at a time: texts go through the
+# shared emotion batcher together, each user's z-score/CUSUM sequence is advanced
+# in timestamp order from their mood_state buffer, and the batch is written with a
+# single insert_many. Per-line results are spooled to a temp file (spilling to disk)
+# so memory stays bounded no matter how large the upload is.
+#
+# Upload each user's entries in timestamp order for exact sequences: ordering is
+# applied within a batch, and entries older than the stored history trigger a
+# mood_state rebuild like a back-dated /submit_entry does.
+
+def _write_result(out: IO[bytes], result: Dict):
+    out.write(json.dumps(result).encode("utf-8") + b"\n")
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yields (line_number, raw_line) pairs; over-long lines are yielded as None"""
+    buffer = b""
+    line_no = 0
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline == -1:
+                break
+            raw, buffer = buffer[:newline], buffer[newline + 1:]
+            line_no += 1
+            if skipping:
+                # Tail of a line that was already reported as too long
+                skipping = False
+                yield line_no, None
+            elif raw.strip():
+                yield line_no, raw
+        if len(buffer) > IMPORT_MAX_LINE_BYTES and not skipping:
+            buffer = b""
+            skipping = True
+        elif skipping:
+            buffer = b""
+    if skipping:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, buffer
+
+async def _analyze(text: str) -> Tuple[Dict[str, float], str]:
+    # Imports queue behind interactive /submit_entry traffic in the model batchers
+    return await analyze_text(text, priority=1) if text else ({}, "full")
+
+async def _import_batch(batch: List[Tuple[int, bytes]], out: IO[bytes]) -> Tuple[int, int]:
+    # 1. Parse and validate
+    entries = []
+    errors = 0
+    for line_no, raw in batch:
+        if raw is None:
+            _write_result(out, {"line": line_no, "error": f"Line exceeds {IMPORT_MAX_LINE_BYTES} bytes"})
+            errors += 1
+            continue
+        try:
+            payload = EntryIn.model_validate_json(raw)
+        except ValidationError as e:
+            _write_result(out, {"line": line_no, "error": str(e)})
+            errors += 1
+            continue
+        if payload.emoji not in EMOJI_MAP:
+            _write_result(out, {"line": line_no, "error": "Unknown emoji label"})
+            errors += 1
+            continue
+        entries.append((line_no, payload))
+
+    # 2. Run every text in the batch through the emotion model together. A failed
+    # analysis fails its own line: earlier batches are already committed, so
+    # aborting the upload here would leave it half imported with no results.
+    texts = [payload.text.strip() if payload.text else "" for _, payload in entries]
+    outcomes = await asyncio.gather(*(_analyze(text) for text in texts), return_exceptions=True)
+    analyzed = []
+    for (line_no, payload), text, outcome in zip(entries, texts, outcomes):
+        if isinstance(outcome, Exception):
+            _write_result(out, {"line": line_no, "error": f"Analysis failed: {outcome}"})
+            errors += 1
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            analyzed.append((line_no, payload, text, *outcome))
+
+    # 3. Advance each user's z-score/CUSUM sequence in timestamp order
+    by_user = defaultdict(list)
+    now = datetime.utcnow()
+    for line_no, payload, text, scores, tier in analyzed:
+        # Lines may mix aware ("...Z") and naive timestamps; compare and store them as naive UTC
+        ts = as_naive_utc(payload.timestamp) if payload.timestamp else now
+        by_user[payload.user_id].append((ts, line_no, payload, text, scores, tier))
+
+    docs = []
+    line_numbers = []
+    user_moods = {}
+    for user_id, rows in by_user.items():
+        rows.sort(key=lambda r: r[0])
+        recent_moods, last_timestamp = await get_recent_moods(user_id)
+        recent_moods = list(recent_moods)
+        for ts, line_no, payload, text, scores, tier in rows:
+            emoji_score = EMOJI_MAP[payload.emoji]
+            text_polarity = compute_text_polarity(scores)
+            weighted_mood = ALPHA * emoji_score + (1 - ALPHA) * text_polarity
+            z, cusum, mood_decline = score_mood(weighted_mood, recent_moods)
+            recent_moods = (recent_moods + [weighted_mood])[-BASELINE_WINDOW:]
+
+            docs.append({
+                "user_id": user_id,
+                "timestamp": ts,
+                "emoji": payload.emoji,
+                "emoji_score": emoji_score,
+                "text": text,
+                "text_polarity": text_polarity,
+                "weighted_mood": weighted_mood,
+                "z_score": z,
+                "cusum": cusum,
+                "mood_decline": mood_decline,
+                **vector_fields(scores, tier),
+            })
+            line_numbers.append(line_no)
+        user_moods[user_id] = ([r[0] for r in rows], last_timestamp)
+
+    # 4. One insert_many per batch; insert_many assigns _id on the docs client-side
+    failed = {}
+    if docs:
+        try:
+            await db.journals.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Insert failed") for err in e.details.get("writeErrors", [])}
+        except PyMongoError as e:
+            # Nothing says which documents made it, so the whole batch is reported as failed
+            failed = {i: f"Insert failed: {e}" for i in range(len(docs))}
+
+    inserted_by_user = defaultdict(lambda: ([], []))
+    for i, (doc, line_no) in enumerate(zip(docs, line_numbers)):
+        if i in failed:
+            _write_result(out, {"line": line_no, "error": failed[i]})
+            errors += 1
+            continue
+        _write_result(out, {
+            "line": line_no,
+            "id": str(doc["_id"]),
+            "z_score": doc["z_score"],
+            "cusum": doc["cusum"],
+            "mood_decline": doc["mood_decline"],
+        })
+        timestamps, moods = inserted_by_user[doc["user_id"]]
+        timestamps.append(doc["timestamp"])
+        moods.append(doc["weighted_mood"])
+
+    for user_id, (timestamps, moods) in inserted_by_user.items():
+        await record_moods(user_id, timestamps, moods, user_moods[user_id][1])
+        invalidate_history(user_id)  # bulk loads are cheaper to re-read than to write through
+
+    return len(docs) - len(failed), errors
+
+async def import_mood_entries(stream: AsyncIterator[bytes]) -> IO[bytes]:
+    """Imports an NDJSON stream and returns a file of per-line results, rewound for reading"""
+    out = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    inserted = 0
+    errors = 0
+    batch = []
+    async for line in _iter_lines(stream):
+        batch.append(line)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            ok, bad = await _import_batch(batch, out)
+            inserted, errors = inserted + ok, errors + bad
+            batch = []
+    if batch:
+        ok, bad = await _import_batch(batch, out)
+        inserted, errors = inserted + ok, errors + bad
+
+    _write_result(out, {"summary": {"inserted": inserted, "errors": errors}})
+    out.seek(0)
+    return out
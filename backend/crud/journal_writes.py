@@ -0,0 +1,35 @@
+from typing import Optional
+from database import db
+from config import JOURNAL_WRITE_MODE, JOURNAL_WRITE_BATCH_SIZE, JOURNAL_WRITE_MAX_WAIT_MS, JOURNAL_WRITE_MAX_PENDING
+from write_buffer import WriteBuffer
+import metrics
+
+# Shared journal write buffer (None in "direct" mode). Lives apart from
+# journal_crud so the history readers in mood_state_crud / progress_crud can
+# wait on a user's pending writes without importing the model stack.
+
+if JOURNAL_WRITE_MODE not in ("direct", "group", "behind"):
+    raise ValueError(f"Unknown JOURNAL_WRITE_MODE: {JOURNAL_WRITE_MODE!r} (expected 'direct', 'group' or 'behind')")
+
+JOURNAL_WRITES: Optional[WriteBuffer] = None
+if JOURNAL_WRITE_MODE != "direct":
+    JOURNAL_WRITES = WriteBuffer(
+        db.journals,
+        max_batch_size=JOURNAL_WRITE_BATCH_SIZE,
+        max_wait_ms=JOURNAL_WRITE_MAX_WAIT_MS,
+        max_pending=JOURNAL_WRITE_MAX_PENDING,
+    )
+    metrics.register_collector(metrics.stats_collector("journal_writes", JOURNAL_WRITES.stats))
+
+async def insert_journal(doc: dict):
+    """Inserts one journal entry according to JOURNAL_WRITE_MODE and returns its _id"""
+    if JOURNAL_WRITES is None:
+        with metrics.span("mongo.journals.insert_one"):
+            result = await db.journals.insert_one(doc)
+        return result.inserted_id
+    return await JOURNAL_WRITES.insert(doc, wait=JOURNAL_WRITE_MODE == "group")
+
+async def wait_for_user_writes(user_id: str):
+    """Read-your-writes: call before reading a user's journals"""
+    if JOURNAL_WRITES is not None:
+        await JOURNAL_WRITES.wait_for_user(user_id)
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from database import db, mood_state_collection
+from config import BASELINE_WINDOW
+from crud.journal_writes import wait_for_user_writes
+
+# One document per user holding the last BASELINE_WINDOW weighted_mood values
+# (oldest first), so a new entry needs one read instead of two sorted history queries.
+#
+# z-score and CUSUM are still computed with compute_z_score/compute_cusum over this
+# buffer: the CUSUM baseline mean moves with every entry, so carrying running sums
+# forward would not reproduce the same floats.
+
+def as_naive_utc(ts: datetime) -> datetime:
+    """Mongo hands back naive UTC datetimes; normalise so comparisons don't raise"""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+async def rebuild_mood_state(user_id: str) -> dict:
+    """Rebuilds a user's ring buffer from the journal history"""
+    await wait_for_user_writes(user_id)
+    cursor = db.journals.find(
+        {"user_id": user_id},
+        projection={"weighted_mood": 1, "timestamp": 1}
+    ).sort("timestamp", -1).limit(BASELINE_WINDOW)
+    docs = await cursor.to_list(length=BASELINE_WINDOW)
+    state = {
+        "user_id": user_id,
+        "recent": [d["weighted_mood"] for d in reversed(docs)],
+    }
+    update = {"$set": state}
+    if docs:
+        state["last_timestamp"] = docs[0]["timestamp"]
+    else:
+        # Leave the field absent rather than null so record_moods' $max has nothing to compare against
+        update["$unset"] = {"last_timestamp": ""}
+    await mood_state_collection.update_one({"user_id": user_id}, update, upsert=True)
+    return state
+
+async def get_recent_moods(user_id: str) -> Tuple[List[float], Optional[datetime]]:
+    """Returns (recent weighted moods oldest-first, timestamp of the newest one)"""
+    state = await mood_state_collection.find_one({"user_id": user_id})
+    if state is None:
+        # Users who journaled before the state collection existed
+        state = await rebuild_mood_state(user_id)
+    return state.get("recent", []), state.get("last_timestamp")
+
+async def record_mood(user_id: str, ts: datetime, weighted_mood: float, last_timestamp: Optional[datetime]):
+    """Appends a freshly inserted entry to the user's ring buffer"""
+    await record_moods(user_id, [ts], [weighted_mood], last_timestamp)
+
+async def record_moods(user_id: str, timestamps: List[datetime], moods: List[float], last_timestamp: Optional[datetime]):
+    """Appends freshly inserted entries (sorted by timestamp) to the user's ring buffer"""
+    if not moods:
+        return
+    first_ts = as_naive_utc(timestamps[0])
+    if last_timestamp is not None and first_ts < as_naive_utc(last_timestamp):
+        # Back-dated entry lands in the middle of the history; rebuild so the buffer
+        # keeps matching the timestamp-sorted journal order.
+        await rebuild_mood_state(user_id)
+        return
+
+    await mood_state_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$push": {"recent": {"$each": list(moods), "$slice": -BASELINE_WINDOW}},
+            "$max": {"last_timestamp": as_naive_utc(timestamps[-1])},
+        },
+        upsert=True
+    )
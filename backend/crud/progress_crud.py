@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from database import db
+from pagination import encode_cursor, decode_cursor
+from config import GO_EMOTIONS_LABELS
+from emotion_vectors import LABEL_INDEX, unpack_vectors
+from crud.journal_writes import wait_for_user_writes
+
+# Aggregated / downsampled mood series for dashboards.
+# Bucketing happens inside Mongo so only a few numbers per bucket cross the wire.
+
+BUCKET_UNITS = {"day", "week", "month"}
+RAW_PROJECTION = {"timestamp": 1, "weighted_mood": 1, "mood_decline": 1, "z_score": 1, "cusum": 1}
+VECTOR_PROJECTION = {"_id": 0, "timestamp": 1, "emotion_vector": 1, "emotion_labels_version": 1}
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: indices of the points that best keep the shape of (x, y)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    sampled = [0]
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        avg_start = int(np.floor((i + 1) * bucket_size)) + 1
+        avg_end = min(int(np.floor((i + 2) * bucket_size)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        range_start = int(np.floor(i * bucket_size)) + 1
+        range_end = int(np.floor((i + 1) * bucket_size)) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[range_start:range_end] - y[a])
+            - (x[a] - x[range_start:range_end]) * (avg_y - y[a])
+        )
+        a = range_start + int(np.argmax(areas))
+        sampled.append(a)
+    sampled.append(n - 1)
+    return sampled
+
+def downsample(series: List[Dict], points: int, value_key: str) -> List[Dict]:
+    if not points or len(series) <= points:
+        return series
+    x = np.array([datetime.fromisoformat(p["timestamp"]).timestamp() for p in series])
+    y = np.array([p[value_key] for p in series], dtype=float)
+    return [series[i] for i in lttb_indices(x, y, points)]
+
+async def _raw_page(user_id: str, limit: int, cursor: Optional[Dict]) -> Tuple[List[Dict], Optional[str]]:
+    query = {"user_id": user_id}
+    if cursor:
+        # Keyset on (timestamp, _id) so equal timestamps never skip or repeat
+        ts, oid = cursor["ts"], cursor["id"]
+        query["$or"] = [{"timestamp": {"$gt": ts}}, {"timestamp": ts, "_id": {"$gt": oid}}]
+
+    docs = await db.journals.find(query, projection=RAW_PROJECTION) \
+        .sort([("timestamp", 1), ("_id", 1)]).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor({"ts": docs[-1]["timestamp"].isoformat(), "id": str(docs[-1]["_id"])})
+
+    series = [{
+        "timestamp": d["timestamp"].isoformat(),
+        "weighted_mood": d["weighted_mood"],
+        "mood_decline": d.get("mood_decline", False),
+        "z_score": d.get("z_score", 0.0),
+        "cusum": d.get("cusum", 0.0),
+    } for d in docs]
+    return series, next_cursor
+
+async def _bucket_page(user_id: str, unit: str, limit: int, cursor: Optional[Dict]) -> Tuple[List[Dict], Optional[str]]:
+    match = {"user_id": user_id}
+    if cursor:
+        # Cursor is the newest timestamp of the last bucket returned, so the next
+        # page starts with the following bucket
+        match["timestamp"] = {"$gt": cursor["ts"]}
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {"_id": 0, "timestamp": 1, "weighted_mood": 1, "mood_decline": 1, "z_score": 1, "cusum": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "startOfWeek": "monday"}},
+            "weighted_mood": {"$avg": "$weighted_mood"},
+            "min_mood": {"$min": "$weighted_mood"},
+            "max_mood": {"$max": "$weighted_mood"},
+            "entries": {"$sum": 1},
+            "mood_declines": {"$sum": {"$cond": [{"$eq": ["$mood_decline", True]}, 1, 0]}},
+            "min_z_score": {"$min": "$z_score"},
+            "max_cusum": {"$max": "$cusum"},
+            "last_timestamp": {"$max": "$timestamp"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit + 1},
+    ]
+    buckets = await db.journals.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(buckets) > limit:
+        buckets = buckets[:limit]
+        next_cursor = encode_cursor({"ts": buckets[-1]["last_timestamp"].isoformat()})
+
+    series = []
+    for b in buckets:
+        b.pop("last_timestamp")
+        series.append({"timestamp": b.pop("_id").isoformat(), **b})
+    return series, next_cursor
+
+async def get_progress_summary(user_id: str, bucket: str, limit: int, points: Optional[int], cursor: Optional[str]):
+    decoded = None
+    if cursor:
+        decoded = decode_cursor(cursor, "ts") if bucket in BUCKET_UNITS else decode_cursor(cursor, "ts", "id")
+    await wait_for_user_writes(user_id)
+    if bucket in BUCKET_UNITS:
+        series, next_cursor = await _bucket_page(user_id, bucket, limit, decoded)
+    else:
+        series, next_cursor = await _raw_page(user_id, limit, decoded)
+
+    if points:
+        series = downsample(series, points, "weighted_mood")
+
+    return {"user_id": user_id, "bucket": bucket, "series": series, "next_cursor": next_cursor}
+
+def _truncate(timestamps: np.ndarray, unit: str) -> np.ndarray:
+    """Bucket starts for datetime64 timestamps, with weeks starting on Monday like _bucket_page"""
+    if unit == "month":
+        return timestamps.astype("datetime64[M]").astype("datetime64[D]")
+    days = timestamps.astype("datetime64[D]")
+    if unit == "week":
+        # 1970-01-01 was a Thursday
+        days = days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    return days
+
+async def get_emotion_trends(user_id: str, labels: List[str], bucket: str, days: int, limit: int):
+    """Per-label score trends decoded from the stored emotion vectors; the model is never re-run.
+
+    Fast-tier entries are left out: their softmax scores aren't on the full model's scale.
+    """
+    unknown = [l for l in labels if l not in LABEL_INDEX]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown emotion labels: {', '.join(unknown)}")
+    labels = labels or list(GO_EMOTIONS_LABELS)
+    columns = [LABEL_INDEX[l] for l in labels]
+
+    await wait_for_user_writes(user_id)
+    since = datetime.utcnow() - timedelta(days=days)
+    docs = await db.journals.find(
+        {"user_id": user_id, "timestamp": {"$gte": since}, "emotion_vector": {"$exists": True},
+         "emotion_tier": {"$ne": "fast"}},
+        projection=VECTOR_PROJECTION,
+    ).sort("timestamp", 1).limit(limit).to_list(length=limit)
+
+    matrix = unpack_vectors(docs)[:, columns]
+    keep = ~np.isnan(matrix).any(axis=1)
+    matrix = matrix[keep]
+    timestamps = np.array([d["timestamp"] for d, k in zip(docs, keep) if k], dtype="datetime64[us]")
+
+    if bucket in BUCKET_UNITS and len(matrix):
+        starts = _truncate(timestamps, bucket)
+        boundaries = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        counts = np.diff(np.r_[boundaries, len(matrix)])
+        matrix = np.add.reduceat(matrix, boundaries, axis=0) / counts[:, None]
+        timestamps = starts[boundaries].astype("datetime64[us]")
+    else:
+        counts = np.ones(len(matrix), dtype=np.int64)
+
+    series = [
+        {
+            "timestamp": ts.isoformat(),
+            "entries": int(n),
+            "scores": dict(zip(labels, row)),
+        }
+        for ts, n, row in zip(timestamps.astype(datetime).tolist(), counts, matrix.tolist())
+    ]
+    return {"user_id": user_id, "bucket": bucket, "labels": labels, "series": series}
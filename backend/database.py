@@ -6,7 +6,9 @@ import certifi
 load_dotenv()  # Load .env file
 
 MONGO_URL = os.getenv("MONGO_URL")  # read the value
-client = AsyncIOMotorClient(MONGO_URL,tls=True,tlsAllowInvalidCertificates=True,tlsCAFile=certifi.where())
+# connect=False: no background connection until the first operation, so importing this module stays cheap
+client = AsyncIOMotorClient(MONGO_URL,tls=True,tlsAllowInvalidCertificates=True,tlsCAFile=certifi.where(),connect=False)
 db = client["db"]
 goal_collection = db["goals"]
-print(db.list_collection_names())
\ No newline at end of file
+mood_state_collection = db["mood_state"]
+feedback_job_collection = db["feedback_jobs"]
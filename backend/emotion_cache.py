@@ -0,0 +1,96 @@
+# backend/emotion_cache.py
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from array import array
+from typing import Any, Dict, Optional, Sequence, Union
+
+
+def cache_key(model_id: str, chunk: Union[str, Sequence[int]]) -> str:
+    """Content address for a chunk's scores.
+
+    Token-id chunks hash their ids, which is exactly what the model sees. Text
+    chunks only fold surrounding whitespace: anything the tokenizer can see
+    (inner spacing, casing, unicode form) may change the scores, and a hit
+    must return exactly what a cold run would.
+    """
+    if isinstance(chunk, str):
+        payload = chunk.strip().encode("utf-8")
+    else:
+        payload = array("q", chunk).tobytes()
+    return hashlib.sha256(model_id.encode("utf-8") + b"\n" + payload).hexdigest()
+
+
+class EmotionCache:
+    """Two-tier cache of per-chunk emotion scores.
+
+    Tier 1 is a bounded in-process LRU with TTL. Tier 2 is an optional Mongo
+    collection shared by all workers; Mongo's TTL monitor expires its documents
+    (index declared in indexes.py).
+    """
+
+    def __init__(self, model_id: str, max_items: int = 4096, ttl_seconds: float = 7 * 24 * 3600, collection: Any = None):
+        self.model_id = model_id
+        self.max_items = max_items
+        self.ttl = ttl_seconds
+        self.collection = collection
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, scores: Dict[str, float]):
+        self._items[key] = (time.monotonic() + self.ttl, scores)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def get(self, chunk: Union[str, Sequence[int]]) -> Optional[Dict[str, float]]:
+        key = cache_key(self.model_id, chunk)
+
+        entry = self._items.get(key)
+        if entry is not None:
+            expires_at, scores = entry
+            if expires_at > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return scores
+            del self._items[key]
+
+        if self.collection is not None:
+            doc = await self.collection.find_one({"_id": key}, projection={"scores": 1})
+            if doc is not None:
+                self.mongo_hits += 1
+                self._remember(key, doc["scores"])
+                return doc["scores"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, chunk: Union[str, Sequence[int]], scores: Dict[str, float]):
+        key = cache_key(self.model_id, chunk)
+        self._remember(key, scores)
+        if self.collection is not None:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "scores": scores,
+                    "model_id": self.model_id,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl),
+                }},
+                upsert=True
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.hits + self.mongo_hits) / lookups) if lookups else 0.0,
+        }
@@ -0,0 +1,23 @@
+# backend/emotion_routing.py
+import math
+from typing import Dict
+from config import ROUTE_MAX_FAST_TOKENS, ROUTE_MAX_ENTROPY
+
+# Routing policy for tiered emotion classification, shared by analyze_text and
+# bench/report_routing.py so the report measures exactly what production does.
+
+def normalized_entropy(scores: Dict[str, float]) -> float:
+    """Entropy of the scores renormalized to a distribution, scaled to [0, 1]"""
+    values = [s for s in scores.values() if s > 0]
+    total = sum(values)
+    if len(scores) < 2 or total <= 0:
+        return 1.0
+    entropy = -sum((s / total) * math.log(s / total) for s in values)
+    return entropy / math.log(len(scores))
+
+def fast_path_eligible(token_count: int, max_tokens: int = ROUTE_MAX_FAST_TOKENS) -> bool:
+    return 0 < token_count <= max_tokens
+
+def needs_escalation(scores: Dict[str, float], max_entropy: float = ROUTE_MAX_ENTROPY) -> bool:
+    """Fast-model scores too spread out to trust"""
+    return normalized_entropy(scores) > max_entropy
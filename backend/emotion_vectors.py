@@ -0,0 +1,83 @@
+# backend/emotion_vectors.py
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from bson import Binary
+from config import GO_EMOTIONS_LABELS, EMOTION_LABELS_VERSION
+
+# Journal documents keep the full go_emotions score vector as a little-endian
+# float16 blob (28 labels -> 56 bytes) in GO_EMOTIONS_LABELS order, tagged with
+# EMOTION_LABELS_VERSION. Top-k lists, per-label trends and polarity can all be
+# derived from it later without running the model again.
+#
+# Entries scored by the fast tier (EMOTION_ROUTING=tiered) are marked with
+# emotion_tier "fast". The distilled student applies softmax (its scores sum to 1),
+# while the full model's scores are independent sigmoids, so the two aren't on one
+# scale: per-entry rankings hold, but cross-entry aggregates leave fast entries out.
+
+VECTOR_DTYPE = np.dtype("<f2")
+LABELS = np.array(GO_EMOTIONS_LABELS)
+LABEL_INDEX = {label: i for i, label in enumerate(GO_EMOTIONS_LABELS)}
+
+
+def pack_scores(scores: Dict[str, float]) -> Optional[Binary]:
+    """Encodes a label -> score dict; labels outside the table are dropped"""
+    if not scores:
+        return None
+    vector = np.zeros(len(GO_EMOTIONS_LABELS), dtype=VECTOR_DTYPE)
+    for label, score in scores.items():
+        i = LABEL_INDEX.get(label)
+        if i is not None:
+            vector[i] = score
+    return Binary(vector.tobytes())
+
+
+def vector_fields(scores: Dict[str, float], tier: str = "full") -> Dict:
+    """The emotion fields of a journal document for these scores (full-model documents carry no tier)"""
+    blob = pack_scores(scores)
+    if blob is None:
+        return {}
+    fields = {"emotion_vector": blob, "emotion_labels_version": EMOTION_LABELS_VERSION}
+    if tier != "full":
+        fields["emotion_tier"] = tier
+    return fields
+
+
+def unpack_vectors(docs: Sequence[Dict]) -> np.ndarray:
+    """(len(docs), n_labels) float32 matrix; docs without a current-version vector get NaN rows"""
+    n_labels = len(GO_EMOTIONS_LABELS)
+    width = n_labels * VECTOR_DTYPE.itemsize
+    blank = b"\xff" * width  # float16 NaN
+    raw = b"".join(
+        bytes(d["emotion_vector"])
+        if d.get("emotion_labels_version") == EMOTION_LABELS_VERSION and len(d.get("emotion_vector") or b"") == width
+        else blank
+        for d in docs
+    )
+    return np.frombuffer(raw, dtype=VECTOR_DTYPE).reshape(len(docs), n_labels).astype(np.float32)
+
+
+def vector_to_scores(vector: np.ndarray) -> Dict[str, float]:
+    if np.isnan(vector).all():
+        return {}
+    return {label: float(score) for label, score in zip(GO_EMOTIONS_LABELS, vector)}
+
+
+def top_k_rows(matrix: np.ndarray, k: int = 5) -> List[List[Dict]]:
+    """Top-k {label, score} dicts for every row, highest first (empty for NaN rows)"""
+    if not len(matrix):
+        return []
+    k = min(k, matrix.shape[1])
+    filled = np.nan_to_num(matrix, nan=-np.inf)
+    top = np.argpartition(-filled, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(filled, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    missing = np.isnan(matrix).all(axis=1)
+    labels = LABELS[top].tolist()
+    scores = top_scores.tolist()
+    return [
+        [] if missing[r] else [{"label": l, "score": s} for l, s in zip(labels[r], scores[r])]
+        for r in range(len(matrix))
+    ]
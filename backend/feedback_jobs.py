@@ -0,0 +1,221 @@
+# backend/feedback_jobs.py
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+from pymongo import ReturnDocument
+
+# Job states stored on the job document
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class FeedbackJobQueue:
+    """Produces encouragement messages off the request path.
+
+    There is one job document per goal in Mongo, so results can be read from any
+    worker and pending jobs survive a restart. Work is processed by a bounded
+    pool of in-process asyncio workers. A toggle on a goal that already has a
+    queued job only bumps the job's version instead of queueing again, so rapid
+    clicking costs one LLM call. Results are written only if the version they
+    were produced for is still current.
+
+    Several worker processes share the collection, so a job is claimed with one
+    find_one_and_update that moves it from pending to running under this
+    process's `owner` and a lease of `lease_s`. Only the owner writes the result.
+    A running job whose lease ran out (its process died) can be claimed again.
+    Leftover jobs are claimed one at a time by a recovery loop in each process,
+    so every orphan runs once rather than once per process.
+    """
+
+    def __init__(self, collection: Any, handler: Callable[[str, int], Awaitable[str]], workers: int = 2, max_queue: int = 1000,
+                 lease_s: float = 300.0):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.lease_s = lease_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue = max_queue
+        self._tasks = []
+        self._queued_at: Dict[str, float] = {}   # goal_id -> monotonic enqueue time, doubles as the dedupe set
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._waiting: Dict[str, int] = {}       # goal_id -> wait_for calls in progress
+
+        # Metrics
+        self.enqueued = 0
+        self.deduped = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.claim_misses = 0
+        self.recovered = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.total_lag_seconds = 0.0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Pick up jobs left behind by a previous process
+        self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _put(self, goal_id: str) -> bool:
+        if goal_id in self._queued_at:
+            self.deduped += 1
+            return True
+        try:
+            self._queue.put_nowait(goal_id)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._queued_at[goal_id] = time.monotonic()
+        self.enqueued += 1
+        return True
+
+    async def enqueue(self, goal_id: str, subtask_index: int):
+        """Records the latest toggle for a goal and makes sure a job for it is queued"""
+        await self.collection.update_one(
+            {"_id": goal_id},
+            {
+                "$set": {"status": PENDING, "subtask_index": subtask_index, "requested_at": datetime.now(timezone.utc)},
+                "$inc": {"version": 1},
+            },
+            upsert=True
+        )
+        if self._queue is None or not self._put(goal_id):
+            await self.collection.update_one(
+                {"_id": goal_id, "status": PENDING},
+                {"$set": {"status": FAILED, "error": "Feedback queue is full"}}
+            )
+
+    async def get(self, goal_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": goal_id}, projection={"status": 1, "message": 1, "finished_at": 1})
+
+    async def wait_for(self, goal_id: str, timeout: float, poll_interval: float = 1.0) -> Optional[Dict]:
+        """Waits until the goal's job is finished (done or failed) or the timeout passes.
+
+        Jobs finished by this process wake the waiter straight away; the periodic
+        re-read covers jobs handled by another worker process.
+        """
+        deadline = time.monotonic() + timeout
+        self._waiting[goal_id] = self._waiting.get(goal_id, 0) + 1
+        try:
+            while True:
+                job = await self.get(goal_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job.get("status") not in (PENDING, RUNNING) or remaining <= 0:
+                    return job
+                event = self._finished.setdefault(goal_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # The last waiter to leave drops the event, whoever finished the job
+            self._waiting[goal_id] -= 1
+            if not self._waiting[goal_id]:
+                del self._waiting[goal_id]
+                self._finished.pop(goal_id, None)
+
+    async def _worker(self):
+        while True:
+            goal_id = await self._queue.get()
+            queued_at = self._queued_at.pop(goal_id, time.monotonic())
+            lag = time.monotonic() - queued_at
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            self.total_lag_seconds += lag
+            try:
+                job = await self._claim({"_id": goal_id})
+                if job is None:
+                    self.claim_misses += 1  # finished, or claimed by another process
+                else:
+                    await self._run_job(job)
+            except Exception as e:
+                # Keep the worker alive; the job is claimed again once its lease runs out
+                print(f"Error running feedback job for goal {goal_id}: {e}")
+            self._notify(goal_id)
+
+    async def _recover(self):
+        # Jobs left pending by a process that stopped, or running under a lease that
+        # ran out because its process died: claimed one at a time, at start and then
+        # once per lease period
+        while True:
+            try:
+                while True:
+                    job = await self._claim({})
+                    if job is None:
+                        break
+                    self.recovered += 1
+                    await self._run_job(job)
+                    self._notify(job["_id"])
+            except Exception as e:
+                print(f"Error recovering feedback jobs: {e}")
+            await asyncio.sleep(self.lease_s)
+
+    def _notify(self, goal_id: str):
+        # Waiters re-check the job; wait_for drops the entry once they are gone
+        event = self._finished.pop(goal_id, None)
+        if event is not None:
+            event.set()
+
+    async def _claim(self, query: Dict) -> Optional[Dict]:
+        """Atomically moves one matching pending (or lease-expired) job to running under this owner"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {**query, "$or": [{"status": PENDING}, {"status": RUNNING, "lease_until": {"$lt": now}}]},
+            {"$set": {"status": RUNNING, "owner": self.owner, "lease_until": now + timedelta(seconds=self.lease_s)}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _run_job(self, job: Dict):
+        goal_id = job["_id"]
+        update = {"finished_at": datetime.now(timezone.utc)}
+        try:
+            update["message"] = await self.handler(goal_id, job.get("subtask_index", 0))
+            update["status"] = DONE
+            self.processed += 1
+        except Exception as e:
+            print(f"Error producing feedback for goal {goal_id}: {e}")
+            update["status"] = FAILED
+            update["error"] = str(e)
+            self.failed += 1
+
+        # A newer toggle re-queued the goal meanwhile, or our lease ran out and another
+        # process took the job over; either way the result is no longer ours to write
+        await self.collection.update_one(
+            {"_id": goal_id, "version": job.get("version"), "owner": self.owner},
+            {"$set": update, "$unset": {"owner": "", "lease_until": ""}},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.processed + self.failed
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "deduped": self.deduped,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "failed": self.failed,
+            "claim_misses": self.claim_misses,
+            "recovered": self.recovered,
+            "waiting": len(self._waiting),
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "avg_lag_seconds": (self.total_lag_seconds / started) if started else 0.0,
+        }
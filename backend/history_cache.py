@@ -0,0 +1,241 @@
+# backend/history_cache.py
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from config import EMOJI_MAP, GO_EMOTIONS_LABELS, EMOTION_LABELS_VERSION
+from emotion_vectors import VECTOR_DTYPE, top_k_rows
+
+# Per-user journal series held in parallel typed arrays: 34 bytes of scalars
+# plus the 56-byte float16 emotion vector per entry, instead of a dict per
+# entry. A user's series is the head of their timestamp-sorted history (what
+# /get_progress pages through); when it holds the whole history it is
+# `complete` and its tail also stands in for the mood_state ring buffer.
+
+EPOCH = datetime(1970, 1, 1)
+EMOJIS = list(EMOJI_MAP)
+EMOJI_INDEX = {emoji: i for i, emoji in enumerate(EMOJIS)}
+VECTOR_WIDTH = len(GO_EMOTIONS_LABELS) * VECTOR_DTYPE.itemsize
+BLANK_VECTOR = b"\xff" * VECTOR_WIDTH  # float16 NaN, same as unpack_vectors
+USER_OVERHEAD_BYTES = 512  # arrays, dict slot, LRU link
+
+# Fields a cached entry is built from
+PROJECTION = {"timestamp": 1, "weighted_mood": 1, "emoji": 1, "emotion_vector": 1, "emotion_labels_version": 1,
+              "top_emotions": 1, "mood_decline": 1, "z_score": 1, "cusum": 1}
+
+
+def _millis(ts: datetime) -> int:
+    """BSON dates keep milliseconds, so cached timestamps do too"""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - EPOCH) // timedelta(milliseconds=1)
+
+
+def _vector_bytes(doc: Dict) -> Optional[bytes]:
+    """The doc's emotion vector, a blank one, or None if only a legacy top_emotions list exists"""
+    blob = doc.get("emotion_vector")
+    if doc.get("emotion_labels_version") == EMOTION_LABELS_VERSION and blob is not None and len(blob) == VECTOR_WIDTH:
+        return bytes(blob)
+    if doc.get("top_emotions"):
+        return None
+    return BLANK_VECTOR
+
+
+def cachable(doc: Dict) -> bool:
+    return doc.get("emoji") in EMOJI_INDEX and _vector_bytes(doc) is not None
+
+
+class UserSeries:
+    __slots__ = ("timestamps", "moods", "z_scores", "cusums", "declines", "emojis", "vectors", "complete")
+
+    def __init__(self, complete: bool):
+        self.timestamps = array("q")  # ms since epoch, ascending
+        self.moods = array("d")
+        self.z_scores = array("d")
+        self.cusums = array("d")
+        self.declines = array("b")
+        self.emojis = array("b")  # index into EMOJIS
+        self.vectors = bytearray()
+        self.complete = complete  # holds every entry the user has
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nbytes(self) -> int:
+        scalars = sum(a.itemsize * len(a) for a in (self.timestamps, self.moods, self.z_scores, self.cusums,
+                                                    self.declines, self.emojis))
+        return scalars + len(self.vectors) + USER_OVERHEAD_BYTES
+
+    def insert(self, doc: Dict) -> int:
+        """Adds a cachable doc in timestamp order (after equal timestamps) and returns its position"""
+        ts = _millis(doc["timestamp"])
+        i = bisect_right(self.timestamps, ts)
+        self.timestamps.insert(i, ts)
+        self.moods.insert(i, doc["weighted_mood"])
+        self.z_scores.insert(i, doc.get("z_score", 0.0))
+        self.cusums.insert(i, doc.get("cusum", 0.0))
+        self.declines.insert(i, bool(doc.get("mood_decline", False)))
+        self.emojis.insert(i, EMOJI_INDEX[doc["emoji"]])
+        self.vectors[i * VECTOR_WIDTH:i * VECTOR_WIDTH] = _vector_bytes(doc)
+        return i
+
+    def truncate(self, n: int):
+        for a in (self.timestamps, self.moods, self.z_scores, self.cusums, self.declines, self.emojis):
+            del a[n:]
+        del self.vectors[n * VECTOR_WIDTH:]
+
+    def covers(self, limit: int) -> bool:
+        """Whether the first `limit` entries of the user's history are all here"""
+        return limit > 0 and (self.complete or limit <= len(self))
+
+    def recent_moods(self, n: int) -> Tuple[List[float], Optional[datetime]]:
+        """Same shape as get_recent_moods; only meaningful for a complete series"""
+        if not len(self):
+            return [], None
+        return self.moods[max(0, len(self) - n):].tolist(), EPOCH + timedelta(milliseconds=self.timestamps[-1])
+
+    def progress_series(self, limit: int) -> List[Dict]:
+        """The first `limit` entries in get_user_progress's response format"""
+        n = min(limit, len(self))
+        matrix = np.frombuffer(bytes(self.vectors[:n * VECTOR_WIDTH]), dtype=VECTOR_DTYPE)
+        top_emotions = top_k_rows(matrix.reshape(n, len(GO_EMOTIONS_LABELS)).astype(np.float32))
+        moods, z_scores, cusums = self.moods[:n].tolist(), self.z_scores[:n].tolist(), self.cusums[:n].tolist()
+        return [
+            {
+                "timestamp": (EPOCH + timedelta(milliseconds=self.timestamps[i])).isoformat(),
+                "weighted_mood": moods[i],
+                "emoji": EMOJIS[self.emojis[i]],
+                "top_emotions": top_emotions[i],
+                "mood_decline": bool(self.declines[i]),
+                "z_score": z_scores[i],
+                "cusum": cusums[i],
+            }
+            for i in range(n)
+        ]
+
+
+class HistoryCache:
+    """Bounded LRU of UserSeries, capped by estimated bytes across all users.
+
+    Consistency is the caller's job: record_insert() after every journal insert
+    this process makes (write-through), invalidate() when anything else may have
+    changed a user's journals. A load is begun with begin_load() before querying
+    Mongo and only kept by finish_load() if no insert or invalidation for that
+    user happened in between. Users whose history can't be represented (legacy
+    documents) are remembered as bypassed so they don't trigger a load per request.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries_per_user: int = 512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries_per_user
+        self._users: "OrderedDict[Any, Optional[UserSeries]]" = OrderedDict()
+        self._loads: Dict[Any, object] = {}
+        self._bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.write_throughs = 0
+
+    def _size(self, series: Optional[UserSeries]) -> int:
+        return series.nbytes() if series is not None else USER_OVERHEAD_BYTES
+
+    def _drop(self, user: Any):
+        series = self._users.pop(user)
+        self._bytes -= self._size(series)
+
+    def _store(self, user: Any, series: Optional[UserSeries]):
+        if user in self._users:
+            self._drop(user)
+        self._users[user] = series
+        self._bytes += self._size(series)
+        while self._bytes > self.max_bytes and self._users:
+            self._drop(next(iter(self._users)))
+            self.evictions += 1
+
+    def get(self, user: Any) -> Tuple[bool, Optional[UserSeries]]:
+        """(found, series); a found user with no series is bypassed and must be read from Mongo"""
+        if user not in self._users:
+            self.misses += 1
+            return False, None
+        self._users.move_to_end(user)
+        series = self._users[user]
+        if series is None:
+            self.bypassed += 1
+        else:
+            self.hits += 1
+        return True, series
+
+    def begin_load(self, user: Any) -> object:
+        token = object()
+        self._loads[user] = token
+        return token
+
+    def finish_load(self, user: Any, token: object, docs: Sequence[Dict]) -> Optional[UserSeries]:
+        """Builds a series from the first max_entries + 1 docs of the user's history (ascending)"""
+        series = None
+        if all(cachable(d) for d in docs):
+            series = UserSeries(complete=len(docs) <= self.max_entries)
+            for d in docs[:self.max_entries]:
+                series.insert(d)
+        if self._loads.get(user) is token:
+            del self._loads[user]
+            self._store(user, series)
+        return series
+
+    def record_insert(self, user: Any, doc: Dict):
+        """Write-through for a journal entry this process just inserted"""
+        self._loads.pop(user, None)
+        if user not in self._users:
+            return
+        series = self._users[user]
+        if series is None:
+            return
+        if not cachable(doc):
+            self.invalidate(user)
+            return
+        before = series.nbytes()
+        series.insert(doc)
+        if len(series) > self.max_entries:
+            series.truncate(self.max_entries)
+            series.complete = False
+        self._bytes += series.nbytes() - before
+        self.write_throughs += 1
+        self._users.move_to_end(user)
+        while self._bytes > self.max_bytes and len(self._users) > 1:
+            self._drop(next(iter(self._users)))
+            self.evictions += 1
+
+    def invalidate(self, user: Any = None):
+        """Forgets one user, or everyone when user is None"""
+        if user is None:
+            self.invalidations += len(self._users)
+            self._users.clear()
+            self._loads.clear()
+            self._bytes = 0
+            return
+        self._loads.pop(user, None)
+        if user in self._users:
+            self._drop(user)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.bypassed
+        return {
+            "users": len(self._users),
+            "entries": sum(len(s) for s in self._users.values() if s is not None),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "write_throughs": self.write_throughs,
+        }
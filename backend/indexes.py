@@ -0,0 +1,61 @@
+# backend/indexes.py
+from datetime import datetime
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Every index the app relies on, applied from startup_event. Add the index here
+# together with any new hot query in HOT_QUERIES below.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "journals": [
+        # History reads sort by timestamp (either direction) with _id as the tie-breaker
+        IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="user_timestamp"),
+    ],
+    "goals": [
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="user_updated"),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated"),
+    ],
+    "mood_state": [
+        IndexModel([("user_id", ASCENDING)], name="user", unique=True),
+    ],
+    "feedback_jobs": [
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "emotion_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Hot queries checked with explain() by bench/check_query_plans.py. Each entry is
+# either a find (filter/sort/projection/limit) or an aggregate (pipeline).
+HOT_QUERIES: List[Dict] = [
+    {"name": "mood_state rebuild (last 50 entries)", "collection": "journals",
+     "filter": {"user_id": "u1"}, "sort": [("timestamp", DESCENDING)], "limit": 50},
+    {"name": "get_user_progress", "collection": "journals",
+     "filter": {"user_id": "u1"}, "sort": [("timestamp", ASCENDING)], "limit": 100},
+    {"name": "progress summary raw page", "collection": "journals",
+     "filter": {"user_id": "u1"}, "sort": [("timestamp", ASCENDING), ("_id", ASCENDING)], "limit": 501},
+    {"name": "progress summary buckets", "collection": "journals",
+     "pipeline": [
+         {"$match": {"user_id": "u1"}},
+         {"$group": {"_id": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}, "n": {"$sum": 1}}},
+     ]},
+    {"name": "emotion trends", "collection": "journals",
+     "filter": {"user_id": "u1", "timestamp": {"$gte": datetime(2000, 1, 1)}, "emotion_vector": {"$exists": True},
+                "emotion_tier": {"$ne": "fast"}},
+     "sort": [("timestamp", ASCENDING)], "limit": 5000},
+    {"name": "mood_state lookup", "collection": "mood_state", "filter": {"user_id": "u1"}, "limit": 1},
+    {"name": "goal listing per user", "collection": "goals",
+     "filter": {"user_id": "u1"}, "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)], "limit": 51},
+    {"name": "goal listing all users", "collection": "goals",
+     "filter": {}, "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)], "limit": 51},
+    {"name": "goal by id", "collection": "goals", "filter": {"_id": ObjectId("0" * 24)}, "limit": 1},
+    {"name": "claimable feedback jobs", "collection": "feedback_jobs",
+     "filter": {"$or": [{"status": "pending"}, {"status": "running", "lease_until": {"$lt": datetime(2000, 1, 1)}}]},
+     "limit": 1},
+]
+
+async def apply_indexes(db):
+    """Creates any missing index from INDEXES (a no-op for ones that already exist)"""
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
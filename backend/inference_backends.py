@@ -0,0 +1,83 @@
+# backend/inference_backends.py
+import os
+from typing import Dict, List
+
+# Every backend returns a transformers text-classification pipeline, so callers
+# (the micro-batcher) don't care which runtime sits underneath.
+
+def predict_token_ids(pipe, chunks: List[List[int]]) -> List[Dict[str, float]]:
+    """Scores already-tokenized chunks in one padded batch, skipping the pipeline's own tokenization.
+
+    Applies the same activation the text-classification pipeline would: sigmoid
+    for multi-label models (go_emotions), softmax otherwise.
+    """
+    import torch
+
+    tokenizer, model = pipe.tokenizer, pipe.model
+    batch = tokenizer.pad(
+        {"input_ids": [tokenizer.build_inputs_with_special_tokens(ids) for ids in chunks]},
+        return_tensors="pt",
+    )
+    with torch.inference_mode():
+        logits = model(**batch).logits.float()
+
+    config = model.config
+    if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+        probs = torch.sigmoid(logits)
+    else:
+        probs = torch.softmax(logits, dim=-1)
+
+    labels = [config.id2label[i] for i in range(probs.shape[-1])]
+    return [dict(zip(labels, map(float, row))) for row in probs.tolist()]
+
+def _load_torch(model_id: str, threads: int):
+    import torch
+    from transformers import pipeline
+
+    if threads:
+        torch.set_num_threads(threads)
+    return pipeline("text-classification", model=model_id, top_k=None)
+
+def _export_quantized_onnx(model_id: str, model_dir: str) -> str:
+    """Exports the model to ONNX once and applies dynamic int8 quantization"""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+
+    quantized_path = os.path.join(model_dir, "model_quantized.onnx")
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    print(f"Exporting {model_id} to ONNX in {model_dir} ...")
+    ORTModelForSequenceClassification.from_pretrained(model_id, export=True).save_pretrained(model_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(model_dir)
+    quantize_dynamic(os.path.join(model_dir, "model.onnx"), quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+def _load_onnx(model_id: str, threads: int, model_dir: str):
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    quantized_path = _export_quantized_onnx(model_id, model_dir)
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir,
+        file_name=os.path.basename(quantized_path),
+        session_options=options,
+        provider="CPUExecutionProvider",
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer, top_k=None)
+
+def load_emotion_pipeline(backend: str, model_id: str, threads: int = 0, onnx_dir: str = "models/go_emotions_onnx"):
+    if backend == "torch":
+        return _load_torch(model_id, threads)
+    if backend == "onnx":
+        return _load_onnx(model_id, threads, onnx_dir)
+    raise ValueError(f"Unknown emotion backend: {backend!r} (expected 'torch' or 'onnx')")
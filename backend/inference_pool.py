@@ -0,0 +1,203 @@
+# backend/inference_pool.py
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import connection as mp_connection
+from typing import Callable, Dict, List, Optional, Set
+
+# Pipeline inherited by forked workers (set in the parent right before forking)
+_FORKED_PIPELINE = None
+
+
+def _worker_main(index: int, requests, responses, threads: int, cpus: Optional[List[int]],
+                 loader: Optional[Callable]):
+    from inference_backends import predict_token_ids
+    import torch
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+
+    # Torch weights come from the parent via copy-on-write pages; backends that
+    # aren't fork-safe (ONNX Runtime sessions) build their own copy here instead
+    pipe = loader() if loader is not None else _FORKED_PIPELINE
+    predict_token_ids(pipe, [[0]])  # warm-up
+    responses.put(("ready", index, None))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        job_id, chunks = job
+        try:
+            responses.put((job_id, predict_token_ids(pipe, chunks), None))
+        except Exception as e:
+            responses.put((job_id, None, repr(e)))
+
+
+class InferencePool:
+    """N forked inference processes, each fed over its own local IPC queue.
+
+    The parent loads the model once and forks, so torch weights are shared
+    copy-on-write instead of duplicated per process. Each worker is limited to
+    `threads` intra-op threads and, when `pin_cpus` is set and there are enough
+    cores, pinned to its own CPU set so workers don't fight over the same cores.
+
+    Jobs go to the worker with the fewest outstanding jobs. A watcher thread
+    waits on the worker sentinels: when a worker dies (OOM kill, segfault) its
+    outstanding jobs fail and a replacement is forked. run() also gives up
+    after `timeout_s`, so a wedged worker can't stall the batcher for good.
+    """
+
+    def __init__(self, processes: int, threads: int = 1, pin_cpus: bool = True, timeout_s: float = 60.0):
+        self.processes = processes
+        self.threads = threads
+        self.pin_cpus = pin_cpus
+        self.timeout = timeout_s
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._workers: List = []
+        self._requests: List = []            # one request queue per worker
+        self._assigned: List[Set[int]] = []  # job ids each worker still owes a result for
+        self._owner: Dict[int, int] = {}     # job id -> worker index
+        self._stopping = False
+
+        # Metrics
+        self.worker_deaths = 0
+        self.timeouts = 0
+
+    def _cpu_sets(self) -> List[Optional[List[int]]]:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        if not self.pin_cpus or len(cpus) < self.processes * self.threads:
+            return [None] * self.processes
+        return [cpus[i * self.threads:(i + 1) * self.threads] for i in range(self.processes)]
+
+    def _spawn(self, index: int):
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, requests, self._responses, self.threads, self._cpus[index], self._loader),
+            daemon=True,
+        )
+        process.start()
+        self._workers[index] = process
+        self._requests[index] = requests
+
+    def start(self, pipe, loader: Optional[Callable] = None):
+        """Forks the workers and blocks until each has warmed up (call from a thread).
+
+        Torch must not have run a forward pass in the parent yet: forking after
+        its OpenMP thread pool has started can deadlock the children.
+        """
+        global _FORKED_PIPELINE
+        _FORKED_PIPELINE = pipe
+        self._ctx = mp.get_context("fork")
+        self._responses = self._ctx.Queue()
+        self._loader = loader
+        self._cpus = self._cpu_sets()
+        self._workers = [None] * self.processes
+        self._requests = [None] * self.processes
+        self._assigned = [set() for _ in range(self.processes)]
+        for index in range(self.processes):
+            self._spawn(index)
+
+        for _ in self._workers:
+            self._responses.get()  # ("ready", index, None)
+        threading.Thread(target=self._read_responses, daemon=True).start()
+        threading.Thread(target=self._watch_workers, daemon=True).start()
+
+    def _read_responses(self):
+        while True:
+            job_id, result, error = self._responses.get()
+            if job_id is None:
+                break
+            with self._lock:
+                future = self._forget(job_id)
+            if future is None:
+                continue  # "ready" from a replacement worker, or a job that already timed out
+            if error is not None:
+                future.set_exception(RuntimeError(f"Inference worker failed: {error}"))
+            else:
+                future.set_result(result)
+
+    def _watch_workers(self):
+        while not self._stopping:
+            sentinels = {process.sentinel: index for index, process in enumerate(self._workers)}
+            for sentinel in mp_connection.wait(list(sentinels), timeout=1.0):
+                if not self._stopping:
+                    self._replace_worker(sentinels[sentinel])
+
+    def _replace_worker(self, index: int):
+        """Fails the dead worker's outstanding jobs and forks a replacement"""
+        self._workers[index].join(timeout=1)  # reap it so exitcode is set
+        exitcode = self._workers[index].exitcode
+        with self._lock:
+            lost = [self._forget(job_id) for job_id in list(self._assigned[index])]
+        self.worker_deaths += 1
+        print(f"Inference worker {index} died (exit code {exitcode}), failing {len(lost)} jobs and restarting it")
+        error = RuntimeError(f"Inference worker {index} died (exit code {exitcode})")
+        for future in lost:
+            future.set_exception(error)
+        self._spawn(index)
+
+    def _forget(self, job_id: int) -> Optional[Future]:
+        """Drops a job's bookkeeping (call with the lock held) and returns its future"""
+        index = self._owner.pop(job_id, None)
+        if index is not None:
+            self._assigned[index].discard(job_id)
+        return self._pending.pop(job_id, None)
+
+    def _submit(self, chunks: List[List[int]]):
+        job_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            index = min(range(len(self._workers)), key=lambda i: len(self._assigned[i]))
+            self._pending[job_id] = future
+            self._owner[job_id] = index
+            self._assigned[index].add(job_id)
+            requests = self._requests[index]
+        requests.put((job_id, chunks))
+        return job_id, future
+
+    def submit(self, chunks: List[List[int]]) -> Future:
+        return self._submit(chunks)[1]
+
+    def run(self, chunks: List[List[int]]) -> List[Dict[str, float]]:
+        """Blocking call for the micro-batcher's worker thread"""
+        job_id, future = self._submit(chunks)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                index = self._owner.get(job_id)
+                self._forget(job_id)
+            self.timeouts += 1
+            if index is not None and self._workers[index].is_alive():
+                # A worker that sits on a job this long is wedged; the watcher restarts it
+                self._workers[index].terminate()
+            raise RuntimeError(f"Inference worker gave no result within {self.timeout:.0f}s")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "processes": len(self._workers),
+            "alive": sum(1 for process in self._workers if process.is_alive()),
+            "outstanding_jobs": len(self._pending),
+            "worker_deaths": self.worker_deaths,
+            "timeouts": self.timeouts,
+        }
+
+    def stop(self):
+        if not self._workers:
+            return
+        self._stopping = True
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._responses.put((None, None, None))
+        self._workers = []
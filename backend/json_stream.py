@@ -0,0 +1,129 @@
+# backend/json_stream.py
+import json
+from typing import Any, List, Optional, Tuple
+
+# Incremental JSON reader for streamed LLM output. Text arrives in arbitrary
+# pieces; feed() returns every value that became complete in that piece, with
+# its path from the root object (e.g. ("summary",) or ("tasks", 2)). Only values
+# at most `max_depth` deep are decoded, so each byte is scanned once and each
+# reported value is parsed once.
+
+_WHITESPACE = " \t\r\n"
+_STRUCTURAL = ",:{}[]" + _WHITESPACE
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind          # "{" or "["
+        self.start = start        # offset of the opening bracket
+        self.key = None           # current key (objects)
+        self.index = 0            # current element (arrays)
+        self.expect_key = kind == "{"
+
+    def position(self):
+        return self.key if self.kind == "{" else self.index
+
+
+class JSONStreamParser:
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.done = False
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._token_start: Optional[int] = None  # start of the current string or scalar
+
+    def _path(self) -> Tuple:
+        return tuple(frame.position() for frame in self._stack)
+
+    def _value_done(self, start: int, end: int, events: List[Tuple[Tuple, Any]]):
+        path = self._path()
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(self._buf[start:end])))
+
+    def feed(self, text: str) -> List[Tuple[Tuple, Any]]:
+        """Consumes more text; returns (path, value) for values completed by it.
+
+        Anything before the first "{" (a preamble or a code fence) is skipped, and
+        so is anything after the root object closes. Raises ValueError on
+        malformed JSON.
+        """
+        events: List[Tuple[Tuple, Any]] = []
+        if self.done:
+            return events
+        self._buf += text
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+
+        while i < n and not self.done:
+            c = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame.expect_key:
+                        frame.key = json.loads(buf[self._token_start:i + 1])
+                    else:
+                        self._value_done(self._token_start, i + 1, events)
+                    self._token_start = None
+                i += 1
+                continue
+
+            if not self._stack:
+                if c == "{":
+                    self._stack.append(_Frame("{", i))
+                i += 1
+                continue
+
+            if self._token_start is not None:
+                # Inside a number / true / false / null
+                if c not in _STRUCTURAL:
+                    i += 1
+                    continue
+                self._value_done(self._token_start, i, events)
+                self._token_start = None
+
+            frame = self._stack[-1]
+            if c in _WHITESPACE or c == ":":
+                pass
+            elif c == '"':
+                self._in_string = True
+                self._token_start = i
+            elif c == ",":
+                if frame.kind == "{":
+                    frame.expect_key = True
+                else:
+                    frame.index += 1
+            elif c in "{[":
+                if frame.expect_key:
+                    raise ValueError(f"Unexpected {c!r} at offset {i}")
+                self._stack.append(_Frame(c, i))
+            elif c in "}]":
+                closed = self._stack.pop()
+                if (c == "}") != (closed.kind == "{"):
+                    raise ValueError(f"Mismatched {c!r} at offset {i}")
+                if self._stack:
+                    self._value_done(closed.start, i + 1, events)
+                else:
+                    events.append(((), json.loads(buf[closed.start:i + 1])))
+                    self.done = True
+            else:
+                if frame.expect_key:
+                    raise ValueError(f"Unexpected {c!r} at offset {i}")
+                self._token_start = i
+            if frame.kind == "{" and c == ":":
+                frame.expect_key = False
+            i += 1
+
+        self._pos = i
+        return events
@@ -0,0 +1,321 @@
+# backend/llm_client.py
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import metrics
+from config import (
+    LLM_PROVIDER, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_S, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_S, LLM_BACKOFF_MAX_S, LLM_FAKE_LATENCY_MS, LLM_CACHE_SIZE, LLM_CACHE_TTL_S,
+)
+
+
+class GroqProvider:
+    """Groq chat completions over a pooled async HTTP client"""
+
+    def __init__(self, max_connections: int):
+        import httpx
+        from groq import AsyncGroq
+
+        # Retries are handled by LLMClient so backoff and timeouts stay in one place
+        self.client = AsyncGroq(
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            ),
+        )
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> str:
+        kwargs = {"response_format": response_format} if response_format else {}
+        chat_completion = await self.client.chat.completions.create(
+            messages=messages, model=model, temperature=temperature, **kwargs
+        )
+        return chat_completion.choices[0].message.content
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> AsyncIterator[str]:
+        # Groq doesn't support JSON mode together with streaming, so streamed
+        # JSON relies on the prompt and is validated by the caller
+        stream = await self.client.chat.completions.create(
+            messages=messages, model=model, temperature=temperature, stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+class FakeProvider:
+    """Offline stand-in: sleeps like a real completion and returns canned output"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000.0
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> str:
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        return self._canned(response_format)
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> AsyncIterator[str]:
+        # First token after ~20% of the latency, the rest spread over the remainder
+        latency = self.latency * random.uniform(0.5, 1.5)
+        text = self._canned(response_format)
+        pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+        await asyncio.sleep(latency * 0.2)
+        for piece in pieces:
+            yield piece
+            await asyncio.sleep(latency * 0.8 / len(pieces))
+
+    @staticmethod
+    def _canned(response_format: Optional[Dict]) -> str:
+        if response_format and response_format.get("type") == "json_object":
+            return json.dumps({
+                "summary": "A steady plan broken into small, doable steps.",
+                "tasks": [
+                    {"description": "Write down what finishing this goal looks like.", "completed": False},
+                    {"description": "Block 30 minutes in your calendar for the first step.", "completed": False},
+                    {"description": "Do the first step and note how it went.", "completed": False},
+                ],
+            })
+        return "Nice work! Every step you take keeps the momentum going."
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    # Connection-level failures from the provider SDK carry no status code
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def prompt_key(messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> str:
+    """Cache key for a completion request.
+
+    Message text is whitespace-collapsed and case-folded, so goals that differ
+    only in spacing or capitalisation share an entry.
+    """
+    normalized = [{"role": m["role"], "content": " ".join(m["content"].split()).casefold()} for m in messages]
+    payload = json.dumps(
+        {"messages": normalized, "model": model, "temperature": temperature, "response_format": response_format},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Bounded in-process LRU with TTL for completed LLM responses"""
+
+    def __init__(self, max_items: int, ttl_seconds: float):
+        self.max_items = max_items
+        self.ttl = ttl_seconds
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class LLMClient:
+    """Non-blocking LLM calls with a concurrency limit, per-call timeout and jittered retries"""
+
+    def __init__(self, provider, max_concurrency: int, timeout_s: float, max_retries: int,
+                 backoff_base_s: float = 0.5, backoff_max_s: float = 4.0, cache: Optional[ResponseCache] = None):
+        self.provider = provider
+        self.cache = cache
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.timeout = timeout_s
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base_s
+        self.backoff_max = backoff_max_s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Metrics
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+
+    async def complete(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None,
+                       cache: bool = False, validate: Optional[Callable[[str], Any]] = None) -> str:
+        """One completion. With cache=True, identical prompts are served from the
+        response cache, and concurrent identical prompts share one upstream call.
+
+        `validate` is run on a fresh response before it is cached; if it raises,
+        the response is not cached and every waiter gets the error.
+        """
+        if not cache:
+            return await self._complete(messages, model, temperature, response_format)
+
+        key = prompt_key(messages, model, temperature, response_format)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # Single flight: wait for the identical call already in progress
+            self.coalesced += 1
+        else:
+            self.cache_misses += 1
+            # The upstream call runs in its own task: a caller that goes away (client
+            # disconnect) only stops waiting, it doesn't cancel the call for the others
+            pending = asyncio.create_task(self._complete_and_cache(key, messages, model, temperature, response_format, validate))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda t: self._inflight.pop(key, None))
+            # Nobody may be waiting on it, so don't warn about an unretrieved exception
+            pending.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(pending)
+
+    async def _complete_and_cache(self, key: str, messages: List[Dict], model: str, temperature: float,
+                                  response_format: Optional[Dict], validate: Optional[Callable[[str], Any]]) -> str:
+        result = await self._complete(messages, model, temperature, response_format)
+        if validate is not None:
+            validate(result)
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    async def stream(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None,
+                     cache: bool = False, validate: Optional[Callable[[str], Any]] = None) -> AsyncIterator[str]:
+        """Streams a completion piece by piece under the same concurrency limit and
+        overall timeout as complete(). Nothing is retried once output has started.
+
+        With cache=True, a cached response for the same prompt is yielded as a
+        single piece. A streamed response that passes `validate` is then cached
+        for complete() and stream() alike. Streams are not coalesced.
+        """
+        key = prompt_key(messages, model, temperature, response_format) if cache and self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                yield cached
+                return
+            self.cache_misses += 1
+
+        self.calls += 1
+        kind = "json" if response_format else "text"
+        pieces = []
+        async with self._semaphore:
+            self.in_flight += 1
+            upstream = self.provider.stream(messages, model, temperature, response_format)
+            try:
+                with metrics.span(f"llm.stream.{kind}"):
+                    deadline = time.monotonic() + self.timeout
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        try:
+                            piece = await asyncio.wait_for(upstream.__anext__(), timeout=remaining)
+                        except StopAsyncIteration:
+                            break
+                        pieces.append(piece)
+                        yield piece
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                await upstream.aclose()
+
+        if key is not None:
+            result = "".join(pieces)
+            try:
+                if validate is not None:
+                    validate(result)
+            except Exception:
+                return
+            self.cache.set(key, result)
+
+    async def _complete(self, messages: List[Dict], model: str, temperature: float, response_format: Optional[Dict] = None) -> str:
+        self.calls += 1
+        kind = "json" if response_format else "text"
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        # Per attempt: upstream latency without semaphore queueing or backoff
+                        with metrics.span(f"llm.attempt.{kind}"):
+                            result = await asyncio.wait_for(
+                                self.provider.complete(messages, model, temperature, response_format),
+                                timeout=self.timeout,
+                            )
+                    finally:
+                        self.in_flight -= 1
+                metrics.SPAN_SECONDS.observe(time.perf_counter() - started, span=f"llm.complete.{kind}")
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    self.failures += 1
+                    metrics.SPAN_SECONDS.observe(time.perf_counter() - started, span=f"llm.complete.{kind}")
+                    metrics.SPAN_ERRORS.inc(span=f"llm.complete.{kind}")
+                    raise
+                attempt += 1
+                self.retries += 1
+                # Full jitter: sleep anywhere up to the capped exponential step
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses + self.coalesced
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "cache_size": len(self.cache) if self.cache is not None else 0,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "coalesced": self.coalesced,
+            # Share of cacheable requests that didn't need their own upstream call
+            "cache_hit_rate": ((self.cache_hits + self.coalesced) / lookups) if lookups else 0.0,
+        }
+
+
+_llm_client: Optional[LLMClient] = None
+metrics.register_collector(metrics.stats_collector("llm", lambda: _llm_client.stats() if _llm_client else {}))
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client, built on first use so it binds to the running event loop"""
+    global _llm_client
+    if _llm_client is None:
+        if LLM_PROVIDER == "fake":
+            provider = FakeProvider(LLM_FAKE_LATENCY_MS)
+        elif LLM_PROVIDER == "groq":
+            provider = GroqProvider(LLM_MAX_CONCURRENCY)
+        else:
+            raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER!r} (expected 'groq' or 'fake')")
+        _llm_client = LLMClient(
+            provider, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_S, LLM_MAX_RETRIES, LLM_BACKOFF_BASE_S, LLM_BACKOFF_MAX_S,
+            cache=ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL_S) if LLM_CACHE_SIZE > 0 else None,
+        )
+    return _llm_client
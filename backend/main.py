@@ -1,15 +1,101 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers.goals import router as goals_router
-from routers.journal import router as journal_router
-from crud.journal_crud import init_emotion_model
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from config import APP_ROLE, EMOTION_MODEL_LOAD, PROFILING_ENABLED, PROFILE_INTERVAL_S, EVENT_LOOP_LAG_INTERVAL_S, HISTORY_CACHE
+from database import db
+from indexes import apply_indexes
 import asyncio
+import time
+import metrics
+
+# Goal-only workers (APP_ROLE=goals) never import the journal modules, so the
+# transformers / torch / nltk stack stays out of their process entirely.
+SERVE_GOALS = APP_ROLE in ("all", "goals")
+SERVE_JOURNAL = APP_ROLE in ("all", "journal")
 
 app = FastAPI(title="Unified Mental Health App API")
 
 @app.on_event("startup")
 async def startup_event():
-    await init_emotion_model()
+    app.state.loop_monitor = asyncio.create_task(metrics.monitor_event_loop(EVENT_LOOP_LAG_INTERVAL_S))
+    await apply_indexes(db)
+    if SERVE_JOURNAL:
+        from crud.journal_crud import init_emotion_model, MODEL_STATE
+        if EMOTION_MODEL_LOAD == "startup":
+            await init_emotion_model()
+            if MODEL_STATE["status"] != "ready":
+                raise RuntimeError(f"Emotion model failed to load: {MODEL_STATE['error']}")
+        elif EMOTION_MODEL_LOAD == "background":
+            # Keep a reference so the warm-up task isn't garbage collected
+            app.state.model_warmup = asyncio.create_task(init_emotion_model())
+        if HISTORY_CACHE == "changestream":
+            from crud.journal_history import watch_journal_changes
+            app.state.history_watch = asyncio.create_task(watch_journal_changes())
+    if SERVE_GOALS:
+        from crud.goals_crud import FEEDBACK_JOBS
+        await FEEDBACK_JOBS.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.loop_monitor.cancel()
+    if SERVE_JOURNAL:
+        if HISTORY_CACHE == "changestream":
+            app.state.history_watch.cancel()
+        from crud.journal_crud import EMOTION_BATCHER, FAST_BATCHER, INFERENCE_POOL
+        from crud.journal_writes import JOURNAL_WRITES
+        if JOURNAL_WRITES is not None:
+            # Buffered journal entries must reach Mongo before the process exits
+            await JOURNAL_WRITES.stop()
+        await EMOTION_BATCHER.stop()
+        await FAST_BATCHER.stop()
+        if INFERENCE_POOL is not None:
+            INFERENCE_POOL.stop()
+    if SERVE_GOALS:
+        from crud.goals_crud import FEEDBACK_JOBS
+        await FEEDBACK_JOBS.stop()
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness probe: journal workers are ready once the emotion model has loaded"""
+    body = {"role": APP_ROLE, "ready": True}
+    if SERVE_JOURNAL:
+        from crud.journal_crud import MODEL_STATE
+        body["emotion_model"] = MODEL_STATE
+        body["ready"] = MODEL_STATE["status"] == "ready"
+    response.status_code = 200 if body["ready"] else 503
+    return body
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text format: request/span histograms, pool and loop gauges, queue and cache stats"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    profiler = None
+    if PROFILING_ENABLED and request.headers.get("x-profile"):
+        profiler = metrics.start_profiler(PROFILE_INTERVAL_S)
+
+    method = request.method
+    metrics.REQUESTS_IN_PROGRESS.inc(method=method)
+    started = time.perf_counter()
+    request.state.arrived = time.monotonic()  # admission control counts time spent before the gate against the SLO
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.REQUESTS_IN_PROGRESS.dec(method=method)
+        # Label by route template, not the raw path, so per-user URLs don't explode cardinality
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=method, route=route.path if route else "unmatched", status=status
+        )
+
+    if profiler is not None:
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+    return response
 
 origins = ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:3000", "http://127.0.0.1:3000", "http://192.168.1.35:8080"] 
 app.add_middleware(
@@ -19,5 +105,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.include_router(goals_router) 
-app.include_router(journal_router)
+if SERVE_GOALS:
+    from routers.goals import router as goals_router
+    app.include_router(goals_router) 
+if SERVE_JOURNAL:
+    from routers.journal import router as journal_router
+    app.include_router(journal_router)
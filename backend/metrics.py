@@ -0,0 +1,242 @@
+# backend/metrics.py
+import asyncio
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus-style metrics: counters, gauges and histograms rendered in
+# the text exposition format by GET /metrics. Values are per process, so scrape
+# every worker. Histograms can be observed from worker threads (the model
+# forward pass runs in one), hence the lock.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[Tuple[str, str, float]]]] = []
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple[str, str, float]]]):
+    """Adds a callback run at scrape time that yields (name, help, value) gauge samples"""
+    _collectors.append(collect)
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict[str, Any]]) -> Callable[[], Iterable[Tuple[str, str, float]]]:
+    """Exposes the numeric fields of an existing stats() dict as `<prefix>_<field>` gauges"""
+    def collect():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)):
+                yield f"{prefix}_{key}", f"{prefix} stats field {key}", float(value)
+    return collect
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for collect in _collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+            continue
+        for name, help, value in samples:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+    return "\n".join(lines) + "\n"
+
+
+# --- Hot-path timing -----------------------------------------------------------
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests currently being handled", ["method"])
+SPAN_SECONDS = Histogram("app_span_seconds", "Time spent in instrumented hot-path sections", ["span"])
+SPAN_ERRORS = Counter("app_span_errors_total", "Instrumented sections that raised", ["span"])
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block into app_span_seconds{span=name}"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - started, span=name)
+
+
+def timed(name: str):
+    """Decorator form of span() for sync and async functions"""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Thread pool and event loop ---------------------------------------------------
+
+THREADS_BUSY = Gauge("app_to_thread_busy", "Calls currently running in the default thread pool")
+THREAD_WAIT_SECONDS = Histogram("app_to_thread_wait_seconds", "Time a to_thread call waited for a free pool thread")
+LOOP_LAG_SECONDS = Gauge("app_event_loop_lag_seconds", "How late the event loop woke the lag probe, last sample")
+LOOP_LAG_HISTOGRAM = Histogram("app_event_loop_lag_sample_seconds", "Event loop lag samples",
+                               buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+async def to_thread(fn: Callable, *args, **kwargs):
+    """asyncio.to_thread that tracks pool occupancy and queueing delay"""
+    submitted = time.perf_counter()
+
+    def run():
+        THREAD_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        THREADS_BUSY.inc()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            THREADS_BUSY.dec()
+
+    return await asyncio.to_thread(run)
+
+
+def _thread_pool_capacity():
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    workers = getattr(executor, "_max_workers", None) or min(32, (os.cpu_count() or 1) + 4)
+    yield "app_to_thread_max_workers", "Size of the default thread pool", float(workers)
+
+register_collector(_thread_pool_capacity)
+
+
+async def monitor_event_loop(interval: float = 0.25):
+    """Background task: samples how late a fixed sleep wakes up"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        LOOP_LAG_SECONDS.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+# --- Per-request profiling ----------------------------------------------------
+
+def start_profiler(interval: float) -> Optional[Any]:
+    """Starts a pyinstrument sampling profiler for the current request (None if not installed)"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("X-Profile requested but pyinstrument is not installed (pip install pyinstrument)")
+        return None
+    profiler = Profiler(interval=interval, async_mode="enabled")
+    profiler.start()
+    return profiler
@@ -0,0 +1,195 @@
+# backend/mood_analytics.py
+"""Nightly cohort report: which users' mood declined over a window.
+
+Streams db.journals in (user_id, timestamp) order into columnar NumPy blocks
+and computes rolling z-scores and CUSUM for every user at once, using segment
+boundaries instead of a per-user Python loop.
+
+    python mood_analytics.py --days 30 --k 0.1 --h 0.8 --write
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from config import WINDOW, BASELINE_WINDOW, CUSUM_K, CUSUM_H
+
+BLOCK_ROWS = 1_000_000   # rows per analysed block (always cut at a user boundary)
+Z_DECLINE = -1.5         # same z threshold as the write path
+
+
+def segment_starts(users: np.ndarray) -> np.ndarray:
+    """Index of the first row of each user's segment (rows sorted by user)"""
+    if len(users) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([[0], np.flatnonzero(users[1:] != users[:-1]) + 1])
+
+
+def rolling_z_scores(values: np.ndarray, row_segment_start: np.ndarray, window: int = WINDOW) -> np.ndarray:
+    """z-score of each value against the user's previous `window - 1` values (as compute_z_score).
+
+    The window sums are taken directly over the `window - 1` shifted copies of the
+    column (two passes, mean then squared deviations) rather than as differences of
+    block-wide prefix sums, which lose the variance of a user's few entries once a
+    block holds ~1M rows.
+    """
+    n = len(values)
+    idx = np.arange(n)
+    lo = np.maximum(row_segment_start, idx - (window - 1))
+    count = idx - lo
+
+    total = np.zeros(n)
+    for j in range(window - 1, 0, -1):
+        total[j:] += np.where(count[j:] >= j, values[:-j], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        squares = np.zeros(n)
+        for j in range(window - 1, 0, -1):
+            dev = values[:-j] - mean[j:]
+            squares[j:] += np.where(count[j:] >= j, dev * dev, 0.0)
+        var = squares / count
+        # Rounding in the mean leaves tiny residue where the window is constant
+        var = np.where(var > 1e-12, var, 0.0)
+        z = (values - mean) / np.sqrt(var)
+    return np.where((count > 0) & (var > 0), z, 0.0)
+
+
+def segmented_cusum(d: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """S_t = max(0, S_{t-1} + d_t) restarted at every segment start, without a Python loop.
+
+    Uses S_t = C_t - min(0, min_{j<=t} C_j) with C the per-segment cumulative sum. The
+    running minimum is made segment-local by shifting each segment below all
+    earlier ones before one global minimum.accumulate.
+    """
+    if len(d) == 0:
+        return d
+    lengths = np.diff(np.append(starts, len(d)))
+    seg = np.repeat(np.arange(len(starts)), lengths)
+    total = np.cumsum(d)
+    before = np.concatenate([[0.0], total])[starts]
+    c = total - before[seg]
+
+    shift = 2.0 * np.abs(c).max() + 1.0
+    running_min = np.minimum.accumulate(c - seg * shift) + seg * shift
+    return c - np.minimum(running_min, 0.0)
+
+
+def analyze_block(users: np.ndarray, timestamps: np.ndarray, moods: np.ndarray, window_start: np.datetime64,
+                  k: float = CUSUM_K, h: float = CUSUM_H, z_threshold: float = Z_DECLINE) -> List[Dict]:
+    """Per-user decline summary for users with entries at or after window_start.
+
+    Rows must be sorted by (user, timestamp); rows before window_start are history
+    used for rolling z-scores and the CUSUM baseline.
+    """
+    starts = segment_starts(users)
+    lengths = np.diff(np.append(starts, len(users)))
+    row_start = np.repeat(starts, lengths)
+    z = rolling_z_scores(moods, row_start)
+
+    in_window = timestamps >= window_start
+    if not in_window.any():
+        return []
+    w_rows = np.flatnonzero(in_window)
+    w_starts = segment_starts(users[w_rows])
+    first_rows = w_rows[w_starts]                 # first window row of each reported user
+    user_start = row_start[first_rows]
+
+    # Baseline: mean of up to BASELINE_WINDOW entries before the window, else the window mean
+    c1 = np.concatenate([[0.0], np.cumsum(moods)])
+    pre_lo = np.maximum(user_start, first_rows - BASELINE_WINDOW)
+    pre_count = first_rows - pre_lo
+    w_lengths = np.diff(np.append(w_starts, len(w_rows)))
+    w_sum = np.add.reduceat(moods[w_rows], w_starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = np.where(pre_count > 0, (c1[first_rows] - c1[pre_lo]) / pre_count, w_sum / w_lengths)
+
+    w_seg = np.repeat(np.arange(len(w_starts)), w_lengths)
+    d = baseline[w_seg] - moods[w_rows] - k
+    cusum = segmented_cusum(d, w_starts)
+
+    w_z = z[w_rows]
+    min_z = np.minimum.reduceat(w_z, w_starts)
+    max_cusum = np.maximum.reduceat(cusum, w_starts)
+    last = w_starts + w_lengths - 1
+    declined = (min_z < z_threshold) | (max_cusum > h)
+
+    return [{
+        "user_id": str(users[first_rows[i]]),
+        "entries": int(w_lengths[i]),
+        "mean_mood": float(w_sum[i] / w_lengths[i]),
+        "baseline_mean": float(baseline[i]),
+        "min_z_score": float(min_z[i]),
+        "last_z_score": float(w_z[last[i]]),
+        "max_cusum": float(max_cusum[i]),
+        "last_cusum": float(cusum[last[i]]),
+        "mood_decline": bool(declined[i]),
+    } for i in range(len(w_starts))]
+
+
+async def cohort_report(db, start: datetime, end: datetime, k: float = CUSUM_K, h: float = CUSUM_H,
+                        history_days: int = 90, block_rows: int = BLOCK_ROWS) -> Dict:
+    """Streams journals for [start - history_days, end) and summarises every user active in [start, end)"""
+    cursor = db.journals.find(
+        {"timestamp": {"$gte": start - timedelta(days=history_days), "$lt": end}},
+        projection={"_id": 0, "user_id": 1, "timestamp": 1, "weighted_mood": 1},
+    ).sort([("user_id", 1), ("timestamp", 1)]).batch_size(50_000)
+
+    window_start = np.datetime64(start.replace(tzinfo=None), "us")
+    users: List[str] = []
+    timestamps: List[datetime] = []
+    moods: List[float] = []
+    summaries: List[Dict] = []
+    entries = 0
+
+    def flush(upto: Optional[int] = None):
+        nonlocal users, timestamps, moods
+        upto = len(users) if upto is None else upto
+        if upto:
+            summaries.extend(analyze_block(
+                np.array(users[:upto], dtype=object),
+                np.array(timestamps[:upto], dtype="datetime64[us]"),
+                np.array(moods[:upto], dtype=np.float64),
+                window_start, k, h,
+            ))
+        users, timestamps, moods = users[upto:], timestamps[upto:], moods[upto:]
+
+    async for doc in cursor:
+        users.append(doc["user_id"])
+        timestamps.append(doc["timestamp"].replace(tzinfo=None))
+        moods.append(doc["weighted_mood"])
+        entries += 1
+        if len(users) >= block_rows and users[-1] != users[-2]:
+            # Cut before the newest user so no user spans two blocks
+            flush(len(users) - 1)
+    flush()
+
+    return {
+        "start": start, "end": end, "k": k, "h": h,
+        "entries_scanned": entries,
+        "users_active": len(summaries),
+        "users_declined": sum(s["mood_decline"] for s in summaries),
+        "users": summaries,
+    }
+
+
+async def _main(args):
+    from database import db
+
+    end = datetime.utcnow()
+    report = await cohort_report(db, end - timedelta(days=args.days), end, args.k, args.h, args.history_days)
+    declined = [s for s in report["users"] if s["mood_decline"]]
+    print(f"{report['entries_scanned']} entries, {report['users_active']} active users, {len(declined)} declined")
+    if args.write:
+        # Store only the declined users; the full per-user table can be huge
+        await db.cohort_reports.insert_one({**{k: v for k, v in report.items() if k != "users"},
+                                            "declined": declined, "created_at": datetime.utcnow()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--k", type=float, default=CUSUM_K)
+    parser.add_argument("--h", type=float, default=CUSUM_H)
+    parser.add_argument("--write", action="store_true", help="save the report to db.cohort_reports")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,23 @@
+# backend/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Dict
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Opaque keyset cursors shared by the paginated list endpoints
+
+def encode_cursor(values: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+_FIELD_PARSERS = {"ts": datetime.fromisoformat, "id": ObjectId}
+
+def decode_cursor(cursor: str, *fields: str) -> Dict:
+    """Decodes a cursor and parses the keyset `fields` it must carry ("ts" to datetime,
+    "id" to ObjectId); a missing or malformed field is a 400 like a garbled cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return {**values, **{field: _FIELD_PARSERS[field](values[field]) for field in fields}}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -4,23 +4,52 @@ from database import goal_collection
 from bson import ObjectId
 from schemas.goals_schemas import goal_create, SubTask, SubTaskUpdate, GoalAnalysis
 from fastapi.middleware.cors import CORSMiddleware 
-from crud.goals_crud import create_goal,get_goal,update_goal,delete_goal,update_subtask_status,calculate_progress
-from fastapi import APIRouter
+from crud.goals_crud import create_goal,stream_goal_creation,get_goal,update_goal,delete_goal,update_subtask_status,calculate_progress,FEEDBACK_JOBS
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from config import FEEDBACK_WAIT_MAX_S
+from admission import admit, Slot
+import json
+from datetime import date
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/goals",
     tags=["Goals"],)
 
-@router.post("/")
+@router.post("/", dependencies=[Depends(admit("goals", "llm"))])
 async def add_goal(goal: goal_create):
     goal_id = await create_goal(goal)
     if goal_id:
         return {"goal_id": goal_id, "message": "Goal created successfully!"}
     return {"message": "Failed to create goal."}
 
+@router.post("/stream")
+async def add_goal_streaming(goal: goal_create, slot: Slot = Depends(admit("goals", "llm"))):
+    """Server-sent events: `summary`, then one `subtask` per task as the model writes
+    them, then `goal` with the stored goal_id (`reset` means start over, see crud)"""
+    async def events():
+        async for event, data in stream_goal_creation(goal):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    # The LLM slot stays held while the model streams, not just until the endpoint returns
+    return slot.streaming_response(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/")
-async def list_goals():
-    goals = await get_goal()
-    return {"goals": goals}
+async def list_goals(
+    user_id: Optional[str] = None,
+    status: Optional[Literal["Not Started", "In Progress", "Completed"]] = None,
+    start_after: Optional[date] = None,
+    end_before: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    view: Literal["full", "list"] = "full",
+):
+    # view=list leaves out subtasks and summaries for lightweight list screens.
+    # Pages are opt-in: without limit or cursor every goal comes back, as the frontend expects
+    if cursor and limit is None:
+        limit = 50
+    goals, next_cursor = await get_goal(user_id, status, start_after, end_before, cursor, limit, view)
+    return {"goals": goals, "next_cursor": next_cursor}
 
 @router.put("/{goal_id}/subtask/")
 async def modify_subtask(goal_id: str, subtask_update: SubTaskUpdate):
@@ -28,11 +57,38 @@ async def modify_subtask(goal_id: str, subtask_update: SubTaskUpdate):
     success, message = await update_subtask_status(goal_id, subtask_update)
 
     if success:
-        return {"message": message}  # Return the AI's encouragement message!
+        # The AI's encouragement message arrives later via /goals/{goal_id}/feedback
+        return {"message": message, "feedback_url": f"/goals/{goal_id}/feedback"}
 
     # If failed, return the error message
     return {"message": message if not success and message != "Failed to update subtask." else "Failed to update subtask or goal progress. Check goal_id and index."}
 
+@router.get("/feedback_stats")
+async def feedback_stats():
+    return FEEDBACK_JOBS.stats()
+
+@router.get("/{goal_id}/feedback")
+async def get_feedback(goal_id: str, wait: float = Query(0, ge=0, le=FEEDBACK_WAIT_MAX_S)):
+    """Latest encouragement message for a goal; `wait` long-polls while it's still pending or running"""
+    job = await FEEDBACK_JOBS.wait_for(goal_id, wait) if wait else await FEEDBACK_JOBS.get(goal_id)
+    if job is None:
+        return {"status": "none", "message": None}
+    return {"status": job["status"], "message": job.get("message")}
+
+@router.get("/{goal_id}/feedback/stream")
+async def stream_feedback(goal_id: str):
+    """Server-sent events: a `status` event now, then `feedback` once the message is ready"""
+    async def events():
+        job = await FEEDBACK_JOBS.get(goal_id)
+        status = job["status"] if job else "none"
+        yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+        if status in ("pending", "running"):
+            job = await FEEDBACK_JOBS.wait_for(goal_id, FEEDBACK_WAIT_MAX_S)
+        if job is not None:
+            yield f"event: feedback\ndata: {json.dumps({'status': job['status'], 'message': job.get('message')})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @router.put("/{goal_id}")
 async def modify_goal(goal_id: str, updated_data: dict):
     success = await update_goal(db, goal_id, updated_data)
@@ -1,13 +1,58 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from schemas.journal_schemas import EntryIn, EntryOut
-from crud.journal_crud import create_mood_entry, get_user_progress
+from crud.journal_crud import create_mood_entry, get_user_progress, EMOTION_BATCHER, EMOTION_CACHE
+from crud.journal_import_crud import import_mood_entries
+from crud.progress_crud import get_progress_summary, get_emotion_trends
+from admission import admit, BULK
 
 router = APIRouter()
 
-@router.post("/submit_entry", response_model=EntryOut)
+@router.post("/submit_entry", response_model=EntryOut, dependencies=[Depends(admit("journal", "model"))])
 async def submit_entry(payload: EntryIn):
     return await create_mood_entry(payload)
 
+@router.post("/import_entries", dependencies=[Depends(admit("import", "model", BULK))])
+async def import_entries(request: Request):
+    """Bulk import: NDJSON body with one EntryIn per line, NDJSON results back"""
+    results = await import_mood_entries(request.stream())
+
+    def stream_results():
+        try:
+            while chunk := results.read(64 * 1024):
+                yield chunk
+        finally:
+            results.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.get("/get_progress/{user_id}")
 async def get_progress(user_id: str, limit: int = 100):
-    return await get_user_progress(user_id, limit)
\ No newline at end of file
+    return await get_user_progress(user_id, limit)
+
+@router.get("/get_progress/{user_id}/summary")
+async def get_progress_summary_route(
+    user_id: str,
+    bucket: Literal["none", "day", "week", "month"] = "day",
+    limit: int = Query(500, ge=1, le=5000),
+    points: Optional[int] = Query(None, ge=3, le=5000),
+    cursor: Optional[str] = None,
+):
+    """Bucketed (or raw) mood series, optionally LTTB-downsampled to `points`"""
+    return await get_progress_summary(user_id, bucket, limit, points, cursor)
+
+@router.get("/get_progress/{user_id}/emotions")
+async def get_emotion_trends_route(
+    user_id: str,
+    labels: List[str] = Query([]),
+    bucket: Literal["none", "day", "week", "month"] = "day",
+    days: int = Query(90, ge=1, le=3650),
+    limit: int = Query(5000, ge=1, le=20000),
+):
+    """Per-label emotion score trends from stored vectors (all 28 labels unless `labels` is given)"""
+    return await get_emotion_trends(user_id, labels, bucket, days, limit)
+
+@router.get("/inference_stats")
+async def inference_stats():
+    return {"batcher": EMOTION_BATCHER.stats(), "cache": EMOTION_CACHE.stats()}
@@ -7,6 +7,7 @@ class SubTask(BaseModel):
     description: str
     completed: bool = False  # Status of the subtask
 class goal_create(BaseModel):
+    user_id: Optional[str] = None  # Owner of the goal; used to scope listings
     title: str
     description: str
     achievable: bool
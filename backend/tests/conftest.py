@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Tests import the backend modules the way main.py does (from the backend directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """A fresh mongomock-motor database bound into the crud modules that read and write journals"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import database
+    from crud import journal_import_crud, mood_state_crud
+
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(database, "db", db)
+    monkeypatch.setattr(database, "mood_state_collection", db["mood_state"])
+    monkeypatch.setattr(journal_import_crud, "db", db)
+    monkeypatch.setattr(mood_state_crud, "db", db)
+    monkeypatch.setattr(mood_state_crud, "mood_state_collection", db["mood_state"])
+    return db
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import admission
+from admission import GATES, AdmissionGate
+from routers import goals as goals_router
+
+GOAL = {
+    "user_id": "u1", "title": "Run a 10k", "description": "Build up to a 10k run", "achievable": True,
+    "relevant": "Fitness", "start_date": "2026-01-01", "end_date": "2026-03-01", "reminder_frequency": "weekly",
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(admission, "ENABLED", True)
+    app = FastAPI()
+    app.include_router(goals_router.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_goal_stream_holds_llm_slot_while_body_is_sent(client, monkeypatch):
+    gate = GATES["llm"]
+    active_before = gate.stats()["active"]
+    seen = []
+
+    async def fake_stream(goal):
+        for i in range(3):
+            await asyncio.sleep(0)
+            seen.append(gate.stats()["active"])
+            yield "subtask", {"index": i}
+        yield "goal", {"goal_id": "g1"}
+
+    monkeypatch.setattr(goals_router, "stream_goal_creation", fake_stream)
+    response = client.post("/goals/stream", json=GOAL)
+
+    assert response.status_code == 200
+    assert response.text.count("event: subtask") == 3
+    assert seen == [active_before + 1] * 3
+    assert gate.stats()["active"] == active_before
+
+
+def test_goal_stream_releases_slot_when_stream_fails(client, monkeypatch):
+    gate = GATES["llm"]
+    active_before = gate.stats()["active"]
+
+    async def failing_stream(goal):
+        yield "summary", {"summary": "..."}
+        raise RuntimeError("upstream closed")
+
+    monkeypatch.setattr(goals_router, "stream_goal_creation", failing_stream)
+    with pytest.raises(RuntimeError):
+        client.post("/goals/stream", json=GOAL)
+    assert gate.stats()["active"] == active_before
+
+
+def test_completion_estimate_counts_own_service_time():
+    gate = AdmissionGate("test", max_concurrent=4, max_queue=8, slo_s=2.0)
+    gate.service_s = gate.service_tail_s = 1.0
+
+    async def main():
+        await gate.acquire("journal")  # free slot and idle gate: admitted
+        # A slot is still free, but 0.7 s already spent + 1 s of service misses the 1.6 s budget
+        with pytest.raises(HTTPException) as shed:
+            await gate.acquire("journal", elapsed=0.7)
+        assert shed.value.status_code == 503
+        await gate.acquire("journal", elapsed=0.5)
+
+    asyncio.run(main())
+    assert gate.stats()["shed_slo"] == 1 and gate.stats()["active"] == 2
+
+
+def test_adaptive_limit_follows_hold_time():
+    gate = AdmissionGate("test", max_concurrent=64, max_queue=8, slo_s=3.75, max_bulk=1, adaptive=True)
+    assert gate.limit == 2
+
+    def full_round(held_s):
+        # Every completion comes from a full gate
+        for _ in range(max(gate.ROUND_MIN, int(gate.limit))):
+            gate._active = int(gate.limit)
+            gate.release(held_s=held_s)
+
+    for _ in range(40):
+        full_round(0.2)  # well under the 1 s target: grows, 20% a round at most
+    assert gate.limit == 64
+    full_round(4.0)      # four times the target: at most halves
+    assert gate.limit == 32
+    for _ in range(10):
+        full_round(2.0)
+    assert gate.limit == 2
+
+
+def test_adaptive_limit_does_not_grow_on_an_idle_gate():
+    gate = AdmissionGate("test", max_concurrent=64, max_queue=8, slo_s=3.75, max_bulk=1, adaptive=True)
+    for _ in range(100):
+        gate._active = 1
+        gate.release(held_s=0.1)
+    assert gate.limit == 2
@@ -0,0 +1,41 @@
+import os
+import sys
+import pytest
+from config import EMOTION_MODEL_ID, EMOTION_ONNX_DIR
+
+# Downloads the model and exports/quantizes it to ONNX on first run, so it's opt-in:
+#     TEST_EMOTION_BACKENDS=1 python -m pytest -q tests/test_backend_parity.py
+pytestmark = pytest.mark.skipif(os.getenv("TEST_EMOTION_BACKENDS") != "1",
+                                reason="set TEST_EMOTION_BACKENDS=1 to compare the torch and onnx backends")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+MAX_DRIFT = 0.05  # largest per-label score difference int8 ONNX may show against torch
+
+
+@pytest.fixture(scope="module")
+def pipelines():
+    pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("optimum.onnxruntime")
+    from inference_backends import load_emotion_pipeline
+
+    return {backend: load_emotion_pipeline(backend, EMOTION_MODEL_ID, 1, EMOTION_ONNX_DIR) for backend in ("torch", "onnx")}
+
+
+def test_onnx_scores_stay_close_to_torch(pipelines):
+    from bench_backends import SAMPLES
+    from inference_backends import predict_token_ids
+
+    texts = list(dict.fromkeys(SAMPLES))
+    tokenizer = pipelines["torch"].tokenizer
+    chunks = [tokenizer(text, add_special_tokens=False)["input_ids"] for text in texts]
+
+    # The batched token-id path is what the emotion batcher runs in production
+    reference = predict_token_ids(pipelines["torch"], chunks)
+    quantized = predict_token_ids(pipelines["onnx"], chunks)
+    for text, ref, got in zip(texts, reference, quantized):
+        assert set(got) == set(ref)
+        drift = {label: abs(ref[label] - got[label]) for label in ref}
+        worst = max(drift, key=drift.get)
+        assert drift[worst] <= MAX_DRIFT, f"{worst} drifted {drift[worst]:.4f} on {text!r}"
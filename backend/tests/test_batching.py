@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from batching import MicroBatcher
+
+
+def test_queued_items_fill_one_batch_without_waiting():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        # With no time to wait for company, a batch still takes everything already queued
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=0.0)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(main()) == [i * 2 for i in range(20)]
+    assert sizes == [8, 8, 4]
+
+
+def test_stop_fails_items_not_yet_dispatched():
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(5)
+        return items
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=1000.0, max_in_flight=1)
+        in_flight = [asyncio.ensure_future(batcher.submit(i)) for i in range(2)]
+        await asyncio.sleep(0.05)  # the first batch is running batch_fn
+        # 2 and 3 are taken off the queue as the next batch, which waits for a slot; 4 and 5 stay queued
+        waiting = [asyncio.ensure_future(batcher.submit(i)) for i in range(2, 6)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        release.set()
+        # Without the drain these futures never resolve
+        return await asyncio.gather(*in_flight), await asyncio.wait_for(asyncio.gather(*waiting, return_exceptions=True), 5)
+
+    dispatched, stopped = asyncio.run(main())
+    assert dispatched == [0, 1]
+    assert all(isinstance(e, RuntimeError) for e in stopped)
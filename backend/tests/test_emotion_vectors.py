@@ -0,0 +1,20 @@
+import numpy as np
+from config import GO_EMOTIONS_LABELS
+from emotion_vectors import vector_fields, unpack_vectors
+
+
+def test_full_model_entries_carry_no_tier():
+    fields = vector_fields({label: 0.5 for label in GO_EMOTIONS_LABELS})
+    assert "emotion_tier" not in fields
+
+
+def test_fast_tier_entries_are_marked():
+    scores = {label: 1 / len(GO_EMOTIONS_LABELS) for label in GO_EMOTIONS_LABELS}
+    fields = vector_fields(scores, "fast")
+    assert fields["emotion_tier"] == "fast"
+    # The scores themselves are stored unchanged, the per-entry ranking still uses them
+    np.testing.assert_allclose(unpack_vectors([fields])[0], list(scores.values()), atol=1e-3)
+
+
+def test_no_scores_no_fields():
+    assert vector_fields({}, "fast") == {}
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from feedback_jobs import FeedbackJobQueue, DONE, PENDING, RUNNING
+
+
+@pytest.fixture
+def jobs():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["test"]["feedback_jobs"]
+
+
+def test_leftover_jobs_run_once_across_processes(jobs):
+    calls = []
+
+    async def handler(goal_id, subtask_index):
+        calls.append(goal_id)
+        await asyncio.sleep(0.01)
+        return f"feedback for {goal_id}"
+
+    async def main():
+        await jobs.insert_many([{"_id": f"g{i}", "status": PENDING, "subtask_index": 0, "version": 1} for i in range(20)])
+        # Two worker processes starting against the same leftover jobs
+        queues = [FeedbackJobQueue(jobs, handler, workers=2) for _ in range(2)]
+        for queue in queues:
+            await queue.start()
+        for _ in range(100):
+            if await jobs.count_documents({"status": DONE}) == 20:
+                break
+            await asyncio.sleep(0.01)
+        for queue in queues:
+            await queue.stop()
+        return queues, await jobs.find().to_list(length=None)
+
+    queues, docs = asyncio.run(main())
+    assert sorted(calls) == sorted(f"g{i}" for i in range(20))
+    assert all(doc["status"] == DONE and "owner" not in doc for doc in docs)
+    assert sum(queue.recovered for queue in queues) == 20
+
+
+def test_expired_lease_is_claimed_again(jobs):
+    async def handler(goal_id, subtask_index):
+        return "ok"
+
+    async def main():
+        queue = FeedbackJobQueue(jobs, handler, lease_s=60)
+        await jobs.insert_many([
+            {"_id": "live", "status": RUNNING, "owner": "other", "lease_until": datetime(2100, 1, 1, tzinfo=timezone.utc)},
+            {"_id": "dead", "status": RUNNING, "owner": "other", "lease_until": datetime(2000, 1, 1, tzinfo=timezone.utc)},
+        ])
+        return await queue._claim({"_id": "live"}), await queue._claim({"_id": "dead"}), queue.owner
+
+    live, dead, owner = asyncio.run(main())
+    assert live is None
+    assert dead["status"] == RUNNING and dead["owner"] == owner
+
+
+def test_wait_for_drops_its_event(jobs):
+    async def handler(goal_id, subtask_index):
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        queue = FeedbackJobQueue(jobs, handler)
+        await queue.start()
+        await queue.enqueue("g1", 0)
+        waited = await asyncio.gather(*(queue.wait_for("g1", timeout=5) for _ in range(3)))
+        await queue.stop()
+        return queue, waited
+
+    queue, waited = asyncio.run(main())
+    assert [job["status"] for job in waited] == [DONE] * 3
+    assert queue._finished == {} and queue._waiting == {}
@@ -0,0 +1,121 @@
+import random
+from datetime import datetime, timedelta
+from config import GO_EMOTIONS_LABELS
+from emotion_vectors import vector_fields, unpack_vectors, top_k_rows
+from history_cache import HistoryCache, EMOJIS
+
+
+def make_doc(rng, ts):
+    scores = {label: rng.random() for label in GO_EMOTIONS_LABELS}
+    return {
+        "timestamp": ts,
+        "weighted_mood": rng.uniform(-1, 1),
+        "emoji": rng.choice(EMOJIS),
+        "z_score": rng.uniform(-3, 3),
+        "cusum": rng.uniform(0, 2),
+        "mood_decline": rng.random() < 0.2,
+        **vector_fields(scores),
+    }
+
+
+def reference_series(docs, limit):
+    """get_user_progress's response built straight from the documents"""
+    docs = sorted(docs, key=lambda d: d["timestamp"])[:limit]
+    top = top_k_rows(unpack_vectors(docs))
+    return [
+        {
+            "timestamp": d["timestamp"].isoformat(),
+            "weighted_mood": d["weighted_mood"],
+            "emoji": d["emoji"],
+            "top_emotions": t,
+            "mood_decline": d["mood_decline"],
+            "z_score": d["z_score"],
+            "cusum": d["cusum"],
+        }
+        for d, t in zip(docs, top)
+    ]
+
+
+def timestamps(rng, n):
+    # Distinct, millisecond-precision timestamps (BSON dates keep milliseconds)
+    start = datetime(2026, 1, 1)
+    offsets = rng.sample(range(10 ** 9), n)
+    return [start + timedelta(milliseconds=o) for o in offsets]
+
+
+def test_write_through_matches_documents():
+    rng = random.Random(1)
+    cache = HistoryCache(max_entries_per_user=64)
+    stamps = timestamps(rng, 100)
+    loaded = [make_doc(rng, ts) for ts in sorted(stamps[:30])]
+    series = cache.finish_load("u", cache.begin_load("u"), loaded)
+    assert series.complete
+
+    docs = list(loaded)
+    for ts in stamps[30:60]:  # arbitrary order, so many inserts are back-dated
+        doc = make_doc(rng, ts)
+        docs.append(doc)
+        cache.record_insert("u", doc)
+
+    found, series = cache.get("u")
+    assert found and series.complete and len(series) == 60
+    assert series.progress_series(100) == reference_series(docs, 100)
+    assert series.progress_series(7) == reference_series(docs, 7)
+
+    moods, last = series.recent_moods(50)
+    newest = sorted(docs, key=lambda d: d["timestamp"])
+    assert moods == [d["weighted_mood"] for d in newest[-50:]]
+    assert last == newest[-1]["timestamp"]
+
+
+def test_series_past_max_entries_keeps_the_head():
+    rng = random.Random(2)
+    cache = HistoryCache(max_entries_per_user=16)
+    stamps = timestamps(rng, 40)
+    docs = [make_doc(rng, ts) for ts in sorted(stamps[:17])]
+    series = cache.finish_load("u", cache.begin_load("u"), docs)
+    assert not series.complete and len(series) == 16
+    assert series.covers(16) and not series.covers(17)
+
+    for ts in stamps[17:]:
+        doc = make_doc(rng, ts)
+        docs.append(doc)
+        cache.record_insert("u", doc)
+    assert len(series) == 16
+    assert series.progress_series(16) == reference_series(docs, 16)
+
+
+def test_memory_cap_evicts_least_recently_used():
+    rng = random.Random(3)
+    probe = HistoryCache()
+    one_user = probe.finish_load("p", probe.begin_load("p"), [make_doc(rng, ts) for ts in timestamps(rng, 20)]).nbytes()
+
+    cache = HistoryCache(max_bytes=one_user * 5)
+    for i in range(5):
+        cache.finish_load(f"u{i}", cache.begin_load(f"u{i}"), [make_doc(rng, ts) for ts in sorted(timestamps(rng, 20))])
+    cache.get("u0")  # most recently used now
+    cache.finish_load("u5", cache.begin_load("u5"), [make_doc(rng, ts) for ts in sorted(timestamps(rng, 20))])
+
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["evictions"] == 1
+    assert cache.get("u0")[0] and not cache.get("u1")[0]
+
+
+def test_insert_during_load_discards_the_load():
+    rng = random.Random(4)
+    cache = HistoryCache()
+    stamps = sorted(timestamps(rng, 3))
+    token = cache.begin_load("u")
+    cache.record_insert("u", make_doc(rng, stamps[2]))  # lands after the query ran
+    cache.finish_load("u", token, [make_doc(rng, ts) for ts in stamps[:2]])
+    assert cache.get("u") == (False, None)
+
+
+def test_legacy_documents_bypass_the_cache():
+    cache = HistoryCache()
+    legacy = {"timestamp": datetime(2025, 1, 1), "weighted_mood": 0.1, "emoji": "Good",
+              "top_emotions": [{"label": "joy", "score": 0.9}]}
+    cache.finish_load("u", cache.begin_load("u"), [legacy])
+    assert cache.get("u") == (True, None)
+    assert cache.stats()["bypassed"] == 1
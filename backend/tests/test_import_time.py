@@ -0,0 +1,14 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from check_import_time import BUDGET_MS, ML_MODULES, measure
+
+
+@pytest.mark.parametrize("role", ["goals", "journal", "all"])
+def test_import_main_stays_under_budget(role):
+    # A fresh interpreter per role, with `python -X importtime -c "import main"`
+    elapsed_ms, modules = measure(role)
+    assert elapsed_ms <= BUDGET_MS, f"APP_ROLE={role}: import main took {elapsed_ms:.1f} ms"
+    assert not ML_MODULES & modules, f"APP_ROLE={role} imports {', '.join(sorted(ML_MODULES & modules))} at import time"
@@ -0,0 +1,38 @@
+import asyncio
+import json
+from config import GO_EMOTIONS_LABELS
+from crud import journal_import_crud
+
+
+def ndjson(lines):
+    async def stream():
+        for line in lines:
+            yield json.dumps(line).encode("utf-8") + b"\n"
+    return stream()
+
+
+def test_analyzer_failure_fails_only_its_line(mock_db, monkeypatch):
+    scores = {label: 1.0 / len(GO_EMOTIONS_LABELS) for label in GO_EMOTIONS_LABELS}
+
+    async def analyze_text(text, priority=0):
+        if text == "boom":
+            raise RuntimeError("model went away")
+        return scores, "full"
+
+    monkeypatch.setattr(journal_import_crud, "analyze_text", analyze_text)
+    monkeypatch.setattr(journal_import_crud, "IMPORT_BATCH_SIZE", 2)
+    texts = ["one", "two", "boom", "four", "five"]
+    lines = [{"user_id": "u1", "emoji": "Good", "text": text, "timestamp": f"2026-01-0{i + 1}T00:00:00"}
+             for i, text in enumerate(texts)]
+
+    async def main():
+        out = await journal_import_crud.import_mood_entries(ndjson(lines))
+        return [json.loads(line) for line in out.read().splitlines()], await mock_db.journals.count_documents({})
+
+    results, stored = asyncio.run(main())
+    # The failure sits in the second batch, after the first one was committed
+    assert results[-1] == {"summary": {"inserted": 4, "errors": 1}}
+    by_line = {r["line"]: r for r in results[:-1]}
+    assert by_line[3] == {"line": 3, "error": "Analysis failed: model went away"}
+    assert all("id" in by_line[line] for line in (1, 2, 4, 5))
+    assert stored == 4
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from config import WINDOW
+from crud.journal_crud import compute_z_score
+from mood_analytics import BLOCK_ROWS, analyze_block, rolling_z_scores, segment_starts
+
+
+def reference_z_scores(users, moods):
+    """compute_z_score per row over the user's previous WINDOW - 1 moods, as the write path does"""
+    out = []
+    for i in range(len(moods)):
+        start = i
+        while start > 0 and users[start - 1] == users[i] and i - start < WINDOW - 1:
+            start -= 1
+        out.append(compute_z_score(moods[i], list(moods[start:i])))
+    return np.array(out)
+
+
+def row_starts(users):
+    starts = segment_starts(users)
+    return np.repeat(starts, np.diff(np.append(starts, len(users))))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rolling_z_scores_match_compute_z_score(seed):
+    rng = np.random.default_rng(seed)
+    users = np.sort(rng.integers(0, 30, 600)).astype(str).astype(object)
+    moods = np.where(rng.random(600) < 0.3, rng.choice([-0.3, 0.0, 0.15, 0.3], 600), rng.uniform(-1, 1, 600))
+    np.testing.assert_allclose(rolling_z_scores(moods, row_starts(users)), reference_z_scores(users, moods),
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_block_scale_constant_window():
+    # A full block of other users' moods ahead of one user with a flat history: block-wide
+    # prefix sums used to turn the rounding residue into a z-score in the thousands
+    rng = np.random.default_rng(0)
+    others = BLOCK_ROWS
+    users = np.concatenate([np.repeat(np.arange(others // 10), 10).astype(str), ["zz"] * 10]).astype(object)
+    moods = np.concatenate([rng.uniform(0.5, 1.0, others), [0.15] * 9, [0.1]])
+
+    z = rolling_z_scores(moods, row_starts(users))
+    assert z[-1] == compute_z_score(0.1, [0.15] * 9) == 0.0
+    tail = slice(others - 50, None)  # starts on a user boundary
+    np.testing.assert_allclose(z[tail], reference_z_scores(users[tail], moods[tail]), rtol=1e-9, atol=1e-9)
+
+    timestamps = np.datetime64("2026-01-01", "us") + np.arange(len(moods)).astype("timedelta64[s]")
+    report = analyze_block(users, timestamps, moods, timestamps[-1], k=0.1, h=10.0)
+    assert report[-1]["user_id"] == "zz"
+    assert report[-1]["last_z_score"] == 0.0 and not report[-1]["mood_decline"]
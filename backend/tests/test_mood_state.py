@@ -0,0 +1,78 @@
+import asyncio
+import bisect
+import random
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from config import WINDOW, BASELINE_WINDOW
+from crud.journal_crud import compute_z_score, compute_cusum, score_mood
+from crud.mood_state_crud import get_recent_moods, rebuild_mood_state, record_mood
+
+
+def two_query_scores(history, weighted_mood):
+    """z-score/CUSUM as create_mood_entry computed them before mood_state: two
+    newest-first queries over the whole history (limits WINDOW - 1 and 50)"""
+    newest_first = [mood for _, mood in reversed(history)]
+    last_moods = list(reversed(newest_first[:WINDOW - 1]))
+    z = compute_z_score(weighted_mood, last_moods)
+
+    baseline_moods = list(reversed(newest_first[:50]))
+    baseline_mean = float(np.mean(baseline_moods)) if baseline_moods else weighted_mood
+    cusum = compute_cusum(baseline_moods + [weighted_mood], baseline_mean)
+    return z, cusum, (z < -1.5) or (cusum > 0.8)
+
+
+def random_mood(rng):
+    # Mostly the emoji/text mix the app produces, with repeats so sigma can be 0
+    if rng.random() < 0.2:
+        return rng.choice([-0.3, 0.0, 0.15, 0.3])
+    return rng.uniform(-1.0, 1.0)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_mood_state_matches_two_query_computation(mock_db, seed):
+    """Drives the real get_recent_moods/record_mood/rebuild_mood_state the way
+    create_mood_entry does, against a journal kept in mongomock"""
+    rng = random.Random(seed)
+    history = []  # (timestamp, weighted_mood), sorted by timestamp like the journal index
+    start = datetime(2026, 1, 1)
+    backdate_rate = rng.choice([0.0, 0.05, 0.3])
+
+    async def main():
+        for _ in range(rng.randint(1, 160)):
+            if history and rng.random() < backdate_rate:
+                # Strictly between two existing entries' timestamps (or before the first);
+                # BSON dates keep milliseconds
+                ts = history[rng.randrange(len(history))][0] - timedelta(milliseconds=rng.randint(1, 999))
+            else:
+                ts = (history[-1][0] if history else start) + timedelta(minutes=rng.randint(1, 600))
+            if any(existing == ts for existing, _ in history):
+                continue
+            mood = random_mood(rng)
+
+            recent, last_timestamp = await get_recent_moods("u")
+            assert score_mood(mood, recent) == two_query_scores(history, mood)
+
+            await mock_db.journals.insert_one({"user_id": "u", "timestamp": ts, "weighted_mood": mood})
+            bisect.insort(history, (ts, mood))
+            await record_mood("u", ts, mood, last_timestamp)
+
+            state = await mock_db.mood_state.find_one({"user_id": "u"})
+            assert state["recent"] == [m for _, m in history[-BASELINE_WINDOW:]]
+            assert state["last_timestamp"] == history[-1][0]
+
+    asyncio.run(main())
+
+
+def test_rebuild_of_empty_history_leaves_last_timestamp_unset(mock_db):
+    async def main():
+        await mock_db.mood_state.insert_one({"user_id": "u", "recent": [0.5], "last_timestamp": datetime(2026, 1, 1)})
+        await rebuild_mood_state("u")
+        return await mock_db.mood_state.find_one({"user_id": "u"})
+
+    state = asyncio.run(main())
+    assert state["recent"] == [] and "last_timestamp" not in state
+
+
+def test_empty_history_matches():
+    assert score_mood(0.4, []) == two_query_scores([], 0.4)
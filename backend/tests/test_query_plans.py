@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import pytest
+from indexes import HOT_QUERIES, apply_indexes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from check_query_plans import FORBIDDEN_STAGES, explain, seed, winning_stages
+
+# Needs a scratch mongod (mongomock has no query planner):
+#     TEST_MONGO_URL=mongodb://localhost:27017 python -m pytest -q tests/test_query_plans.py
+MONGO_URL = os.getenv("TEST_MONGO_URL")
+DB_NAME = "query_plan_test"
+
+needs_mongod = pytest.mark.skipif(not MONGO_URL, reason="set TEST_MONGO_URL to run query plan checks against a mongod")
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    loop = asyncio.new_event_loop()
+    client = AsyncIOMotorClient(MONGO_URL, io_loop=loop)
+    db = client[DB_NAME]
+    loop.run_until_complete(client.drop_database(DB_NAME))
+    loop.run_until_complete(apply_indexes(db))
+    loop.run_until_complete(seed(db))
+    yield loop, db
+    loop.run_until_complete(client.drop_database(DB_NAME))
+    client.close()
+    loop.close()
+
+
+@needs_mongod
+@pytest.mark.parametrize("query", HOT_QUERIES, ids=[q["name"] for q in HOT_QUERIES])
+def test_hot_query_uses_an_index(plan_db, query):
+    loop, db = plan_db
+    stages = winning_stages(loop.run_until_complete(explain(db, query)))
+    assert not FORBIDDEN_STAGES.intersection(stages), " > ".join(stages)
+
+
+def test_winning_stages_ignores_rejected_plans():
+    plan = {"queryPlanner": {
+        "winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}},
+        "rejectedPlans": [{"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}],
+    }}
+    assert winning_stages(plan) == ["LIMIT", "FETCH", "IXSCAN"]
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import random
+import pytest
+from bson import ObjectId
+from crud import goals_crud
+from crud.goals_crud import calculate_progress, update_subtask_status
+from schemas.goals_schemas import SubTaskUpdate
+
+# Pipeline updates with $dateDiff need a real mongod (MongoDB 5.0+), mongomock lacks them:
+#     TEST_MONGO_URL=mongodb://localhost:27017 python -m pytest -q tests/test_subtask_toggle.py
+MONGO_URL = os.getenv("TEST_MONGO_URL")
+DB_NAME = "subtask_toggle_test"
+SUBTASKS = 7
+
+pytestmark = pytest.mark.skipif(not MONGO_URL, reason="set TEST_MONGO_URL to run subtask toggles against a mongod")
+
+
+@pytest.fixture
+def goals(monkeypatch):
+    """Runs a coroutine against a scratch goals collection; returns it with the feedback jobs it enqueued"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    enqueued = []
+
+    async def enqueue(goal_id, subtask_index):
+        enqueued.append((goal_id, subtask_index))
+
+    monkeypatch.setattr(goals_crud.FEEDBACK_JOBS, "enqueue", enqueue)
+
+    def run(test):
+        async def main():
+            client = AsyncIOMotorClient(MONGO_URL)
+            collection = client[DB_NAME]["goals"]
+            monkeypatch.setattr(goals_crud, "goal_collection", collection)
+            try:
+                await client.drop_database(DB_NAME)
+                goal_id = str((await collection.insert_one({
+                    "title": "Test goal", "reminder_frequency": "daily",
+                    "subtasks": [{"description": f"Task {i}", "completed": False} for i in range(SUBTASKS)],
+                    "progress_percentage": 0, "status": "Not Started", "current_streak": 0,
+                })).inserted_id)
+                return await test(collection, goal_id)
+            finally:
+                await client.drop_database(DB_NAME)
+                client.close()
+
+        return asyncio.run(main())
+
+    run.enqueued = enqueued
+    return run
+
+
+def test_concurrent_toggles_keep_progress_consistent(goals):
+    rng = random.Random(0)
+
+    async def test(collection, goal_id):
+        await asyncio.gather(*(
+            update_subtask_status(goal_id, SubTaskUpdate(subtask_index=rng.randrange(SUBTASKS), completed=rng.random() < 0.5))
+            for _ in range(300)
+        ))
+        return await collection.find_one({"_id": ObjectId(goal_id)})
+
+    goal = goals(test)
+    progress = calculate_progress(goal["subtasks"])
+    assert goal["progress_percentage"] == progress
+    assert goal["status"] == ("Completed" if progress == 100 else "In Progress" if progress > 0 else "Not Started")
+
+
+def test_toggle_to_current_state_writes_nothing(goals):
+    async def test(collection, goal_id):
+        assert await update_subtask_status(goal_id, SubTaskUpdate(subtask_index=2, completed=True)) == (True, "Progress saved!")
+        before = await collection.find_one({"_id": ObjectId(goal_id)})
+        result = await update_subtask_status(goal_id, SubTaskUpdate(subtask_index=2, completed=True))
+        return result, before, await collection.find_one({"_id": ObjectId(goal_id)})
+
+    result, before, after = goals(test)
+    assert result == (True, "Subtask already up to date.")
+    assert after == before
+    assert len(goals.enqueued) == 1
+
+
+def test_toggle_of_missing_subtask_fails(goals):
+    async def test(collection, goal_id):
+        return await update_subtask_status(goal_id, SubTaskUpdate(subtask_index=SUBTASKS, completed=True))
+
+    assert goals(test)[0] is False
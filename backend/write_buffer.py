@@ -0,0 +1,162 @@
+# backend/write_buffer.py
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import metrics
+
+
+class WriteBuffer:
+    """Groups single-document inserts from concurrent requests into insert_many calls.
+
+    Documents get their _id client-side, so every caller knows its id up front. A
+    flush happens when `max_batch_size` documents are waiting or the oldest has
+    waited `max_wait_ms`. Flushes run one at a time, which keeps each user's
+    inserts in submission order.
+
+    insert(doc, wait=True) is a group commit: it returns once the batch holding
+    the document is written. wait=False is write-behind: it returns right after
+    buffering. Readers that must see a user's own writes call
+    wait_for_user(user_id) first. stop() flushes everything still buffered.
+    """
+
+    def __init__(self, collection: Any, max_batch_size: int = 128, max_wait_ms: float = 5.0, max_pending: int = 10000,
+                 user_field: str = "user_id"):
+        self.collection = collection
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.user_field = user_field
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: Dict[Any, Set[asyncio.Future]] = {}
+
+        # Metrics
+        self.docs_total = 0
+        self.batches_total = 0
+        self.failed_total = 0
+        self.max_batch_seen = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flushes every buffered document, then stops the flusher"""
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def insert(self, doc: Dict, wait: bool = True) -> ObjectId:
+        self.start()
+        doc.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        # Write-behind callers never look at the result; failures are logged by the flusher
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        await self._queue.put((doc, future))  # waits when max_pending documents are buffered
+
+        # Registered only once queued: a caller cancelled during backpressure never
+        # buffered its document, and its future would never resolve for readers
+        user = doc.get(self.user_field)
+        self._pending.setdefault(user, set()).add(future)
+        future.add_done_callback(lambda f: self._forget(user, f))
+        if wait:
+            # A cancelled request still gets its document written
+            await asyncio.shield(future)
+        return doc["_id"]
+
+    async def wait_for_user(self, user: Any):
+        """Returns once every insert buffered so far for this user has been written (or failed)"""
+        waiters = self._pending.get(user)
+        if waiters:
+            await asyncio.wait(list(waiters))
+
+    def _forget(self, user: Any, future: asyncio.Future):
+        waiters = self._pending.get(user)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._pending[user]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending_users": len(self._pending),
+            "docs_total": self.docs_total,
+            "batches_total": self.batches_total,
+            "avg_batch_size": (self.docs_total / self.batches_total) if self.batches_total else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "failed_total": self.failed_total,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    async def _collect(self) -> Tuple[List[Tuple[Dict, asyncio.Future]], bool]:
+        # Block for the first document, then keep filling until size or deadline is hit
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._collect()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                # Anything queued behind the stop marker still gets written
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        rest.append(item)
+                for i in range(0, len(rest), self.max_batch_size):
+                    await self._flush(rest[i:i + self.max_batch_size])
+                return
+
+    async def _flush(self, batch: List[Tuple[Dict, asyncio.Future]]):
+        docs = [doc for doc, _ in batch]
+        errors: Dict[int, Exception] = {}
+        started = time.perf_counter()
+        try:
+            with metrics.span(f"mongo.{getattr(self.collection, 'name', 'collection')}.insert_many"):
+                await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                errors[err["index"]] = RuntimeError(err.get("errmsg", "Insert failed"))
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        self.last_flush_seconds = time.perf_counter() - started
+
+        self.docs_total += len(batch)
+        self.batches_total += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.failed_total += len(errors)
+        if errors:
+            print(f"Buffered insert failed for {len(errors)} of {len(batch)} documents: {next(iter(errors.values()))}")
+
+        for i, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(doc["_id"])
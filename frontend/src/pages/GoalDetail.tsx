@@ -28,11 +28,12 @@ const GoalDetail = () => {
   const updateSubtaskMutation = useMutation({
     mutationFn: ({ index, completed }: { index: number; completed: boolean }) =>
       api.updateSubtask(id!, index, completed),
-    onSuccess: (message) => {
+    onSuccess: async (message) => {
       queryClient.invalidateQueries({ queryKey: ["goals"] });
+      const feedback = await api.getFeedback(id!);
       toast({
         title: "Nice work! 🎉",
-        description: message,
+        description: feedback ?? message,
       });
     },
   });
@@ -34,6 +34,14 @@ export const api = {
     return data.message;
   },
 
+  // Encouragement message is generated in the background after a subtask update
+  async getFeedback(goalId: string, waitSeconds: number = 20): Promise<string | null> {
+    const response = await fetch(`${API_BASE_URL}/goals/${goalId}/feedback?wait=${waitSeconds}`);
+    if (!response.ok) return null;
+    const data = await response.json();
+    return data.status === "done" ? data.message : null;
+  },
+
   async updateGoal(goalId: string, updates: Partial<Goal>): Promise<void> {
     const response = await fetch(`${API_BASE_URL}/goals/${goalId}`, {
       method: "PUT",